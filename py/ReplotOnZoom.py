@@ -1,9 +1,140 @@
+from collections import OrderedDict as _OrderedDict
+from collections import deque as _deque
+from math import ceil as _ceil
+from math import floor as _floor
+from math import log2 as _log2
+from threading import Event as _threadingEvent
+from threading import Thread as _threadingThread
+from traceback import print_exc as _printExc
 from typing import Callable, Optional
 from matplotlib.backend_bases import MouseEvent as _pltMouseEvent
 from matplotlib.pyplot import show as _pltShow
 from matplotlib.pyplot import subplots as _pltSubplots
+from numpy import asarray as _npAsarray
+from numpy import empty as _npEmpty
 from numpy import flipud as _npFlipud
 
+class _TileCache:
+    """
+    LRU cache of the bitmap in square tiles of tileSize pixels.
+    Tiles are on a quadtree of the plane: at level (lx, ly), a tile spans
+        tileSize pixels of size basePixelSize / 2 ** lx (resp. ly),
+        and tile (tx, ty) starts at origin + (tx, ty) * tile span.
+    The level of a view is the one with pixel size closest to that of the view,
+        so panning reuses the tiles already computed and only computes the exposed ones.
+    """
+    _calFunc: Optional[Callable] = None
+    _origin: tuple[float, float] = (0., 0.)
+    _basePixelSize: tuple[float, float] = (1., 1.)
+    _tileSize: int = 256
+    _cacheSize: int = 256
+    _tiles = None
+
+
+    def __init__(self,
+                 calFunc: Callable,
+                 origin: tuple[float, float],
+                 basePixelSize: tuple[float, float],
+                 tileSize: int = 256,
+                 cacheSize: int = 256):
+        self._calFunc = calFunc
+        self._origin = origin
+        self._basePixelSize = basePixelSize
+        self._tileSize = tileSize
+        self._cacheSize = cacheSize
+        # (level, tx, ty, paraKey) -> tile
+        self._tiles = _OrderedDict()
+
+
+    def __tileSpan(self, level: tuple[int, int]) -> tuple[float, float]:
+        return tuple(self._basePixelSize[i] * self._tileSize / 2 ** level[i]
+                     for i in range(2))
+
+
+    def render(self,
+               xLims: tuple[float, float],
+               yLims: tuple[float, float],
+               xres: int,
+               yres: int,
+               paraDict: dict,
+               isCancelled: Optional[Callable] = None):
+        """
+        Compute the bitmap of the tiles covering the view, at about xres x yres pixels for the view.
+        Returns (bitmap, extent, number of tiles computed, number of tiles reused),
+            where the rows of bitmap go upwards in y and extent is (xmin, xmax, ymin, ymax) of the tiles.
+        isCancelled is called before computing each run of tiles,
+            and None is returned if it returns True.
+        The tiles already computed are kept.
+        """
+        # the view resolution is given by the tiles
+        paraDict = {k: v for (k, v) in paraDict.items() if k not in ('xres', 'yres')}
+        paraKey = tuple(sorted((k, repr(v)) for (k, v) in paraDict.items()))
+        level = tuple(round(_log2(self._basePixelSize[i] * res / (lims[1] - lims[0])))
+                      for (i, lims, res) in ((0, xLims, xres), (1, yLims, yres)))
+        span = self.__tileSpan(level)
+        (txRange, tyRange) = (
+                range(_floor((lims[0] - self._origin[i]) / span[i]),
+                      max(_ceil((lims[1] - self._origin[i]) / span[i]),
+                          _floor((lims[0] - self._origin[i]) / span[i]) + 1))
+                for (i, lims) in ((0, xLims), (1, yLims)))
+        size = self._tileSize
+        bitmap = None
+        computedCount = reusedCount = 0
+        for (row, ty) in enumerate(tyRange):
+            tileYMin = self._origin[1] + ty * span[1]
+            # runs of missing tiles in a row are computed in one call
+            runStart = None
+            for (col, tx) in enumerate(list(txRange) + [None]):
+                key = (level, tx, ty, paraKey)
+                if tx is not None and key in self._tiles:
+                    self._tiles.move_to_end(key)
+                    tile = self._tiles[key]
+                    reusedCount += 1
+                    if bitmap is None:
+                        bitmap = _npEmpty((len(tyRange) * size, len(txRange) * size),
+                                          dtype=tile.dtype)
+                    bitmap[row * size:(row + 1) * size, col * size:(col + 1) * size] = tile
+                elif tx is not None and runStart is None:
+                    runStart = col
+                if runStart is not None and (tx is None or key in self._tiles):
+                    if isCancelled is not None and isCancelled():
+                        return None
+                    runLen = col - runStart
+                    runXMin = self._origin[0] + txRange[runStart] * span[0]
+                    run = _npAsarray(self._calFunc(
+                            runXMin,
+                            runXMin + span[0] * (runLen * size - 1) / size,
+                            tileYMin,
+                            tileYMin + span[1] * (size - 1) / size,
+                            xres=runLen * size,
+                            yres=size,
+                            **paraDict))
+                    if bitmap is None:
+                        bitmap = _npEmpty((len(tyRange) * size, len(txRange) * size),
+                                          dtype=run.dtype)
+                    bitmap[row * size:(row + 1) * size,
+                           runStart * size:col * size] = run
+                    for i in range(runLen):
+                        self._tiles[(level, txRange[runStart + i], ty, paraKey)] \
+                            = run[:, i * size:(i + 1) * size].copy()
+                    computedCount += runLen
+                    runStart = None
+        while len(self._tiles) > self._cacheSize:
+            self._tiles.popitem(last=False)
+        extent = (self._origin[0] + txRange[0] * span[0],
+                  self._origin[0] + (txRange[-1] + 1) * span[0],
+                  self._origin[1] + tyRange[0] * span[1],
+                  self._origin[1] + (tyRange[-1] + 1) * span[1])
+        return (bitmap, extent, computedCount, reusedCount)
+
+
+    def clear(self):
+        """
+        Remove all cached tiles.
+        """
+        self._tiles.clear()
+
+
 class ReplotOnZoom:
     """
     Wrapper for matplotlib.pyplot figure with replotting on zoom by mouse.
@@ -21,6 +152,16 @@ class ReplotOnZoom:
         ...              mandelbrot,
         ...              {'xres': 1024, 'yres': 768, 'nmax': 250},
         ...              verbose=True).show()
+        To only compute the newly exposed parts when panning:
+        >>> ReplotOnZoom((-2.0, 1.0), (-1.0, 1.0),
+        ...              mandelbrot,
+        ...              {'xres': 1024, 'yres': 768, 'nmax': 250},
+        ...              tileSize=128).show()
+        To keep the window responsive with a coarse preview first:
+        >>> ReplotOnZoom((-2.0, 1.0), (-1.0, 1.0),
+        ...              mandelbrot,
+        ...              {'xres': 1024, 'yres': 768, 'nmax': 2000},
+        ...              asynchronous=True).show()
     """
     _xLims: tuple[float, float] = (-float('inf'), float('inf'))
     _yLims: tuple[float, float] = (-float('inf'), float('inf'))
@@ -31,6 +172,17 @@ class ReplotOnZoom:
     _pltPara: dict = {}
     _eps: float = 1e-5
     _verbose: bool = False
+    _tileCache: Optional[_TileCache] = None
+    _image = None
+    _asynchronous: bool = False
+    _previewFactors: tuple[int, ...] = ()
+    # incremented on every view change, renders of older generations are dropped
+    _renderGen: int = 0
+    _pendingRequest = None
+    _requestEvent = None
+    _results = None
+    _isClosed: bool = False
+    _timer = None
 
 
     def __init__(self,
@@ -40,7 +192,11 @@ class ReplotOnZoom:
                  paraDict: Optional[dict] = None,
                  pltParaDict: Optional[dict] = None,
                  eps: float = 1e-5,
-                 verbose: bool = False):
+                 verbose: bool = False,
+                 tileSize: Optional[int] = None,
+                 cacheSize: int = 256,
+                 asynchronous: bool = False,
+                 previewFactors: tuple[int, ...] = (8, )):
         """
         Constructor for ReplotOnZoom class.
         ---
@@ -85,6 +241,35 @@ class ReplotOnZoom:
                 Type: bool
                 Default: False
                 Determine if verbose messages should be shown.
+            tileSize:
+                Type: Optional[int]
+                Default: None
+                If given, the bitmap is computed in tiles of tileSize x tileSize pixels,
+                    which are kept and reused when the view moves.
+                bitmapCalculateFunc must then take the resolution as keyword parameters xres and yres,
+                    and the resolution of the whole view must be given as xres and yres in paraDict.
+                If None, the whole view is computed on every move.
+            cacheSize:
+                Type: int
+                Default: 256
+                The maximal number of tiles kept.
+                The least recently used tiles are removed first.
+                Only used if tileSize is given.
+            asynchronous:
+                Type: bool
+                Default: False
+                If True, the bitmap is computed in a background thread,
+                    so that the window stays responsive.
+                A render is abandoned when the view changes again
+                    (between the tiles if tileSize is given,
+                    otherwise between the preview and the full render).
+            previewFactors:
+                Type: tuple[int, ...]
+                Default: (8, )
+                The resolutions, as fractions of the full resolution,
+                    shown before the full render when asynchronous is True.
+                Each factor must be an integer greater than 1.
+                Requires xres and yres in paraDict.
         """
         self._xLims = xLims
         self._yLims = yLims
@@ -94,14 +279,140 @@ class ReplotOnZoom:
         self._pltPara = pltParaDict if pltParaDict is not None else {}
         self._eps = eps if eps > 0 else 1e-5
         self._verbose = verbose
+        if tileSize is not None:
+            if tileSize <= 0:
+                raise ValueError("tileSize must be positive")
+            if 'xres' not in self._paraDict or 'yres' not in self._paraDict:
+                raise ValueError("xres and yres must be given in paraDict to use tiles")
+            self._tileCache = _TileCache(
+                    bitmapCalculateFunc,
+                    (xLims[0], yLims[0]),
+                    ((xLims[1] - xLims[0]) / self._paraDict['xres'],
+                     (yLims[1] - yLims[0]) / self._paraDict['yres']),
+                    tileSize,
+                    cacheSize)
+        self._asynchronous = asynchronous
+        if any(not isinstance(factor, int) or factor <= 1 for factor in previewFactors):
+            raise ValueError("previewFactors must be integers greater than 1")
+        self._previewFactors = tuple(sorted(previewFactors, reverse=True)) \
+            if 'xres' in self._paraDict and 'yres' in self._paraDict else ()
         self._fig.canvas.mpl_connect('button_release_event', self.__onZoomCallBack)
+        if asynchronous:
+            self._renderGen = 0
+            self._pendingRequest = None
+            self._requestEvent = _threadingEvent()
+            self._results = _deque()
+            self._isClosed = False
+            self._fig.canvas.mpl_connect('close_event', self.__onClose)
+            # matplotlib artists can only be changed in the GUI thread,
+            #     so the results are polled there
+            self._timer = self._fig.canvas.new_timer(interval=50)
+            self._timer.add_callback(self.__showResults)
+            _threadingThread(target=self.__renderWorker, daemon=True).start()
+
+
+    def __computeBitmap(self,
+                        newXLims: tuple[float, float],
+                        newYLims: tuple[float, float],
+                        factor: int = 1,
+                        isCancelled: Optional[Callable] = None):
+        # returns (bitmap, extent) at 1 / factor of the resolution, or None if cancelled
+        # previews are not tiled, as the tiles at a coarser level would cover much more than the view
+        if self._tileCache is None or factor != 1:
+            paraDict = self._paraDict
+            if factor != 1:
+                paraDict = dict(paraDict,
+                                xres=max(paraDict['xres'] // factor, 1),
+                                yres=max(paraDict['yres'] // factor, 1))
+            return (self._calFunc(newXLims[0], newXLims[1], newYLims[0], newYLims[1],
+                                  **paraDict),
+                    (newXLims[0], newXLims[1], newYLims[0], newYLims[1]))
+        res = self._tileCache.render(
+                newXLims, newYLims,
+                self._paraDict['xres'],
+                self._paraDict['yres'],
+                self._paraDict,
+                isCancelled)
+        if res is None:
+            return None
+        bitmap, extent, computedCount, reusedCount = res
+        if self._verbose:
+            print(f"Computed {computedCount} tiles, reused {reusedCount} tiles")
+        return (bitmap, extent)
+
+
+    def __showBitmap(self,
+                     bitmap,
+                     extent: tuple[float, float, float, float],
+                     newXLims: tuple[float, float],
+                     newYLims: tuple[float, float]):
+        if self._image is None:
+            self._image = self._ax.imshow(_npFlipud(bitmap), extent=extent, **self._pltPara)
+        else:
+            # reuse the artist
+            self._image.set_data(_npFlipud(bitmap))
+            self._image.set_extent(extent)
+            if not any(k in self._pltPara for k in ('norm', 'vmin', 'vmax')):
+                self._image.autoscale()
+        # the tiles may extend beyond the view
+        self._ax.set_xlim(newXLims)
+        self._ax.set_ylim(newYLims)
+        self._fig.canvas.draw_idle()
 
 
     def __replot(self, newXLims: tuple[float, float], newYLims: tuple[float, float]):
-        self._ax.imshow(_npFlipud(self._calFunc(newXLims[0], newXLims[1], newYLims[0], newYLims[1],
-                                                **self._paraDict)),
-                        extent=[newXLims[0], newXLims[1], newYLims[0], newYLims[1]],
-                        **self._pltPara)
+        if self._asynchronous:
+            self._renderGen += 1
+            self._pendingRequest = (self._renderGen, newXLims, newYLims)
+            self._requestEvent.set()
+            return
+        self.__showBitmap(*self.__computeBitmap(newXLims, newYLims), newXLims, newYLims)
+
+
+    def __renderWorker(self):
+        while not self._isClosed:
+            self._requestEvent.wait()
+            self._requestEvent.clear()
+            if self._isClosed or self._pendingRequest is None:
+                continue
+            gen, newXLims, newYLims = self._pendingRequest
+
+            def isCancelled():
+                return self._isClosed or self._renderGen != gen
+
+            for factor in self._previewFactors + (1, ):
+                if isCancelled():
+                    break
+                try:
+                    res = self.__computeBitmap(newXLims, newYLims, factor, isCancelled)
+                except Exception:
+                    # keep the worker alive for the next view, as the callback does in synchronous mode
+                    _printExc()
+                    break
+                if res is None:
+                    break
+                # deque.append is atomic
+                self._results.append((gen, res, newXLims, newYLims))
+            if self._verbose and not isCancelled():
+                print("Replot done")
+
+
+    def __showResults(self):
+        # called by the timer in the GUI thread, only the latest result of the current view is shown
+        latest = None
+        while len(self._results) != 0:
+            res = self._results.popleft()
+            if res[0] == self._renderGen:
+                latest = res
+        if latest is not None:
+            (_, (bitmap, extent), newXLims, newYLims) = latest
+            self.__showBitmap(bitmap, extent, newXLims, newYLims)
+
+
+    def __onClose(self, event):
+        self._isClosed = True
+        self._requestEvent.set()
+        self._timer.stop()
 
 
     def __hasMoved(self,
@@ -131,7 +442,7 @@ class ReplotOnZoom:
                 print(f"YRange: {oldLim} x {oldLim / newLim:0.3f}")
                 print("Replotting ...")
             self.__replot(currentXLim, currentYLim)
-            if self._verbose:
+            if self._verbose and not self._asynchronous:
                 print("Replot done")
         self._xLims = currentXLim
         self._yLims = currentYLim
@@ -143,5 +454,7 @@ class ReplotOnZoom:
         This method will keep running until the plot window is closed.
         """
         self.__replot(self._xLims, self._yLims)
+        if self._asynchronous:
+            self._timer.start()
         _pltShow()
 
@@ -0,0 +1,428 @@
+"""
+Benchmark of the signal pipeline in personalPylib_audio.py
+Each case renders a representative pipeline to a NullSink in a fresh process
+and reports the realtime factor (seconds of audio per CPU second),
+the peak RSS, and the transient memory allocated per block
+(the median after the first block, and the first block with its setup separately)
+The play case goes through AudioOutputInterface.play, the others render the blocks directly
+MIDI files (or synthetic scores) can also be rendered with AudioOutputSignal.fromMidi
+to report the render speed in notes per second
+"""
+
+from argparse import ArgumentParser, Namespace
+import csv
+import json
+import multiprocessing as mp
+import struct
+import sys
+import time
+import tracemalloc
+from typing import Optional
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+from personalPylib_audio import (AudioOutputInterface, AudioOutputSignal, Envelope,
+                                 MidiScore, NullSink)
+
+sampleRate: int = 48000
+
+
+def _sine(duration: float, bufferSize: int) -> AudioOutputSignal:
+    return AudioOutputSignal.sineWave(440., duration, bufferSize=bufferSize)
+
+
+# name -> (bufferSize, duration) -> signal
+caseDict = {
+    'fromAmpFunc': lambda bs, d: AudioOutputSignal.fromAmpFunc(
+        lambda t: np.sin(2 * np.pi * 440. * t) * np.exp(-t),
+        d,
+        bufferSize=bs,
+        arrayInput=True),
+    'elementwiseOp': lambda bs, d: _sine(d, bs).elementwiseOp(
+        AudioOutputSignal.sawWave(220., d, bufferSize=bs),
+        lambda a, b: a * b),
+    'enforceBufferSize': lambda bs, d: _sine(d, bs).enforceBufferSize(
+        bs * 3 // 2 + 1),
+    'echo': lambda bs, d: _sine(d, bs).echo(delayTime=0.25, echoAmp=0.5),
+    'damping': lambda bs, d: _sine(d, bs).damping(dampingFactor=2.),
+    'envelope': lambda bs, d: _sine(d, bs).applyEnvelope(
+        Envelope.adsr(noteDuration=d / 2, release=d / 4)),
+    'joinSmooth': lambda bs, d: _sine(d / 2, bs).joinSmooth(
+        AudioOutputSignal.squareWave(330., d / 2, bufferSize=bs),
+        transitDuration=0.1),
+    'convolve': lambda bs, d: _sine(d, bs).convolve(
+        np.random.default_rng(0).standard_normal(2 * sampleRate)
+        * np.exp(-np.arange(2 * sampleRate) / sampleRate) * 0.01),
+    'lowpass': lambda bs, d: _sine(d, bs).lowpass(1000.),
+    'toNpArray': None,  # handled separately, not a block pipeline
+    'play': None,  # handled separately, through AudioOutputInterface
+    'mix': lambda bs, d: AudioOutputSignal.sum(
+        *(AudioOutputSignal.sineWave(110. * (i + 1), d, bufferSize=bs)
+          for i in range(8))).clip(),
+}
+
+
+def _peakRSS() -> Optional[int]:
+    # in bytes
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class _TracingSink(NullSink):
+    # records the transient memory allocated between two writes
+    _traceAlloc = False
+    _before = 0
+    allocList = None
+
+    def __init__(self, traceAlloc: bool):
+        self._traceAlloc = traceAlloc
+        self.allocList = []
+        self.resetTrace()
+
+    def resetTrace(self):
+        if self._traceAlloc:
+            tracemalloc.reset_peak()
+            self._before = tracemalloc.get_traced_memory()[0]
+
+    def write(self, buf: np.ndarray):
+        super().write(buf)
+        self.allocList.append(tracemalloc.get_traced_memory()[1] - self._before
+                              if self._traceAlloc else 0)
+        self.resetTrace()
+
+
+def _render(caseName: str,
+            bufferSize: int,
+            duration: float,
+            traceAlloc: bool) -> tuple[int, list[int]]:
+    # returns (frame count, transient bytes of each block)
+    frameLimit = int(duration * sampleRate)
+    if caseName == 'toNpArray':
+        if traceAlloc:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        arr = _sine(duration, bufferSize).toNpArray(frameLimit=frameLimit)
+        allocBytes = tracemalloc.get_traced_memory()[1] - before \
+            if traceAlloc else 0
+        return (len(arr), [allocBytes])
+    if caseName == 'play':
+        sink = _TracingSink(traceAlloc)
+        # stereo, so that the mono signal is interleaved
+        with AudioOutputInterface(sampleRate=sampleRate,
+                                  channels=2,
+                                  bufferSize=bufferSize,
+                                  sink=sink) as playerAO:
+            signal = _sine(duration, bufferSize)
+            sink.resetTrace()
+            signal.play(playerAO)
+        return (sink.frameCount, sink.allocList)
+    sink = _TracingSink(traceAlloc)
+    sink.open(sampleRate, 1)
+    sink.start()
+    genObj = iter(caseDict[caseName](bufferSize, duration)._genObj)
+    sink.resetTrace()
+    while sink.frameCount < frameLimit:
+        buf = next(genObj, None)
+        if buf is None:
+            break
+        sink.write(buf[:frameLimit - sink.frameCount].astype(
+            np.float32, casting='same_kind', copy=False))
+    sink.close()
+    return (sink.frameCount, sink.allocList)
+
+
+def runCase(caseName: str,
+            bufferSize: int,
+            duration: float,
+            repeat: int) -> dict:
+    """
+    Run a benchmark case in the current process
+    Returns a dict of the results
+    """
+    # warm up the caches (e.g. wavetables)
+    _render(caseName, bufferSize, min(duration, 0.1), False)
+    cpuTimeList = []
+    for _ in range(repeat):
+        start = time.process_time()
+        frameCount, allocList = _render(
+            caseName, bufferSize, duration, False)
+        cpuTimeList.append(time.process_time() - start)
+    cpuTime = min(cpuTimeList)
+    tracemalloc.start()
+    _, allocList = _render(caseName, bufferSize, duration, True)
+    tracemalloc.stop()
+    return {
+        'case': caseName,
+        'bufferSize': bufferSize,
+        'duration': duration,
+        'frames': frameCount,
+        'blocks': len(allocList),
+        'cpuTime': cpuTime,
+        'realtimeFactor': (frameCount / sampleRate / cpuTime
+                           if cpuTime > 0 else float('inf')),
+        'peakRSS': _peakRSS(),
+        # the first block includes the setup of the pipeline
+        'allocBytesPerBlock': (int(np.median(allocList[1:]))
+                               if len(allocList) > 1 else allocList[0]),
+        'allocBytesFirstBlock': allocList[0],
+    }
+
+
+def _varLen(value: int) -> bytes:
+    # variable-length quantity in MIDI files
+    res = [value & 0x7f]
+    value >>= 7
+    while value != 0:
+        res.append(0x80 | (value & 0x7f))
+        value >>= 7
+    return bytes(reversed(res))
+
+
+def syntheticMidi(noteCount: int, trackCount: int = 16, seed: int = 0) -> bytes:
+    """
+    A Standard MIDI File of random notes spread over trackCount tracks and channels,
+    with overlapping notes of 0.1 to 2 seconds like a dense orchestral score
+    """
+    rng = np.random.default_rng(seed)
+    division = 480
+    # at the default 120 bpm
+    ticksPerSecond = 2 * division
+    chunks = [b'MThd' + struct.pack('>IHHH', 6, 1, trackCount, division)]
+    for trackIdx in range(trackCount):
+        # the 15 channels other than the percussion channel 9, cycled
+        channel = trackIdx % 15
+        channel += channel >= 9
+        trackNoteCount = noteCount // trackCount \
+            + (trackIdx < noteCount % trackCount)
+        starts = np.cumsum(rng.integers(0, ticksPerSecond // 2, trackNoteCount))
+        ends = starts + rng.integers(ticksPerSecond // 10, 2 * ticksPerSecond,
+                                     trackNoteCount)
+        pitches = rng.integers(36, 96, trackNoteCount)
+        velocities = rng.integers(40, 128, trackNoteCount)
+        # (tick, is note on, pitch, velocity), note offs first at the same tick
+        events = sorted([(int(t), 1, int(p), int(v))
+                         for (t, p, v) in zip(starts, pitches, velocities)]
+                        + [(int(t), 0, int(p), 0) for (t, p) in zip(ends, pitches)])
+        trackData = bytearray(b'\x00' + bytes((0xc0 | channel, trackIdx)))
+        lastTick = 0
+        for (tick, isNoteOn, pitch, velocity) in events:
+            # note off as note on with zero velocity, so that running status is used
+            trackData += _varLen(tick - lastTick) \
+                + bytes((0x90 | channel, pitch, velocity if isNoteOn else 0))
+            lastTick = tick
+        trackData += b'\x00\xff\x2f\x00'
+        chunks.append(b'MTrk' + struct.pack('>I', len(trackData)) + trackData)
+    return b''.join(chunks)
+
+
+def runMidi(source: str, bufferSize: int, repeat: int) -> dict:
+    """
+    Parse and render a MIDI file in the current process
+    source is a path, or synthetic:N for a synthetic score of N notes
+    Returns a dict of the results
+    """
+    if source.startswith('synthetic:'):
+        data = syntheticMidi(int(source.split(':', 1)[1]))
+    else:
+        with open(source, 'rb') as midiFile:
+            data = midiFile.read()
+    parseTimeList = []
+    renderTimeList = []
+    for _ in range(repeat):
+        start = time.process_time()
+        score = MidiScore.fromBytes(data)
+        parseTimeList.append(time.process_time() - start)
+        sink = NullSink()
+        sink.open(sampleRate, 1)
+        sink.start()
+        start = time.process_time()
+        for buf in AudioOutputSignal.fromMidi(score,
+                                              bufferSize=bufferSize,
+                                              sampleRate=sampleRate):
+            sink.write(buf)
+        renderTimeList.append(time.process_time() - start)
+        sink.close()
+    parseTime = min(parseTimeList)
+    renderTime = min(renderTimeList)
+    return {
+        'source': source,
+        'bufferSize': bufferSize,
+        'notes': score.noteCount,
+        'duration': sink.frameCount / sampleRate,
+        'parseTime': parseTime,
+        'renderTime': renderTime,
+        'notesPerSecond': (score.noteCount / renderTime
+                           if renderTime > 0 else float('inf')),
+        'realtimeFactor': (sink.frameCount / sampleRate / renderTime
+                           if renderTime > 0 else float('inf')),
+        'peakRSS': _peakRSS(),
+    }
+
+
+def _runInQueue(queue, func, *args):
+    queue.put(func(*args))
+
+
+def _runIsolated(func, *args) -> dict:
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_runInQueue,
+                       args=(queue, func) + args)
+    proc.start()
+    proc.join()
+    if proc.exitcode != 0:
+        raise RuntimeError(f"Benchmark {args[0]} failed "
+                           f"with exit code {proc.exitcode}")
+    return queue.get()
+
+
+def runIsolated(caseName: str,
+                bufferSize: int,
+                duration: float,
+                repeat: int) -> dict:
+    """
+    Run a benchmark case in a fresh process, so that the peak RSS is per case
+    """
+    return _runIsolated(runCase, caseName, bufferSize, duration, repeat)
+
+
+def runMidiIsolated(source: str, bufferSize: int, repeat: int) -> dict:
+    """
+    Run runMidi in a fresh process, so that the peak RSS is per file
+    """
+    return _runIsolated(runMidi, source, bufferSize, repeat)
+
+
+def getArgs(argStr: Optional[str] = None) -> Namespace:
+    parser = ArgumentParser(
+            description="Benchmark the signal pipeline of personalPylib_audio",
+            epilog="Realtime factor is seconds of audio per CPU second. "
+            "allocBytesPerBlock is the median transient memory "
+            "(as seen by tracemalloc) allocated while computing a block, "
+            "after the first block. allocBytesFirstBlock includes the setup")
+    parser.add_argument(
+            '--cases', '-c',
+            nargs='+',
+            choices=tuple(caseDict.keys()),
+            default=tuple(caseDict.keys()),
+            help="The cases to run. Defaults to all")
+    parser.add_argument(
+            '--buffer-sizes', '-b',
+            nargs='+',
+            type=int,
+            default=(512, 4096),
+            help="The block sizes to test. Defaults to 512 4096")
+    parser.add_argument(
+            '--durations', '-d',
+            nargs='+',
+            type=float,
+            default=(10., ),
+            help="The durations (in seconds) to render. Defaults to 10")
+    parser.add_argument(
+            '--repeat', '-r',
+            type=int,
+            default=3,
+            help="The number of timed runs, the fastest one is reported. "
+            "Defaults to 3")
+    parser.add_argument(
+            '--format', '-f',
+            choices=('table', 'json', 'csv'),
+            default='table',
+            help="Output format. json gives one object per line. "
+            "Defaults to table")
+    parser.add_argument(
+            '--midi', '-m',
+            nargs='+',
+            default=(),
+            help="MIDI files to render with AudioOutputSignal.fromMidi, "
+            "after the cases. Use synthetic:N for a synthetic score of N notes, "
+            "e.g. synthetic:20000")
+    parser.add_argument(
+            '--output', '-o',
+            type=str,
+            default=None,
+            help="File to write the results to. Defaults to stdout")
+    parser.add_argument(
+            '--in-process',
+            action='store_true',
+            help="Run all cases in this process. "
+            "Faster, but peak RSS is no longer per case")
+    return parser.parse_args(argStr.split() if argStr is not None else None)
+
+
+def main(args: Namespace):
+    runner = runCase if args.in_process else runIsolated
+    midiRunner = runMidi if args.in_process else runMidiIsolated
+    outFile = open(args.output, 'w', newline='') \
+        if args.output is not None else sys.stdout
+    writer = None
+    try:
+        for caseName in args.cases:
+            for bufferSize in args.buffer_sizes:
+                for duration in args.durations:
+                    result = runner(caseName, bufferSize, duration, args.repeat)
+                    if args.format == 'json':
+                        print(json.dumps(result), file=outFile)
+                    elif args.format == 'csv':
+                        if writer is None:
+                            writer = csv.DictWriter(outFile,
+                                                    fieldnames=result.keys())
+                            writer.writeheader()
+                        writer.writerow(result)
+                    else:
+                        if writer is None:
+                            writer = True
+                            print(f"{'case':<18}{'block':>7}{'dur':>7}"
+                                  f"{'RTF':>10}{'RSS(MB)':>9}{'alloc/blk':>11}"
+                                  f"{'alloc1st':>11}",
+                                  file=outFile)
+                        rss = result['peakRSS']
+                        print(f"{caseName:<18}{bufferSize:>7}{duration:>7g}"
+                              f"{result['realtimeFactor']:>10.1f}"
+                              f"{rss / 2**20 if rss is not None else float('nan'):>9.1f}"
+                              f"{result['allocBytesPerBlock']:>11}"
+                              f"{result['allocBytesFirstBlock']:>11}",
+                              file=outFile)
+                    outFile.flush()
+        # the MIDI results have other fields, so they get their own header
+        writer = None
+        for source in args.midi:
+            for bufferSize in args.buffer_sizes:
+                result = midiRunner(source, bufferSize, args.repeat)
+                if args.format == 'json':
+                    print(json.dumps(result), file=outFile)
+                elif args.format == 'csv':
+                    if writer is None:
+                        writer = csv.DictWriter(outFile,
+                                                fieldnames=result.keys())
+                        writer.writeheader()
+                    writer.writerow(result)
+                else:
+                    if writer is None:
+                        writer = True
+                        print(f"{'midi':<24}{'block':>7}{'notes':>8}{'dur':>8}"
+                              f"{'parse(s)':>10}{'notes/s':>10}{'RTF':>8}{'RSS(MB)':>9}",
+                              file=outFile)
+                    rss = result['peakRSS']
+                    print(f"{source[-24:]:<24}{bufferSize:>7}{result['notes']:>8}"
+                          f"{result['duration']:>8.1f}{result['parseTime']:>10.3f}"
+                          f"{result['notesPerSecond']:>10.0f}"
+                          f"{result['realtimeFactor']:>8.1f}"
+                          f"{rss / 2**20 if rss is not None else float('nan'):>9.1f}",
+                          file=outFile)
+                outFile.flush()
+    finally:
+        if outFile is not sys.stdout:
+            outFile.close()
+
+
+if __name__ == '__main__':
+    main(getArgs())
@@ -5,9 +5,11 @@
 
 import numpy as np
 import argparse
-from pynput import keyboard as kb
-import pyaudio as pa
-import itertools as it
+import json
+import queue
+import threading
+import time
+from personalPylib_audio import VoicePool, FileSink
 
 # cli arguments with argparse
 parser = argparse.ArgumentParser()
@@ -16,8 +18,14 @@ parser.add_argument('--debug', action='store_true',
 parser.add_argument('--length', type=float, default=1 / 30,
                     help="Length of a time unit, in seconds. "
                     "The shortest length of a signal, "
-                    "also the reaction time. "
+                    "also the fade-in time of a note. "
                     "Default: 1/30")
+parser.add_argument('--buffer', type=float, default=0.005,
+                    help="Length of an audio buffer, in seconds. "
+                    "Key events take effect at the next buffer, "
+                    "so this bounds the reaction time. "
+                    "Use a higher value if the output crackles. "
+                    "Default: 0.005")
 parser.add_argument('--sr', type=int, default=48000,
                     help="Sample rate, in Hz, "
                     "or size of data processed per second for each note. "
@@ -37,8 +45,43 @@ parser.add_argument('--just', action='store_true',
                     "By default, use equal termpermant "
                     "(with each note differ by 2^(1/12)). "
                     "Specify this option to use the just intonation. ")
+parser.add_argument('--voices', type=int, default=16,
+                    help="Maximal number of notes sounding at the same time. "
+                    "When exceeded, the quietest released note "
+                    "(or the oldest note if none is released) is replaced. "
+                    "Default: 16")
+parser.add_argument('--record', type=str, default=None, metavar='LOG',
+                    help="Record the session as a log of key events to LOG. "
+                    "The log can be rendered later with --replay. ")
+parser.add_argument('--replay', type=str, default=None, metavar='LOG',
+                    help="Render a log recorded with --record to a WAV file "
+                    "without playing it, as fast as possible. "
+                    "The settings in the log replace "
+                    "--length, --sr, --buffer, --just and --voices. ")
+parser.add_argument('--out', type=str, default=None,
+                    help="The WAV file to render to with --replay. "
+                    "Default: LOG with extension .wav")
 args = parser.parse_args()
 
+# version of the log format, see --record
+logVersion = 1
+# [frame, command, argument] of each key event, after the header
+replayEventList = []
+if args.replay is not None:
+    with open(args.replay) as logFile:
+        logHeader = json.loads(next(logFile))
+        if logHeader.get('version') != logVersion:
+            raise ValueError(f"Unknown log version {logHeader.get('version')}")
+        replayEventList = [json.loads(line) for line in logFile]
+    args.length = logHeader['length']
+    args.sr = logHeader['sr']
+    args.buffer = logHeader['buffer']
+    args.just = logHeader['just']
+    args.voices = logHeader['voices']
+else:
+    from pynput import keyboard as kb
+    import pyaudio as pa
+
 
 print("Initiating ...")
 
@@ -65,30 +108,25 @@ if args.debug:
 # pyaudio parameters
 unitTimeLength = args.length
 sampleRate = args.sr
-bufferSize = int(sampleRate * unitTimeLength)
+bufferSize = max(int(sampleRate * args.buffer), 1)
 printDebugMsg(f"bufferSize: {bufferSize}")
 # damping, kill natural damping below ~5%
 naturalDampingFactor = 9
-naturalDampingCutoffCount = int(np.log(1 / 0.05)
-                                / naturalDampingFactor
-                                * sampleRate / bufferSize)
+naturalDampingFloor = 0.05
 manualDampingIsActive = False
 manualDampingFactor = 3
 manualDampedFrameCount = 0
-printDebugMsg(f"naturalDampingCutoffCount: {naturalDampingCutoffCount}")
 # octave scale parameter
 scaleOffset = 3
 scaleOffset_adjust = 0
 # tone parameter
 signalMode = 1
-# volume parameter
+# volume parameter, set by the key listener
 globalVolume = 100
+# volume used by the renderer, follows globalVolume through 'vol' events
+outputVolume = 100
 # holding switch
 doNotesHolding = False
-# debug recording
-doRecording = None
-recordedBuffer = []
-recordedBufferPlayPtr = 0
 # release mode
 doReleaseDampAll = True
 # fundamental signals
@@ -108,13 +146,6 @@ def getFreq(scaleName, octaveOffset):
     return freqDict[scaleName] * 2. ** (octaveOffset - 2)
 
 
-paObj = pa.PyAudio()
-streamObj = paObj.open(rate=sampleRate,
-                       channels=1,
-                       format=pa.paFloat32,
-                       output=True)
-
-
 def getCommandFromKey(key):
     returnCmd = None
     if hasattr(key, 'vk'):
@@ -178,141 +209,83 @@ def damper(initFrame, dampFactor, outputSize=bufferSize):
                   * np.arange(initFrame, initFrame + outputSize))
 
 
-def getSignal(freq, mode=1):
-    ampList = None
-    freqList = None
-    if mode == 1:
-        return (np.sin(2 * np.pi * freq / sampleRate
-                       * np.arange(bIdx * bufferSize,
-                                   (bIdx + 1) * bufferSize))
-                for bIdx in it.count())
-    elif mode == 2:
-        ampList = [4, 2, 1]
-        freqList = [freq, freq * 1.5, freq * 3]
-    elif mode == 3:
-        ampList = [4, 2, 1, 2]
-        freqList = [freq, freq * 2, freq * 4, freq / 2]
-    else:
+# (frequency ratios, amplitudes) of the partials of each tone
+toneDict = {
+    1: ([1], [1]),
+    2: ([1, 1.5, 3], [4, 2, 1]),
+    3: ([1, 2, 4, 1 / 2], [4, 2, 1, 2]),
+}
+
+
+def getPartials(freq, mode=1):
+    if mode not in toneDict:
         raise ValueError("Unknown signal mode")
-    ampList = [i / np.sum(np.abs(ampList)) for i in ampList]
-    return (sum(amp * np.sin(2 * np.pi * freqEle / sampleRate
-                             * np.arange(bIdx * bufferSize,
-                                         (bIdx + 1) * bufferSize))
-                for (amp, freqEle) in zip(ampList, freqList))
-            for bIdx in it.count())
-
-
-class MusicNote:
-    genObj = None
-    name = None
-    doNaturalDamping = False
-    naturalDampedBufCount = 0
-    isInEffect = True
-    justStarted = True
-
-    def __init__(self, scaleName, octaveOffset, mode=1):
-        self.genObj = getSignal(getFreq(scaleName, octaveOffset),
-                                mode=mode)
-        # self.name = (scaleName, octaveOffset, mode)
-        self.name = (scaleName, octaveOffset, mode)
-        self.isInEffect = True
-        self.doNaturalDamping = False
-        self.justStarted = True
-        self.naturalDampedBufCount = 0
-
-    def __iter__(self):
-        return self.genObj
-
-    def __next__(self):
-        res = next(self.genObj, None)  # should not be None, gen is infinite
-        if res is None or not self.isInEffect:
-            self.isInEffect = False
-            raise StopIteration
-        else:
-            if self.justStarted:
-                damp = None
-                if self.naturalDampedBufCount == 0:  # is new sound
-                    print("starting", toName(self.name))
-                    damp = linspace(0, 1, bufferSize) ** 2
-                else:  # renew from damp
-                    print("renewing", toName(self.name))
-                    damp = linspace(np.exp(-naturalDampingFactor
-                                           * self.naturalDampedBufCount
-                                           * bufferSize / sampleRate),
-                                    1, bufferSize)
-                res *= damp
-                self.justStarted = False
-            if self.doNaturalDamping:  # TODO check if can change to elif
-                printDebugMsg("natural damping",
-                              toName(self.name),
-                              self.naturalDampedBufCount)
-                damp = damper(self.naturalDampedBufCount * bufferSize,
-                              naturalDampingFactor)
-                res *= damp
-                self.naturalDampedBufCount += 1
-                if self.naturalDampedBufCount >= naturalDampingCutoffCount:
-                    self.isInEffect = False
-                    self.naturalDampedBufCount = 0
-                    print(toName(self.name), "dying")
-                    res *= np.arange(bufferSize - 1, -1, -1) / bufferSize
-            return res
-
-    def reset(self):
-        self.justStarted = (not self.isInEffect) or self.doNaturalDamping
-        self.isInEffect = True
-        self.doNaturalDamping = False
-
-    def initDamping(self):
-        if not self.isInEffect:
-            return
-        print("start natural damping", toName(self.name))
-        self.doNaturalDamping = True
-        self.naturalDampedBufCount = 0
-
-
-activeNotes = {}
-mainLoopIsKilled = False
+    ratioList, ampList = toneDict[mode]
+    return ([freq * ratio for ratio in ratioList],
+            [amp / np.sum(np.abs(ampList)) for amp in ampList])
+
+
+# all notes are played by a fixed number of voices, rendered together
+# fade in over one time unit, damp on release
+# only used by the audio callback
+voicePool = VoicePool(maxVoices=args.voices,
+                      partialCount=max(len(ratioList)
+                                       for (ratioList, _) in toneDict.values()),
+                      attackTime=unitTimeLength,
+                      attackPower=2.,
+                      releaseDamping=naturalDampingFactor,
+                      releaseFloor=naturalDampingFloor,
+                      sampleRate=sampleRate)
+# (time of the key event, command, argument), from the key listener to the audio callback
+# everything that changes the sound goes through here, so that it can be recorded
+eventQueue = queue.SimpleQueue()
+# [frame, command, argument] of the applied events, from the audio callback to the log file
+logQueue = queue.SimpleQueue()
+# messages from the audio callback, printed by the main thread
+messageQueue = queue.SimpleQueue()
+quitEvent = threading.Event()
+# key-to-sound latency of each note started, in seconds
+latencyList = []
+underrunCount = 0
+
+
+def postEvent(cmd, arg=None):
+    eventQueue.put((time.perf_counter(), cmd, arg))
+
+
+def postMessage(*msg):
+    if args.replay is None or args.debug:
+        messageQueue.put(msg)
 
 
 def onPressCallback(key):
     printDebugMsg(key, 'pressed')
     global scaleOffset
     global scaleOffset_adjust
-    global activeNotes
-    global manualDampingIsActive
     global globalVolume
-    global doNotesHolding
     cmd = getCommandFromKey(key)
     if cmd is None:
         pass
     elif cmd == 'q':
         print("quitting")
-        global mainLoopIsKilled
-        mainLoopIsKilled = True
+        quitEvent.set()
     elif cmd in scaleNames:
         clippedScaleOffset = np.clip(scaleOffset + scaleOffset_adjust, 1, 6)
-        noteTriggered = (cmd, clippedScaleOffset, signalMode)
-        if noteTriggered in activeNotes:
-            activeNotes[noteTriggered].reset()
-        else:
-            activeNotes[noteTriggered] \
-                = MusicNote(scaleName=cmd,
-                            octaveOffset=clippedScaleOffset,
-                            mode=signalMode)
+        postEvent('on', (cmd, int(clippedScaleOffset), signalMode))
     elif cmd == 'dd':
-        for note in activeNotes.values():
-            if note.isInEffect and not note.doNaturalDamping:
-                note.initDamping()
+        postEvent('offAll')
     elif cmd in ('o1', 'o2', 'o3', 'o4', 'o5', 'o6'):
         scaleOffset = int(cmd[1])
         print(f"offset : {scaleOffset}")
     elif cmd == 'damp':
-        manualDampingIsActive = True
+        postEvent('damp', True)
     elif cmd == 'vu':
         globalVolume = min(globalVolume + 1, 100)
+        postEvent('vol', globalVolume)
         print(f"vol: {globalVolume}")
     elif cmd == 'vd':
         globalVolume = max(globalVolume - 1, 0)
+        postEvent('vol', globalVolume)
         print(f"vol: {globalVolume}")
     elif cmd in ('su1', 'su2'):
         scaleOffset_adjust = int(cmd[2])
@@ -323,20 +296,14 @@ def onPressCallback(key):
         print(f"offset adjust: {scaleOffset_adjust}, "
               f"current: {np.clip(scaleOffset + scaleOffset_adjust, 1, 6)}")
     elif cmd == 'hold':
-        doNotesHolding = True
+        postEvent('hold', True)
 
 
 def onReleaseCallback(key):
     printDebugMsg(key, 'released')
     global scaleOffset
     global scaleOffset_adjust
-    global activeNotes
     global signalMode
-    global manualDampingIsActive
-    global doNotesHolding
-    global doRecording
-    global recordedBuffer
-    global recordedBufferPlayPtr
     global doReleaseDampAll
     cmd = getCommandFromKey(key)
     if cmd is None:
@@ -344,39 +311,20 @@ def onReleaseCallback(key):
     elif cmd in scaleNames:
         if doReleaseDampAll:
             for scale in range(1, 7):
-                testNoteName = (cmd, scale, signalMode)
-                if testNoteName in activeNotes \
-                        and not activeNotes[testNoteName].doNaturalDamping:
-                    activeNotes[testNoteName].initDamping()
+                postEvent('off', (cmd, scale, signalMode))
         else:
-            noteTriggered = (cmd,
-                             max(min(scaleOffset + scaleOffset_adjust,
-                                     6),
-                                 1),
-                             signalMode)
-            if noteTriggered in activeNotes \
-                    and not activeNotes[noteTriggered].doNaturalDamping:
-                activeNotes[noteTriggered].initDamping()
+            postEvent('off', (cmd,
+                              max(min(scaleOffset + scaleOffset_adjust,
+                                      6),
+                                  1),
+                              signalMode))
     elif cmd == 'damp':
-        manualDampingIsActive = None
+        postEvent('damp', None)
     elif cmd in ('su1', 'su2', 'sd1', 'sd2'):
         scaleOffset_adjust = 0
         print(f"offset adjust: 0, current: {scaleOffset}")
     elif cmd == 'hold':
-        doNotesHolding = False
-    elif cmd == 'rec':
-        if doRecording is None:
-            print("start recording")
-            doRecording = True
-            recordedBuffer = []
-        elif doRecording:
-            print("done recording, start playing")
-            doRecording = False
-            recordedBufferPlayPtr = 0
-        else:
-            print("stop playing, cleaning record")
-            doRecording = None
-            recordedBuffer = []
+        postEvent('hold', False)
     elif cmd == 'cut':
         doReleaseDampAll = not doReleaseDampAll
         print("release mode: "
@@ -386,65 +334,77 @@ def onReleaseCallback(key):
         print(f"tone: {signalMode}")
 
 
-def playBuffer(buffer):
-    buffer *= globalVolume / 100
-    streamObj.write(buffer.astype(np.float32,
-                                  casting='same_kind',
-                                  copy=False).tobytes())
+def applyEvent(cmd, arg, latency=None):
+    # only called by the renderer
+    global manualDampingIsActive
+    global outputVolume
+    global doNotesHolding
+    if cmd == 'on':
+        latencyMsg = f"({latency * 1000:.1f} ms)" if latency is not None else ""
+        if arg not in voicePool.activeKeys:
+            postMessage("starting", toName(arg), latencyMsg)
+        elif voicePool.isReleasing(arg):
+            postMessage("renewing", toName(arg), latencyMsg)
+        voicePool.noteOn(arg,
+                         *getPartials(getFreq(arg[0], arg[1]), mode=arg[2]))
+        if latency is not None:
+            latencyList.append(latency)
+    elif cmd == 'off':
+        if arg in voicePool.activeKeys and not voicePool.isReleasing(arg):
+            postMessage("start natural damping", toName(arg))
+            voicePool.noteOff(arg)
+    elif cmd == 'offAll':
+        for noteName in voicePool.activeKeys:
+            applyEvent('off', noteName)
+    elif cmd == 'damp':
+        manualDampingIsActive = arg
+    elif cmd == 'vol':
+        outputVolume = arg
+    elif cmd == 'hold':
+        doNotesHolding = arg
+    elif cmd == 'end':
+        pass
+    else:
+        raise ValueError(f"Unknown event {cmd}")
 
 
+# frames rendered so far
+frameIndex = 0
 activeNoteBuf = np.zeros(bufferSize)
-debugBuf = np.zeros(0)
-reportedEmpty = False
+outBuf = np.zeros(bufferSize, dtype=np.float32)
+# peak of each buffer, for the debug plot
+debugPeakList = []
+previousActiveNoteNames = []
 previousActiveNoteCount = 0
-kbListener = kb.Listener(on_press=onPressCallback,
-                         on_release=onReleaseCallback,
-                         suppress=not args.nosuppress)
-kbListener.start()
-print("""Initiated
 
-Instruction:
-esc: quit
-home, /, *, -, left, up, pgup, +, end, middle, right, enter: C-B
-insert: clear all
-1-6: move to octave
-f1-f4: temporally change octave
-numlock: damp all
-[, ]: volume up/down
-f12: toggle cut
-""")
 
-print(f"offset : {scaleOffset}")
-currentTime = 0
-streamObj.start_stream()
-while not mainLoopIsKilled:
-    if args.debug:
-        print(f"timestamp: {round(currentTime, 3)}")
-    # to avoid activeNotes changing when processing
-    activeNotesCopy = activeNotes.copy()
-    activeNoteNames = list(noteName
-                           for noteName in activeNotesCopy
-                           if activeNotesCopy[noteName].isInEffect)
-    activeNoteBufList = list(next(activeNotesCopy[noteName])
-                             for noteName in activeNoteNames)
+def renderBuffer(frameCount):
+    # returns a view of activeNoteBuf, valid until the next call
+    # the result only depends on the events applied before and frameCount
+    global frameIndex
+    global activeNoteBuf
+    global manualDampingIsActive
+    global manualDampedFrameCount
+    global previousActiveNoteNames
+    global previousActiveNoteCount
+    if len(activeNoteBuf) < frameCount:
+        activeNoteBuf = np.zeros(frameCount)
+    buf = activeNoteBuf[:frameCount]
+    activeNoteNames = voicePool.activeKeys
     if doNotesHolding:
-        print("holding")
         for noteName in activeNoteNames:
-            activeNotesCopy[noteName].reset()  # obj by ref
-    if doRecording is False:
-        activeNoteNames.append("record")
-        activeNoteBufList.append(recordedBuffer[recordedBufferPlayPtr])
-        recordedBufferPlayPtr = (recordedBufferPlayPtr + 1) \
-            % len(recordedBuffer)
+            if voicePool.isReleasing(noteName):
+                voicePool.noteOn(noteName)
+    # all sounding notes in one pass, into the same buffer every time
+    voicePool.render(frameCount, out=buf)
     activeNoteCount = len(activeNoteNames)
+    if activeNoteNames != previousActiveNoteNames:
+        if activeNoteCount != 0:
+            postMessage("playing", *map(toName, activeNoteNames))
+        else:
+            postMessage("no active note")
     if activeNoteCount != 0:
-        print("playing", *map(toName, activeNoteNames))
-        reportedEmpty = False
         if 0 != previousActiveNoteCount != activeNoteCount:
-            printDebugMsg("weight shifting",
-                          previousActiveNoteCount,
-                          "->",
-                          activeNoteCount)
             # fade in/out on averaging
             # NOTE
             # currently,
@@ -458,49 +418,164 @@ while not mainLoopIsKilled:
             # if p = 2, is fine when m <= n
             # so should be fine
             # if activeNoteCount / previousActiveNoteCount - 1 is small
-            activeNoteBuf = sum(activeNoteBufList) \
-                / linspace(previousActiveNoteCount,
-                           activeNoteCount,
-                           bufferSize)
-            if args.debug and np.any(activeNoteBuf > 1):
-                mainLoopIsKilled = True
+            buf /= linspace(previousActiveNoteCount,
+                            activeNoteCount,
+                            frameCount)
+            if args.debug and np.any(buf > 1):
+                postMessage("amplitude exceeds 1")
+                quitEvent.set()
         else:
-            activeNoteBuf = sum(activeNoteBufList) / activeNoteCount
-    else:
-        activeNoteBuf = np.zeros(bufferSize)
-        if not reportedEmpty:
-            print("no active note")
-            reportedEmpty = True
+            buf /= activeNoteCount
     if manualDampingIsActive is True:
-        print("manual damping")
-        activeNoteBuf *= damper(manualDampedFrameCount,
-                                manualDampingFactor)
-        manualDampedFrameCount += bufferSize
+        buf *= damper(manualDampedFrameCount,
+                      manualDampingFactor,
+                      outputSize=frameCount)
+        manualDampedFrameCount += frameCount
     elif manualDampingIsActive is None:
-        activeNoteBuf *= linspace(np.exp(-manualDampingFactor
-                                         * manualDampedFrameCount
-                                         / sampleRate),
-                                  1,
-                                  bufferSize)
+        buf *= linspace(np.exp(-manualDampingFactor
+                               * manualDampedFrameCount
+                               / sampleRate),
+                        1,
+                        frameCount)
         manualDampedFrameCount = 0
         manualDampingIsActive = False
-    playBuffer(activeNoteBuf)
-    if doRecording is True:
-        recordedBuffer.append(activeNoteBuf)
+    buf *= outputVolume / 100
     if args.debug:
-        debugBuf = np.hstack((debugBuf, activeNoteBuf))
-        currentTime += bufferSize / sampleRate
-        print(f"timestamp: {round(currentTime, 3)}")
-        print("----------")
+        debugPeakList.append(np.max(np.abs(buf)))
+    previousActiveNoteNames = activeNoteNames
     previousActiveNoteCount = activeNoteCount
-kbListener.stop()
-if streamObj.is_active():
-    streamObj.stop_stream()
-streamObj.close()
-paObj.terminate()
+    frameIndex += frameCount
+    return buf
+
+
+def renderCallback(inData, frameCount, timeInfo, statusFlags):
+    global outBuf
+    global underrunCount
+    callbackTime = time.perf_counter()
+    if statusFlags & pa.paOutputUnderflow:
+        underrunCount += 1
+    # time until this buffer is heard
+    outputDelay = timeInfo['output_buffer_dac_time'] - timeInfo['current_time']
+    if not 0 <= outputDelay < 1:
+        # not provided by some host APIs
+        outputDelay = streamObj.get_output_latency()
+    while True:
+        try:
+            (eventTime, cmd, arg) = eventQueue.get_nowait()
+        except queue.Empty:
+            break
+        applyEvent(cmd, arg, latency=callbackTime - eventTime + outputDelay)
+        if args.record is not None:
+            logQueue.put((frameIndex, cmd, arg))
+    if len(outBuf) < frameCount:
+        outBuf = np.zeros(frameCount, dtype=np.float32)
+    np.copyto(outBuf[:frameCount], renderBuffer(frameCount), casting='same_kind')
+    return (outBuf[:frameCount].tobytes(), pa.paContinue)
+
+
+def writeLog(logFile):
+    while True:
+        try:
+            logFile.write(json.dumps(logQueue.get_nowait()) + '\n')
+        except queue.Empty:
+            break
+
+
+def replay(eventList, outPath):
+    # render the events to outPath, one buffer at a time as in the live session
+    sink = FileSink(outPath)
+    sink.open(sampleRate, 1)
+    sink.start()
+    startTime = time.perf_counter()
+    endFrame = eventList[-1][0] if len(eventList) != 0 else 0
+    eventIdx = 0
+    while frameIndex < endFrame and not quitEvent.is_set():
+        while eventIdx < len(eventList) and eventList[eventIdx][0] <= frameIndex:
+            (_, cmd, arg) = eventList[eventIdx]
+            # tuples are saved as lists
+            applyEvent(cmd, tuple(arg) if isinstance(arg, list) else arg)
+            eventIdx += 1
+        sink.write(renderBuffer(min(bufferSize, endFrame - frameIndex)))
+        while not messageQueue.empty():
+            print(*messageQueue.get())
+    sink.close()
+    elapsedTime = time.perf_counter() - startTime
+    print(f"rendered {frameIndex / sampleRate:.1f} s in {elapsedTime:.2f} s "
+          f"({frameIndex / sampleRate / max(elapsedTime, 1e-9):.0f}x realtime) "
+          f"to {outPath}")
+
+
+if args.replay is not None:
+    replay(replayEventList,
+           args.out if args.out is not None
+           else args.replay.rsplit('.', 1)[0] + '.wav')
+else:
+    logFile = None
+    if args.record is not None:
+        logFile = open(args.record, 'w')
+        logFile.write(json.dumps({'version': logVersion,
+                                  'length': args.length,
+                                  'sr': args.sr,
+                                  'buffer': args.buffer,
+                                  'just': args.just,
+                                  'voices': args.voices}) + '\n')
+    paObj = pa.PyAudio()
+    streamObj = paObj.open(rate=sampleRate,
+                           channels=1,
+                           format=pa.paFloat32,
+                           output=True,
+                           frames_per_buffer=bufferSize,
+                           stream_callback=renderCallback,
+                           start=False)
+    kbListener = kb.Listener(on_press=onPressCallback,
+                             on_release=onReleaseCallback,
+                             suppress=not args.nosuppress)
+    kbListener.start()
+    print("""Initiated
+
+Instruction:
+esc: quit
+home, /, *, -, left, up, pgup, +, end, middle, right, enter: C-B
+insert: clear all
+1-6: move to octave
+f1-f4: temporally change octave
+numlock: damp all
+[, ]: volume up/down
+f12: toggle cut
+""")
+
+    print(f"offset : {scaleOffset}")
+    print(f"buffer: {bufferSize} frames ({bufferSize / sampleRate * 1000:.1f} ms), "
+          f"output latency: {streamObj.get_output_latency() * 1000:.1f} ms")
+    if logFile is not None:
+        print(f"recording to {args.record}")
+    streamObj.start_stream()
+    while not quitEvent.is_set() and streamObj.is_active():
+        try:
+            print(*messageQueue.get(timeout=0.1))
+        except queue.Empty:
+            pass
+        if logFile is not None:
+            writeLog(logFile)
+    kbListener.stop()
+    if streamObj.is_active():
+        streamObj.stop_stream()
+    streamObj.close()
+    paObj.terminate()
+    if logFile is not None:
+        writeLog(logFile)
+        # the length of the session
+        logFile.write(json.dumps((frameIndex, 'end', None)) + '\n')
+        logFile.close()
+    while not messageQueue.empty():
+        print(*messageQueue.get())
+    if len(latencyList) != 0:
+        print(f"key-to-sound latency of {len(latencyList)} notes: "
+              f"mean {np.mean(latencyList) * 1000:.1f} ms, "
+              f"median {np.median(latencyList) * 1000:.1f} ms, "
+              f"max {np.max(latencyList) * 1000:.1f} ms")
+    print(f"buffer underruns: {underrunCount}")
 if args.debug:
-    plt.plot(np.linspace(0, len(debugBuf) / sampleRate,
-                         num=len(debugBuf),
-                         endpoint=False),
-             debugBuf)
+    plt.plot(np.arange(len(debugPeakList)) * bufferSize / sampleRate,
+             debugPeakList)
     plt.show()
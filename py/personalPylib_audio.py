@@ -1,1567 +1,5870 @@
 # TODO no numpy as dependency
 # TODO higher width than float32
 
-import pyaudio as _pa
 import numpy as _np
 import itertools as _it
+import bisect as _bisect
+import math as _math
+import os as _os
+import shutil as _shutil
+import struct as _struct
+import tempfile as _tempfile
+import threading as _threading
+import time as _time
+import weakref as _weakref
+from collections import deque as _deque, OrderedDict as _OrderedDict
 from numbers import Number as _numClass
 from typing import Optional, Callable, Union
 from collections.abc import Iterable
+try:
+    import pyaudio as _pa
+except ImportError:
+    # only needed by PyAudioSink
+    _pa = None
 
 
-class AudioOutputSignal:
+class _RingBlockBuffer:
     """
-    A class for generating audio signals
+    A fixed-capacity float32 buffer for reblocking signal chunks.
+    Data is kept contiguous so that blocks can be taken out as views:
+        when a push does not fit at the end, the (short) unread tail is moved
+        to the front instead of wrapping around.
+    The storage only grows if a single push cannot fit even after that.
+    Multi-channel data are stored as (frames, channels).
+    ---
+    Methods:
+        push
+        pop
+        __len__
+    """
+    _data = None
+    _start = 0
+    _end = 0
+
+    def __init__(self, capacity: int, channels: int = 1):
+        """
+        Constructor for _RingBlockBuffer class.
+        ---
+        Parameter:
+            capacity:
+                Type: int
+                The initial number of frames the buffer can hold
+            channels:
+                Type: int
+                Default: 1
+                The number of channels
+                If 1, the data are stored as 1D
+        """
+        self._data = _np.empty((max(capacity, 1), )
+                               + ((channels, ) if channels != 1 else ()),
+                               dtype=_np.float32)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def push(self, chunk: _np.ndarray):
+        """
+        Append chunk at the end of the buffer.
+        chunk will be casted to float32.
+        Views returned by pop before this call may be overwritten.
+        """
+        chunkLen = len(chunk)
+        if self._end + chunkLen > len(self._data):
+            dataLen = len(self)
+            if dataLen + chunkLen > len(self._data):
+                newData = _np.empty((max(2 * len(self._data),
+                                         dataLen + chunkLen), )
+                                    + self._data.shape[1:],
+                                    dtype=_np.float32)
+                newData[:dataLen] = self._data[self._start:self._end]
+                self._data = newData
+            else:
+                self._data[:dataLen] = self._data[self._start:self._end]
+            self._start, self._end = 0, dataLen
+        self._data[self._end:self._end + chunkLen] = chunk
+        self._end += chunkLen
+
+    def pop(self, frameCount: int):
+        """
+        Take out at most frameCount frames from the front of the buffer.
+        ---
+        Return:
+            A view of the frames taken out
+            The view is only valid until the next call of push
+        """
+        frameCount = min(frameCount, len(self))
+        res = self._data[self._start:self._start + frameCount]
+        self._start += frameCount
+        if self._start == self._end:
+            self._start = self._end = 0
+        return res
+
+
+class _MixingBus:
+    """
+    A pending operation of AudioOutputSignal (see AudioOutputSignal._withOp)
+        that combines each buffer with the aligned buffers of other signals.
+    Each signal is aligned to the buffer through its own _RingBlockBuffer,
+        scaled by its gain, and combined into the buffer in place with
+        inPlaceFunc(buf, sigBuf, out=buf).
+    Mono signals are broadcasted to all channels of the buffer.
+    The result stops when one of the signals runs out.
+    Before it is first called, it can seek if all the signals are seekable.
     ---
     Properties:
-        isInEffect:
+        isSeekable:
             Read-only
-            Indicates if the signal is still valid
+            Whether all the signals are seekable
     ---
     Methods:
-        Class methods:
-            fromNpArray
-            fromAmpFunc
-            fromFreqFunc
-            silentSignal
-            sineWave
-            unitSound
-            squareWave
-            sawWave
-            triangleWave
-            joinSignals
-            joinSignalsSmooth
-            sum
-            prod
-        Member methods:
-            toNpArray
-            join
-            joinSmooth
-            damping
-            cutoff
-            ampModify
-            elementwiseOp
-            add
-            __add__, __radd__
-            mul
-            __mul__, __rmul__
-            enforceBufferSize
-            play
-            skipTime
-            keepTime
-            clip
-            repeat
-            echo
+        extend
+        seek
+        __call__
     """
-    # actual data
-    _genObj = None
-    # whether the signal generator can still be used
-    _isInEffect = True
-    # referential standard buffer size
+    # called as inPlaceFunc(buf, sigBuf, out=buf)
+    inPlaceFunc = None
+    # list of [generator, _RingBlockBuffer, gain, seek function]
+    _sources = None
     _bufSize = None
-    # number of chunks, float('inf') if unlimited, None if not known
-    _length = None
 
     def __init__(self,
-                 gen: Iterable,
-                 bufSize: Optional[int] = None,
-                 length: Optional[int] = None):
+                 sigObjList: list,
+                 inPlaceFunc: Callable,
+                 gainList: Optional[list] = None,
+                 bufferSize: int = 4096):
         """
-        Constructor for AudioOutputSignal class.
-        Most of the time, this constructor should not be called directly.
-        To construct a signal, you may use the class methods.
+        Constructor for _MixingBus class.
         ---
         Parameter:
-            gen:
-                Type: iterable
-                The generator for actual signal
-            bufSize:
-                Type: Optional[int]
-                Default: None
-                The reference buffer size
-            length
-                Type: Optional[int]
+            sigObjList:
+                Type: list[AudioOutputSignal]
+                The signals to be mixed in
+                All of them will be set invalid
+            inPlaceFunc:
+                Type: Callable
+                The operation to combine the signals
+                Will be called as inPlaceFunc(buf, sigBuf, out=buf)
+            gainList:
+                Type: Optional[list[float]]
                 Default: None
-                The reference length of the signal
-                For signals that have infinite length, pass None
+                The amplitude multipliers for the signals
+                If None, all multipliers are 1
+            bufferSize:
+                Type: int
+                Default: 4096
+                The reference buffer size, used for the initial capacity of the alignment buffers
         """
-        self._genObj = gen
-        self._length = length
-
-    def __next__(self):
-        res = next(self._genObj, None)
-        if res is None:
-            self._isInEffect = False
-            raise StopIteration
-        else:
-            return res
-
-    def __iter__(self):
-        self._isInEffect = False
-        return self._genObj
+        self.inPlaceFunc = inPlaceFunc
+        self._sources = []
+        self._bufSize = bufferSize
+        self.extend(sigObjList, gainList)
 
-    def __len__(self):
-        return self._length
+    def extend(self, sigObjList: list, gainList: Optional[list] = None):
+        """
+        Add more signals to the bus.
+        Must be called before the bus is used.
+        """
+        if gainList is None:
+            gainList = [1.] * len(sigObjList)
+        for (sigObj, gain) in zip(sigObjList, gainList):
+            sigObj._isInEffect = False
+            seekFunc = sigObj._seekableGen(reuseBuffer=True)
+            self._sources.append([sigObj._compile(reuseBuffer=True),
+                                  _RingBlockBuffer(2 * self._bufSize,
+                                                   sigObj._channels),
+                                  gain,
+                                  seekFunc])
 
     @property
-    def isInEffect(self):
+    def isSeekable(self):
+        return all(source[3] is not None for source in self._sources)
+
+    def seek(self, frameOffset: int):
         """
-        Property denoting whether the object can still be used.
-        Read-only property.
+        Make the next call start from frameOffset of all the signals.
+        Must only be called before the bus is used, and only if isSeekable.
         """
-        return self._isInEffect
+        for source in self._sources:
+            source[0] = source[3](frameOffset)
 
-    @isInEffect.setter
-    def isInEffect(self, newFlag):
-        raise ValueError("This property is read-only")
+    def __call__(self, buf: _np.ndarray, frameOffset: int):
+        validLen = len(buf)
+        for (gen, ringBuf, _, _) in self._sources:
+            while len(ringBuf) < validLen:
+                nextBuf = next(gen, None)
+                if nextBuf is None:
+                    validLen = len(ringBuf)
+                    break
+                ringBuf.push(nextBuf)
+        if validLen == 0:
+            return 0
+        outBuf = buf[:validLen]
+        for (_, ringBuf, gain, _) in self._sources:
+            # ringBuf is not pushed until the next call, so sigBuf can be modified
+            sigBuf = ringBuf.pop(validLen)
+            if gain != 1:
+                _np.multiply(sigBuf, gain, out=sigBuf)
+            if sigBuf.ndim < outBuf.ndim:
+                sigBuf = sigBuf[:, None]
+            self.inPlaceFunc(outBuf, sigBuf, out=outBuf)
+        return validLen if validLen < len(buf) else None
 
-    @classmethod
-    def fromNpArray(cls,
-                    npArray: _np.ndarray,
-                    bufferSize: Optional[int] = 4096):
+
+class _PartitionedConvolver:
+    """
+    Streaming convolution with a (possibly long) impulse response
+        by uniformly partitioned overlap-save in the frequency domain.
+    The impulse response is cut into partitions of partitionSize frames,
+        and the spectra of the past input blocks are kept in a frequency domain delay line,
+        so each block costs one FFT, one inverse FFT,
+        and one complex multiply-accumulate per partition.
+    Multi-channel blocks (frames, channels) are convolved channel by channel
+        with the same impulse response.
+    ---
+    Methods:
+        process
+    """
+    _partitionSize = None
+    _partitionCount = None
+    # spectra of the partitions of the impulse response, shape (partitionCount, partitionSize + 1)
+    _irSpectra = None
+    # () for mono, (channels, ) otherwise
+    _channelShape = ()
+    # frequency domain delay line, stored twice so that
+    #   _fdl[_head:_head + _partitionCount] is always the newest to oldest spectra
+    _fdl = None
+    _head = 0
+    # the last two input blocks
+    _inBuf = None
+    _accBuf = None
+
+    def __init__(self,
+                 impulseResponse: _np.ndarray,
+                 partitionSize: int = 4096,
+                 channels: int = 1):
         """
-        Constuct AudioOutputSignal from a numpy.ndarray.
+        Constructor for _PartitionedConvolver class.
         ---
         Parameter:
-            npArray:
+            impulseResponse:
                 Type: numpy.ndarray
-                The data for the signal.
-                npArray will be flatten to 1D and casted to float32 type.
-            bufferSize:
-                Type: Optional[int]
+                The impulse response, flattened to 1D
+            partitionSize:
+                Type: int
                 Default: 4096
-                The buffer size for the object.
-                If None, the whole data will be taken as one buffer,
-                    which may deteriorate the performance if npArray is too large.
+                The number of frames in each partition, and the size of the blocks processed
+            channels:
+                Type: int
+                Default: 1
+                The number of channels of the blocks
         """
-        npArray = npArray.reshape(-1)
-        if npArray.dtype != _np.float32:
-            npArray = npArray.astype(_np.float32)
-        elif bufferSize is None:
-            bufferSize = len(npArray)
-        arrLen = len(npArray)
-        nPieces = (arrLen + bufferSize - 1) // bufferSize
-        return cls((npArray[bIdx * bufferSize:min((bIdx + 1) * bufferSize,
-                                                  arrLen)]
-                    for bIdx in range(nPieces)),
-                   bufSize=bufferSize,
-                   length=nPieces)
+        impulseResponse = _np.asarray(impulseResponse, dtype=_np.float64).reshape(-1)
+        self._partitionSize = partitionSize
+        self._partitionCount = max(
+            (len(impulseResponse) + partitionSize - 1) // partitionSize, 1)
+        paddedIR = _np.zeros((self._partitionCount, 2 * partitionSize))
+        partitionedIR = _np.zeros(self._partitionCount * partitionSize)
+        partitionedIR[:len(impulseResponse)] = impulseResponse
+        paddedIR[:, :partitionSize] = partitionedIR.reshape(self._partitionCount,
+                                                            partitionSize)
+        self._channelShape = (channels, ) if channels != 1 else ()
+        self._irSpectra = _np.fft.rfft(paddedIR, axis=1)
+        self._fdl = _np.zeros((2 * self._partitionCount, partitionSize + 1)
+                              + self._channelShape,
+                              dtype=_np.complex128)
+        self._head = 0
+        self._inBuf = _np.zeros((2 * partitionSize, ) + self._channelShape)
+        self._accBuf = _np.empty((partitionSize + 1, ) + self._channelShape,
+                                 dtype=_np.complex128)
 
-    @classmethod
-    def fromAmpFunc(cls,
-                    ampFunc: Callable,
-                    duration: Optional[float] = 1.,
-                    bufferSize: Optional[int] = 4096,
-                    sampleRate: int = 48000):
+    def process(self, buf: Optional[_np.ndarray] = None):
         """
-        Constuct AudioOutputSignal from a function that gives the amplitude.
+        Convolve the next block of input.
+        buf has at most partitionSize frames. If it is shorter, the rest is taken as zero.
+        If buf is None, a block of zeros is processed (to flush the tail).
+        Returns a new float32 array of partitionSize frames (of the same channels as buf).
+        """
+        size = self._partitionSize
+        self._inBuf[:size] = self._inBuf[size:]
+        if buf is None:
+            self._inBuf[size:] = 0
+        else:
+            bufLen = len(buf)
+            self._inBuf[size:size + bufLen] = buf
+            self._inBuf[size + bufLen:] = 0
+        self._head = (self._head - 1) % self._partitionCount
+        spectrum = _np.fft.rfft(self._inBuf, axis=0)
+        self._fdl[self._head] = spectrum
+        self._fdl[self._head + self._partitionCount] = spectrum
+        _np.einsum('kf...,kf->f...',
+                   self._fdl[self._head:self._head + self._partitionCount],
+                   self._irSpectra,
+                   out=self._accBuf)
+        return _np.fft.irfft(self._accBuf, n=2 * size, axis=0)[size:] \
+            .astype(_np.float32)
+
+
+class _PolyphaseResampler:
+    """
+    Streaming rational resampling by a polyphase FIR filter.
+    The rate is changed by upRate / downRate (in lowest terms),
+        where the output frame n is computed from the input around n * downRate / upRate
+        with the phase (n * downRate) % upRate of a Kaiser-windowed sinc lowpass filter.
+    Only tapsPerPhase input frames are kept between blocks,
+        so the latency is bounded by tapsPerPhase / 2 input frames.
+    ---
+    Methods:
+        process
+    """
+    _upRate = 1
+    _downRate = 1
+    _tapsPerPhase = 0
+    # shape (upRate, tapsPerPhase), each row reversed so it can be dotted with the input window
+    _phaseTaps = None
+    # the last tapsPerPhase - 1 input frames
+    _history = None
+    # output frames computed so far
+    _outCount = 0
+    # input frames consumed so far (without the history)
+    _inCount = 0
+    # delay of the filter, in frames of the upsampled rate
+    _delay = 0
+
+    def __init__(self,
+                 oldRate: int,
+                 newRate: int,
+                 channels: int = 1,
+                 tapsPerPhase: int = 32,
+                 kaiserBeta: float = 8.6):
+        """
+        Constructor for _PolyphaseResampler class.
         ---
         Parameter:
-            ampFunc:
-                Type: callable
-                The function that gives the amplitude.
-                Must take only one input (time)
-                To speed up the calculation, this function will be vectoized first.
-            duration:
-                Type: Optional[float]
-                Default: 1.0
-                The duration of the signal, in seconds.
-                ampFunc will be called with input values in [0, duration]
-            bufferSize:
-                Type: Optional[int]
-                Default: 4096
-                The buffer size for the object.
-                If None, the whole data will be taken as one buffer,
-                    which may deteriorate the performance if npArray is too large.
-            sampleRate:
+            oldRate:
                 Type: int
-                Default: 48000
-                The sample rate of the output signal.
+                The sample rate of the input
+            newRate:
+                Type: int
+                The sample rate of the output
+            channels:
+                Type: int
+                Default: 1
+                The number of channels of the blocks
+            tapsPerPhase:
+                Type: int
+                Default: 32
+                The number of taps in each phase of the filter
+                More taps give a sharper lowpass filter
+                When downsampling, it is multiplied by ceil(oldRate / newRate)
+            kaiserBeta:
+                Type: float
+                Default: 8.6
+                The beta parameter of the Kaiser window
+                Larger values give more stopband attenuation but a wider transition band
         """
-        ampFunc_formatted = _np.vectorize(ampFunc)
-        if duration is not None:
-            totalSamples = int(duration * sampleRate)
-            if bufferSize is None:
-                bufferSize = totalSamples
-            nPieces = (totalSamples + bufferSize - 1) // bufferSize
-            return cls(
-                (ampFunc_formatted(_np.arange(bIdx * bufferSize,
-                                              min((bIdx + 1) * bufferSize,
-                                                  totalSamples))
-                                   / sampleRate)
-                 for bIdx in range(nPieces)),
-                bufSize=bufferSize,
-                length=nPieces)
+        rateGcd = _math.gcd(oldRate, newRate)
+        self._upRate = newRate // rateGcd
+        self._downRate = oldRate // rateGcd
+        # when downsampling, the filter is longer in input frames by the same ratio
+        tapsPerPhase *= -(-self._downRate // self._upRate)
+        self._tapsPerPhase = tapsPerPhase
+        tapCount = self._upRate * tapsPerPhase
+        # odd length so that the delay is a whole number of frames, the last tap is zero if needed
+        filterLen = tapCount - 1 + tapCount % 2
+        # cutoff at the lower Nyquist frequency, in cycles per upsampled frame
+        cutoff = 0.5 / max(self._upRate, self._downRate)
+        t = _np.arange(filterLen) - (filterLen - 1) / 2
+        taps = _np.zeros(tapCount)
+        taps[:filterLen] = 2 * cutoff * _np.sinc(2 * cutoff * t) \
+            * _np.kaiser(filterLen, kaiserBeta)
+        taps *= self._upRate / _np.sum(taps)
+        # taps[p + k * upRate] is the k-th tap of phase p
+        self._phaseTaps = taps.reshape(tapsPerPhase, self._upRate).T[:, ::-1].copy()
+        self._delay = (filterLen - 1) // 2
+        self._history = _np.zeros((tapsPerPhase - 1, )
+                                  + ((channels, ) if channels != 1 else ()))
+        self._outCount = 0
+        self._inCount = 0
+
+    def process(self, buf: Optional[_np.ndarray] = None):
+        """
+        Resample the next block of input.
+        If buf is None, the input is taken as ended,
+            and the remaining output frames are computed with zeros as input.
+        Returns a new float32 array of the output frames that can be computed so far.
+        """
+        if buf is None:
+            inLen = self._inCount
+            # the output that corresponds to all the input frames
+            outTarget = (inLen * self._upRate + self._downRate - 1) // self._downRate
+            buf = _np.zeros((self._tapsPerPhase, ) + self._history.shape[1:])
         else:
-            if bufferSize is None:
-                raise ValueError("No bufferSize provided")
-            return cls((ampFunc_formatted(_np.arange(bIdx * bufferSize,
-                                                     (bIdx + 1) * bufferSize)
-                                          / sampleRate)
-                        for bIdx in _it.count()),
-                       bufSize=bufferSize,
-                       length=float('inf'))
+            outTarget = None
+        # window index i ends at input frame self._inCount + i
+        inputBuf = _np.concatenate((self._history, buf))
+        availEnd = self._inCount + len(buf)
+        # output n needs the input frame (n * downRate + delay) // upRate
+        outEnd = (availEnd * self._upRate - 1 - self._delay) // self._downRate + 1
+        if outTarget is not None:
+            outEnd = min(outEnd, outTarget)
+        outIdx = _np.arange(self._outCount, max(outEnd, self._outCount), dtype=_np.int64)
+        upIdx = outIdx * self._downRate + self._delay
+        inIdx = upIdx // self._upRate - self._inCount
+        windows = _np.lib.stride_tricks.sliding_window_view(
+            inputBuf, self._tapsPerPhase, axis=0)
+        res = _np.einsum('n...k,nk->n...',
+                         windows[inIdx],
+                         self._phaseTaps[upIdx % self._upRate]).astype(_np.float32)
+        self._outCount += len(outIdx)
+        self._inCount = availEnd
+        self._history = inputBuf[len(inputBuf) - (self._tapsPerPhase - 1):].copy()
+        return res
 
-    @classmethod
-    def fromFreqFunc(cls,
-                     freqFunc: Callable,
-                     duration: Optional[float] = 1.,
-                     amplitude: float = 1.,
-                     initPhase: float = 0.,
-                     bufferSize: Optional[int] = 4096,
-                     sampleRate: int = 48000):
+
+class _BlockStore:
+    """
+    The blocks of a signal, computed on demand from its generator
+        and shared by any number of readers (see AudioOutputSignal.cache).
+    The blocks are kept as read-only float32 arrays.
+    When the blocks in memory take more than memoryLimit bytes,
+        the least recently used ones are saved to a temporary directory
+        and loaded back when they are read again.
+    When the saved blocks take more than spillLimit bytes,
+        the least recently used ones are deleted,
+        and reading them again raises a ValueError.
+    The temporary directory is removed when the store is closed or garbage collected.
+    Thread-safe.
+    ---
+    Properties:
+        frameCount:
+            Read-only
+            The number of frames computed so far
+        isComplete:
+            Read-only
+            Whether the generator has run out
+        spilledBlockCount:
+            Read-only
+            The number of blocks that are saved to disk
+        droppedBlockCount:
+            Read-only
+            The number of blocks deleted from disk to stay within spillLimit
+    ---
+    Methods:
+        fill
+        reader
+        close
+    """
+    _srcGen = None
+    _isComplete = False
+    # the end frame of each block computed so far
+    _blockEnds = None
+    # block index -> array, in order of last use
+    _memBlocks = None
+    _memBytes = 0
+    _memoryLimit = 0
+    # block index -> (path, size) of the saved array, in order of last use
+    _spillPaths = None
+    _spillBytes = 0
+    _spillLimit = 0
+    _droppedBlockCount = 0
+    _spillRoot = None
+    _spillDir = None
+    _finalizer = None
+    _lock = None
+
+    def __init__(self,
+                 gen: Iterable,
+                 memoryLimit: int = 64 * 2**20,
+                 spillLimit: int = 2**30,
+                 spillDir: Optional[str] = None):
         """
-        Constuct AudioOutputSignal from a function that gives the frequency.
+        Constructor for _BlockStore class.
         ---
         Parameter:
-            freqFunc:
-                Type: callable
-                The function that gives the frequency.
-                Must take only one input (time)
-                The amplitude will be determined by sine function.
-                To speed up the calculation, this function will be vectoized first.
-            duration:
-                Type: Optional[float]
-                Default: 1.0
-                The duration of the signal, in seconds.
-                ampFunc will be called with input values in [0, duration]
-            amplitude:
-                Type: float
-                Default: 1.0
-                The amplitude of the output singal.
-            initPhase:
-                Type: float
-                Default: 0.0
-                The initial Phase for the sine function.
-            bufferSize:
-                Type: Optional[int]
-                Default: 4096
-                The buffer size for the object.
-                If None, the whole data will be taken as one buffer,
-                    which may deteriorate the performance if npArray is too large.
-            sampleRate:
+            gen:
+                Type: Iterable
+                The generator of the blocks
+            memoryLimit:
                 Type: int
-                Default: 48000
-                The sample rate of the output signal.
+                Default: 64 * 2**20
+                The number of bytes of blocks to keep in memory
+                The most recently used block is always kept
+            spillLimit:
+                Type: int
+                Default: 2**30
+                The number of bytes of blocks to keep on disk
+            spillDir:
+                Type: Optional[str]
+                Default: None
+                The directory in which the temporary directory is created
+                If None, the system default is used
         """
-        return cls.fromAmpFunc(ampFunc=lambda t: amplitude
-                               * _np.sin(2 * _np.pi * t
-                                         * freqFunc(t)
-                                         + initPhase),
-                               duration=duration,
-                               bufferSize=bufferSize,
-                               sampleRate=sampleRate)
+        self._srcGen = iter(gen)
+        self._isComplete = False
+        self._blockEnds = []
+        self._memBlocks = _OrderedDict()
+        self._memBytes = 0
+        self._memoryLimit = memoryLimit
+        self._spillPaths = _OrderedDict()
+        self._spillBytes = 0
+        self._spillLimit = spillLimit
+        self._droppedBlockCount = 0
+        self._spillRoot = spillDir
+        self._spillDir = None
+        self._finalizer = None
+        self._lock = _threading.RLock()
 
-    @classmethod
-    def silentSignal(cls,
-                     duration: Optional[float] = 1.,
-                     bufferSize: Optional[int] = 4096,
-                     sampleRate: int = 48000):
+    @property
+    def frameCount(self):
+        return self._blockEnds[-1] if len(self._blockEnds) != 0 else 0
+
+    @property
+    def isComplete(self):
+        return self._isComplete
+
+    @property
+    def spilledBlockCount(self):
+        return len(self._spillPaths)
+
+    @property
+    def droppedBlockCount(self):
+        return self._droppedBlockCount
+
+    def _keep(self, blockIdx: int, block: _np.ndarray):
+        self._memBlocks[blockIdx] = block
+        self._memBytes += block.nbytes
+        while self._memBytes > self._memoryLimit and len(self._memBlocks) > 1:
+            (oldIdx, oldBlock) = self._memBlocks.popitem(last=False)
+            self._memBytes -= oldBlock.nbytes
+            if oldIdx not in self._spillPaths:
+                if self._spillDir is None:
+                    self._spillDir = _tempfile.mkdtemp(prefix='audioCache',
+                                                       dir=self._spillRoot)
+                    self._finalizer = _weakref.finalize(self,
+                                                        _shutil.rmtree,
+                                                        self._spillDir,
+                                                        True)
+                path = _os.path.join(self._spillDir, f"{oldIdx}.npy")
+                _np.save(path, oldBlock)
+                self._spillPaths[oldIdx] = (path, oldBlock.nbytes)
+                self._spillBytes += oldBlock.nbytes
+                while self._spillBytes > self._spillLimit:
+                    (_, (dropPath, dropBytes)) = self._spillPaths.popitem(last=False)
+                    _os.remove(dropPath)
+                    self._spillBytes -= dropBytes
+                    self._droppedBlockCount += 1
+
+    def fill(self, frameCount: int):
         """
-        Constuct AudioOutputSignal that gives an empty signal.
-        ---
-        Parameter:
-            duration:
-                Type: Optional[float]
-                Default: 1.0
-                The duration of the signal, in seconds.
-                ampFunc will be called with input values in [0, duration]
-            bufferSize:
-                Type: Optional[int]
-                Default: 4096
-                The buffer size for the object.
-                If None, the whole data will be taken as one buffer,
-                    which may deteriorate the performance if npArray is too large.
-            sampleRate:
-                Type: int
-                Default: 48000
-                The sample rate of the output signal.
+        Compute the blocks until at least frameCount frames are computed
+            or the generator runs out.
+        Returns the number of frames computed so far.
         """
-        return cls.fromAmpFunc(ampFunc=lambda t: 0.,
-                               duration=duration,
-                               bufferSize=bufferSize,
-                               sampleRate=sampleRate)
+        with self._lock:
+            while not self._isComplete and self.frameCount < frameCount:
+                buf = next(self._srcGen, None)
+                if buf is None:
+                    self._isComplete = True
+                    self._srcGen = None
+                    break
+                if len(buf) == 0:
+                    continue
+                # buf may be reused by the generator
+                block = _np.array(buf, dtype=_np.float32)
+                block.flags.writeable = False
+                self._blockEnds.append(self.frameCount + len(block))
+                self._keep(len(self._blockEnds) - 1, block)
+            return self.frameCount
 
-    @classmethod
-    def sineWave(cls,
-                 frequency: float,
-                 duration: Optional[float] = 1.,
-                 amplitude: float = 1.,
-                 initPhase: float = 0.,
-                 bufferSize: Optional[int] = 4096,
+    def _getBlock(self, blockIdx: int):
+        # the block must have been computed
+        with self._lock:
+            block = self._memBlocks.get(blockIdx, None)
+            if block is not None:
+                self._memBlocks.move_to_end(blockIdx)
+                return block
+            if blockIdx not in self._spillPaths:
+                raise ValueError(f"Block {blockIdx} of the cache was deleted, "
+                                 "increase spillLimit to read it again")
+            self._spillPaths.move_to_end(blockIdx)
+            block = _np.load(self._spillPaths[blockIdx][0])
+            block.flags.writeable = False
+            self._keep(blockIdx, block)
+            return block
+
+    def reader(self, startFrame: int = 0, endFrame: Optional[int] = None):
+        """
+        Returns a generator of the read-only blocks from the frame startFrame to endFrame (exclusive).
+        If endFrame is None, the generator continues until the source runs out.
+        Blocks are computed only when they are first needed.
+        """
+        def _reader_gen(frameIdx):
+            while endFrame is None or frameIdx < endFrame:
+                if self.fill(frameIdx + 1) <= frameIdx:
+                    return
+                blockIdx = _bisect.bisect_right(self._blockEnds, frameIdx)
+                blockStart = self._blockEnds[blockIdx - 1] if blockIdx != 0 else 0
+                block = self._getBlock(blockIdx)
+                block = block[frameIdx - blockStart:
+                              (endFrame - blockStart if endFrame is not None else None)]
+                frameIdx += len(block)
+                yield block
+
+        return _reader_gen(startFrame)
+
+    def close(self):
+        """
+        Release the blocks and remove the temporary directory.
+        The store cannot be used afterwards.
+        """
+        with self._lock:
+            self._srcGen = None
+            self._isComplete = True
+            self._blockEnds = []
+            self._memBlocks.clear()
+            self._memBytes = 0
+            self._spillPaths.clear()
+            self._spillBytes = 0
+            if self._finalizer is not None:
+                self._finalizer()
+
+
+class OscillatorBank:
+    """
+    A bank of oscillators sharing one waveform, advanced together buffer by buffer.
+    The phase of each voice is accumulated (in cycles, wrapped to [0, 1))
+        instead of computed from the absolute time,
+        so the precision does not degrade for long signals.
+    The waveform is looked up from a table with linear interpolation.
+    ---
+    Properties:
+        voiceCount:
+            Read-only
+            The number of voices in the bank
+    ---
+    Methods:
+        Class methods:
+            getWavetable
+        Member methods:
+            render
+            seek
+            copy
+    """
+    # number of entries in each wavetable, must be a power of 2
+    _tableSize = 4096
+    # cache of (table, slope) keyed by waveform name
+    _wavetables = {}
+    # per-frame phase increment of each voice, in cycles
+    _phaseInc = None
+    # current phase of each voice, in cycles
+    _phase = None
+    # phase of each voice at frame 0, in cycles
+    _initPhase = None
+    # amplitude of each voice
+    _amp = None
+    _table = None
+    _slope = None
+    # scratch buffers of shape (voiceCount, bufferSize)
+    _phaseBuf = None
+    _idxBuf = None
+    _valBuf = None
+
+    def __init__(self,
+                 frequencies: Union[float, Iterable],
+                 amplitudes: Union[float, Iterable] = 1.,
+                 initPhases: Union[float, Iterable] = 0.,
+                 waveform: str = 'sine',
                  sampleRate: int = 48000):
         """
-        Constuct AudioOutputSignal that gives a constant frequency signal.
+        Constructor for OscillatorBank class.
         ---
         Parameter:
-            frequency:
-                Type: float
-                The frequency of the output signal, in Hz.
-            duration:
-                Type: Optional[float]
+            frequencies:
+                Type: Union[float, Iterable]
+                The frequencies of the voices, in Hz
+            amplitudes:
+                Type: Union[float, Iterable]
                 Default: 1.0
-                The duration of the signal, in seconds.
-                ampFunc will be called with input values in [0, duration]
-            amplitude:
-                Type: float
-                Default: 1.0
-                The amplitude of the output singal.
-            initPhase:
-                Type: float
+                The peak amplitudes of the voices
+                If a float is given, the same amplitude will be used for all voices
+            initPhases:
+                Type: Union[float, Iterable]
                 Default: 0.0
-                The initial Phase for the sine function.
-            bufferSize:
-                Type: Optional[int]
-                Default: 4096
-                The buffer size for the object.
-                If None, the whole data will be taken as one buffer,
-                    which may deteriorate the performance if npArray is too large.
+                The initial phases of the voices, in radians
+                If a float is given, the same initial phase will be used for all voices
+            waveform:
+                Type: str
+                Default: 'sine'
+                The waveform of the voices
+                See help(OscillatorBank.getWavetable) for available waveforms
             sampleRate:
                 Type: int
                 Default: 48000
-                The sample rate of the output signal.
+                The sample rate of the output signal
+        ---
+        Exception:
+            If the parameters cannot be broadcasted to the same length,
+                or waveform is unknown, a ValueError will be raised
+        """
+        self._phaseInc = _np.atleast_1d(
+            _np.asarray(frequencies, dtype=_np.float64)) / sampleRate
+        voiceCount = len(self._phaseInc)
+        self._amp = _np.broadcast_to(
+            _np.asarray(amplitudes, dtype=_np.float64), (voiceCount, )).copy()
+        self._initPhase = _np.broadcast_to(
+            _np.asarray(initPhases, dtype=_np.float64) / (2 * _np.pi),
+            (voiceCount, )) % 1.
+        self._phase = self._initPhase.copy()
+        self._table, self._slope = self.getWavetable(waveform)
+
+    @property
+    def voiceCount(self):
+        """
+        The number of voices in the bank.
+        Read-only property.
         """
-        return cls.fromFreqFunc(freqFunc=lambda t: frequency,
-                                duration=duration,
-                                amplitude=amplitude,
-                                initPhase=initPhase,
-                                bufferSize=bufferSize,
-                                sampleRate=sampleRate)
+        return len(self._phaseInc)
 
     @classmethod
-    def unitSound(cls, frequency: float):
+    def getWavetable(cls, waveform: str = 'sine'):
         """
-        Constuct AudioOutputSignal that gives an empty signal.
-        Wrapper of sineWave.
-        The duration is exactly one period of the signal.
-        All other parameters for sineWave are the default parameters.
+        Get the wavetable of one period of the waveform.
         ---
         Parameter:
-            frequency:
-                Type: float
-                The frequency of the output signal.
+            waveform:
+                Type: str
+                Default: 'sine'
+                The waveform, case-insensitive. Currently accept:
+                    'sine':     sin(2 pi p)
+                    'square':   sign(sin(2 pi p))
+                    'saw':      2 p - 1
+                    'triangle': 2 |2 p - 1| - 1
+                    where p in [0, 1) is the phase in cycles
+        ---
+        Return:
+            A tuple (table, slope) of 1D numpy.ndarray
+            slope[i] is the difference between the (i + 1)-th and the i-th entries,
+                periodically extended
+        ---
+        Exception:
+            If waveform is unknown, a ValueError will be raised
         """
-        return cls.sineWave(frequency=frequency,
-                            duration=1. / frequency)
+        waveform = waveform.lower()
+        if waveform not in cls._wavetables:
+            p = _np.arange(cls._tableSize) / cls._tableSize
+            waveFuncDict = {
+                'sine': lambda p: _np.sin(2 * _np.pi * p),
+                'square': lambda p: _np.where(p < 0.5, 1., -1.),
+                'saw': lambda p: 2 * p - 1,
+                'triangle': lambda p: 2 * _np.abs(2 * p - 1) - 1,
+            }
+            if waveform not in waveFuncDict:
+                raise ValueError(f"Unknown waveform {waveform}")
+            table = waveFuncDict[waveform](p)
+            cls._wavetables[waveform] = (table,
+                                         _np.roll(table, -1) - table)
+        return cls._wavetables[waveform]
 
-    @classmethod
-    def squareWave(cls,
-                   frequency: float,
-                   duration: Optional[float] = 1.,
-                   amplitude: float = 1.,
-                   bufferSize: Optional[int] = 4096,
-                   sampleRate: int = 48000):
+    def render(self,
+               frameCount: int,
+               out: Optional[_np.ndarray] = None,
+               freqMultiplier: Optional[_np.ndarray] = None):
         """
-        Constuct AudioOutputSignal that gives a square wave.
+        Compute the next frameCount frames of the sum of all voices,
+            and advance the phases.
         ---
         Parameter:
-            frequency:
-                Type: float
-                The frequency of the output signal, in Hz.
-            duration:
-                Type: Optional[float]
-                Default: 1.0
-                The duration of the signal, in seconds.
-                ampFunc will be called with input values in [0, duration]
-            amplitude:
-                Type: float
-                Default: 1.0
-                The amplitude of the output singal.
-            initPhase:
-                Type: float
-                Default: 0.0
-                The initial Phase for the sine function.
-            bufferSize:
-                Type: Optional[int]
-                Default: 4096
-                The buffer size for the object.
-                If None, the whole data will be taken as one buffer,
-                    which may deteriorate the performance if npArray is too large.
-            sampleRate:
+            frameCount:
                 Type: int
-                Default: 48000
-                The sample rate of the output signal.
+                The number of frames to compute
+            out:
+                Type: Optional[numpy.ndarray]
+                Default: None
+                A float64 array of length frameCount to write the result into
+                If None, a new array will be allocated
+            freqMultiplier:
+                Type: Optional[numpy.ndarray]
+                Default: None
+                A 1D array of length frameCount that multiplies the frequencies of all voices
+                    frame by frame (e.g. from Envelope.render)
+                If None, the frequencies are constant
+                Once used, seek no longer gives the right phases
+        ---
+        Return:
+            The mixed signal as a 1D numpy.ndarray
         """
-        return cls.fromAmpFunc(ampFunc=lambda t:
-                               amplitude * _np.sign(
-                                   _np.sin(2 * _np.pi
-                                           * frequency * t)),
-                               duration=duration,
-                               bufferSize=bufferSize,
-                               sampleRate=sampleRate)
+        valBuf = self._renderVoices(frameCount, freqMultiplier=freqMultiplier)
+        if out is None:
+            out = _np.empty(frameCount)
+        _np.matmul(self._amp, valBuf, out=out)
+        return out
 
-    @classmethod
-    def sawWave(cls,
-                frequency: float,
-                duration: Optional[float] = 1.,
-                amplitude: float = 1.,
-                bufferSize: Optional[int] = 4096,
-                sampleRate: int = 48000):
+    def _renderVoices(self,
+                      frameCount: int,
+                      voiceIdx: Optional[_np.ndarray] = None,
+                      freqMultiplier: Optional[_np.ndarray] = None):
         """
-        Constuct AudioOutputSignal that gives a saw wave.
+        Compute the next frameCount frames of each voice in voiceIdx (all voices if None)
+            without their amplitudes, and advance their phases.
+        Returns a view of shape (number of voices, frameCount) into a scratch buffer,
+            which is only valid until the next call.
+        """
+        if voiceIdx is None:
+            phaseInc, phase = self._phaseInc, self._phase
+        else:
+            phaseInc, phase = self._phaseInc[voiceIdx], self._phase[voiceIdx]
+        rowCount = len(phaseInc)
+        if self._phaseBuf is None \
+                or self._phaseBuf.shape[0] < rowCount \
+                or self._phaseBuf.shape[1] < frameCount:
+            bufShape = (max(rowCount, self.voiceCount), frameCount)
+            self._phaseBuf = _np.empty(bufShape)
+            self._idxBuf = _np.empty(bufShape, dtype=_np.intp)
+            self._valBuf = _np.empty(bufShape)
+        phaseBuf = self._phaseBuf[:rowCount, :frameCount]
+        idxBuf = self._idxBuf[:rowCount, :frameCount]
+        valBuf = self._valBuf[:rowCount, :frameCount]
+        # phase in table entries
+        if freqMultiplier is None:
+            phaseAdvance = frameCount
+            _np.multiply(phaseInc[:, None],
+                         _np.arange(frameCount),
+                         out=phaseBuf)
+        else:
+            # the phase increment accumulated before each frame
+            accumMultiplier = _np.cumsum(freqMultiplier)
+            phaseAdvance = accumMultiplier[-1] if frameCount != 0 else 0.
+            _np.multiply(phaseInc[:, None],
+                         _np.subtract(accumMultiplier, freqMultiplier, out=accumMultiplier),
+                         out=phaseBuf)
+        _np.add(phaseBuf, phase[:, None], out=phaseBuf)
+        _np.multiply(phaseBuf, self._tableSize, out=phaseBuf)
+        # split into table index (wrapped) and fractional part
+        _np.floor(phaseBuf, out=valBuf)
+        _np.subtract(phaseBuf, valBuf, out=phaseBuf)
+        _np.copyto(idxBuf, valBuf, casting='unsafe')
+        _np.bitwise_and(idxBuf, self._tableSize - 1, out=idxBuf)
+        # linear interpolation
+        _np.take(self._slope, idxBuf, out=valBuf)
+        _np.multiply(valBuf, phaseBuf, out=valBuf)
+        _np.add(valBuf, _np.take(self._table, idxBuf, out=phaseBuf), out=valBuf)
+        newPhase = _np.modf(phase + phaseInc * phaseAdvance)[0] % 1.
+        if voiceIdx is None:
+            self._phase = newPhase
+        else:
+            self._phase[voiceIdx] = newPhase
+        return valBuf
+
+    def seek(self, frameIndex: int):
+        """
+        Set the phases so that the next render starts from frame frameIndex (counted from 0).
+        """
+        self._phase = _np.modf(self._initPhase + self._phaseInc * frameIndex)[0] % 1.
+
+    def copy(self):
+        """
+        Returns a bank of the same voices at the same phases,
+            which can be rendered and seeked independently of this one.
+        """
+        res = self.__class__.__new__(self.__class__)
+        res._phaseInc = self._phaseInc.copy()
+        res._amp = self._amp.copy()
+        res._initPhase = self._initPhase
+        res._phase = self._phase.copy()
+        res._table, res._slope = self._table, self._slope
+        return res
+
+
+class Envelope:
+    """
+    A piecewise curve through breakpoints, for automating a scalar parameter
+        (e.g. gain, frequency, pan) over time.
+    Each segment goes from the value v0 of a breakpoint to the value v1 of the next one as
+        v0 + (v1 - v0) * (1 - exp(c x)) / (1 - exp(c)), x from 0 to 1,
+        where c is the curvature of the segment:
+            0 gives a linear ramp,
+            negative values change fast first (like an exponential decay),
+            positive values change slowly first
+    Two breakpoints at the same time give a jump.
+    The value before the first breakpoint is the first value,
+        and the last value is held after the last breakpoint.
+    The coefficients of the segments are tabulated once for each sample rate,
+        so rendering a block only evaluates the few segments it overlaps, in place.
+    ---
+    Properties:
+        duration:
+            Read-only
+            The time of the last breakpoint, in seconds
+    ---
+    Methods:
+        Class methods:
+            adsr
+        Member methods:
+            render
+            valueAt
+            endFrame
+    """
+    # times (in seconds) and values of the breakpoints
+    _times = None
+    _values = None
+    # curvature of each segment
+    _curvatures = None
+    # sample rate -> segment tables, see _tablesFor
+    _tables = None
+    # shared ramp 0, 1, 2, ..., only grows
+    _ramp = _np.arange(4096, dtype=_np.float64)
+
+    def __init__(self,
+                 breakpoints: Iterable,
+                 curvature: Union[float, Iterable] = 0.):
+        """
+        Constructor for Envelope class.
         ---
         Parameter:
-            frequency:
-                Type: float
-                The frequency of the output signal, in Hz.
-            duration:
-                Type: Optional[float]
-                Default: 1.0
-                The duration of the signal, in seconds.
-                ampFunc will be called with input values in [0, duration]
-            amplitude:
-                Type: float
-                Default: 1.0
-                The amplitude of the output singal.
-            bufferSize:
-                Type: Optional[int]
-                Default: 4096
-                The buffer size for the object.
-                If None, the whole data will be taken as one buffer,
-                    which may deteriorate the performance if npArray is too large.
-            sampleRate:
-                Type: int
-                Default: 48000
-                The sample rate of the output signal.
+            breakpoints:
+                Type: Iterable[tuple[float, float]]
+                The (time, value) pairs of the breakpoints, time in seconds
+                Must be non-empty and sorted by time
+            curvature:
+                Type: Union[float, Iterable]
+                Default: 0.0
+                The curvature of each segment between consecutive breakpoints
+                If a float is given, the same curvature will be used for all segments
+        ---
+        Exception:
+            If there is no breakpoint, the times are not sorted,
+                or the number of curvatures does not match, a ValueError will be raised
         """
-        return cls.fromAmpFunc(ampFunc=lambda t:
-                               amplitude * (_np.modf(
-                                   t * frequency)[0] * 2 - 1),
-                               duration=duration,
-                               bufferSize=bufferSize,
-                               sampleRate=sampleRate)
+        breakpoints = _np.array(list(breakpoints), dtype=_np.float64).reshape(-1, 2)
+        if len(breakpoints) == 0:
+            raise ValueError("No breakpoint given")
+        if _np.any(_np.diff(breakpoints[:, 0]) < 0):
+            raise ValueError("Breakpoints are not sorted by time")
+        self._times = breakpoints[:, 0].copy()
+        self._values = breakpoints[:, 1].copy()
+        try:
+            self._curvatures = _np.broadcast_to(
+                _np.asarray(curvature, dtype=_np.float64),
+                (len(self._times) - 1, )).copy()
+        except ValueError:
+            raise ValueError("The number of curvatures does not match the segments")
+        self._tables = {}
 
     @classmethod
-    def triangleWave(cls,
-                     frequency: float,
-                     duration: Optional[float] = 1.,
-                     amplitude: float = 1.,
-                     bufferSize: Optional[int] = 4096,
-                     sampleRate: int = 48000):
+    def adsr(cls,
+             attack: float = 0.01,
+             decay: float = 0.1,
+             sustain: float = 0.7,
+             release: float = 0.2,
+             noteDuration: Optional[float] = None,
+             peak: float = 1.,
+             curvature: float = -4.):
         """
-        Constuct AudioOutputSignal that gives a triangle wave.
+        Construct an attack-decay-sustain-release envelope.
         ---
         Parameter:
-            frequency:
+            attack:
                 Type: float
-                The frequency of the output signal, in Hz.
-            duration:
+                Default: 0.01
+                The time to rise linearly from 0 to peak, in seconds
+            decay:
+                Type: float
+                Default: 0.1
+                The time to fall from peak to sustain, in seconds
+            sustain:
+                Type: float
+                Default: 0.7
+                The level held until the note is released
+            release:
+                Type: float
+                Default: 0.2
+                The time to fall to 0 after the note is released, in seconds
+            noteDuration:
                 Type: Optional[float]
-                Default: 1.0
-                The duration of the signal, in seconds.
-                ampFunc will be called with input values in [0, duration]
-            amplitude:
+                Default: None
+                The time at which the note is released, in seconds
+                If it is within the attack or decay, the release starts from the level reached
+                If None, the sustain level is held forever
+            peak:
                 Type: float
                 Default: 1.0
-                The amplitude of the output singal.
-            bufferSize:
-                Type: Optional[int]
-                Default: 4096
-                The buffer size for the object.
-                If None, the whole data will be taken as one buffer,
-                    which may deteriorate the performance if npArray is too large.
-            sampleRate:
-                Type: int
-                Default: 48000
-                The sample rate of the output signal.
+                The level at the end of the attack
+            curvature:
+                Type: float
+                Default: -4.0
+                The curvature of the decay and the release
+        ---
+        Return:
+            An Envelope object
         """
-        return cls.fromAmpFunc(ampFunc=lambda t: amplitude
-                               * (2 * _np.abs(2 * _np.modf(
-                                   t * frequency)[0] - 1) - 1),
-                               duration=duration,
-                               bufferSize=bufferSize,
-                               sampleRate=sampleRate)
+        res = cls(((0., 0.), (attack, peak), (attack + decay, sustain)),
+                  curvature=(0., curvature))
+        if noteDuration is None:
+            return res
+        # the level when the note is released
+        releaseLevel = res.valueAt(noteDuration)
+        keepCount = int(_np.searchsorted(res._times, noteDuration, side='left'))
+        breakpoints = list(zip(res._times[:keepCount], res._values[:keepCount]))
+        curvatures = list(res._curvatures[:max(keepCount - 1, 0)])
+        if 0 < keepCount < len(res._times):
+            # the part of the segment before the release has a proportionally smaller curvature
+            curvatures.append(res._curvatures[keepCount - 1]
+                              * (noteDuration - res._times[keepCount - 1])
+                              / (res._times[keepCount] - res._times[keepCount - 1]))
+        elif keepCount != 0:
+            curvatures.append(0.)
+        breakpoints += [(noteDuration, releaseLevel),
+                        (noteDuration + release, 0.)]
+        curvatures.append(curvature)
+        return cls(breakpoints, curvature=curvatures)
 
-    def toNpArray(self,
-                  frameLimit: int = 60 * 48000,
-                  getLenOnly: bool = False):
+    @property
+    def duration(self):
+        return self._times[-1]
+
+    def endFrame(self, sampleRate: int = 48000):
         """
-        Returns the underlying data as a numpy.ndarray.
-        ---
+        The frame of the last breakpoint at the sample rate sampleRate.
+        The value is constant from this frame on.
+        """
+        return self._tablesFor(sampleRate)[0][-1]
+
+    def _tablesFor(self, sampleRate: int):
+        """
+        The segment tables (frames, values, inverse lengths, scales, curvatures) at sampleRate.
+        Segment i starts at frames[i], where its value is
+            values[i] + scales[i] * (1 - exp(curvatures[i] * x))
+            (or values[i] + scales[i] * x if curvatures[i] is 0)
+            with x = (frame - frames[i]) * inverse lengths[i].
+        """
+        if sampleRate not in self._tables:
+            frames = _np.round(self._times * sampleRate).astype(_np.int64)
+            segLen = _np.diff(frames)
+            invLen = _np.divide(1., segLen,
+                                out=_np.zeros(len(segLen)),
+                                where=segLen != 0)
+            valueDiff = _np.diff(self._values)
+            isCurved = self._curvatures != 0
+            scales = valueDiff.copy()
+            scales[isCurved] /= -_np.expm1(self._curvatures[isCurved])
+            self._tables[sampleRate] = (frames, self._values, invLen,
+                                        scales, self._curvatures)
+        return self._tables[sampleRate]
+
+    def valueAt(self, time: float, sampleRate: int = 48000):
+        """
+        The value of the envelope at time (in seconds).
+        """
+        return self.render(int(round(time * sampleRate)), 1, sampleRate=sampleRate)[0]
+
+    def render(self,
+               startFrame: int,
+               frameCount: int,
+               sampleRate: int = 48000,
+               out: Optional[_np.ndarray] = None):
+        """
+        Compute the values of the envelope on frameCount frames from the frame startFrame.
+        ---
+        Parameter:
+            startFrame:
+                Type: int
+                The first frame, counted from time 0
+            frameCount:
+                Type: int
+                The number of frames to compute
+            sampleRate:
+                Type: int
+                Default: 48000
+                The sample rate of the frames
+            out:
+                Type: Optional[numpy.ndarray]
+                Default: None
+                An array of length frameCount to write the result into
+                If None, a new float64 array will be allocated
+        ---
+        Return:
+            The values as a 1D numpy.ndarray
+        """
+        (frames, values, invLen, scales, curvatures) = self._tablesFor(sampleRate)
+        if out is None:
+            out = _np.empty(frameCount)
+        if len(Envelope._ramp) < frameCount:
+            Envelope._ramp = _np.arange(frameCount, dtype=_np.float64)
+        endFrame = startFrame + frameCount
+        frameIdx = startFrame
+        while frameIdx < endFrame:
+            # the last breakpoint at or before frameIdx
+            segIdx = _np.searchsorted(frames, frameIdx, side='right') - 1
+            if segIdx < 0:
+                segEnd = frames[0]
+            elif segIdx == len(frames) - 1:
+                segEnd = endFrame
+            else:
+                segEnd = frames[segIdx + 1]
+            segEnd = min(segEnd, endFrame)
+            seg = out[frameIdx - startFrame:segEnd - startFrame]
+            if segIdx < 0:
+                seg.fill(values[0])
+            elif segIdx == len(frames) - 1:
+                seg.fill(values[-1])
+            else:
+                _np.add(Envelope._ramp[:len(seg)], frameIdx - frames[segIdx], out=seg)
+                _np.multiply(seg, invLen[segIdx], out=seg)
+                if curvatures[segIdx] != 0:
+                    _np.multiply(seg, curvatures[segIdx], out=seg)
+                    _np.expm1(seg, out=seg)
+                    _np.multiply(seg, -scales[segIdx], out=seg)
+                else:
+                    _np.multiply(seg, scales[segIdx], out=seg)
+                _np.add(seg, values[segIdx], out=seg)
+            frameIdx = segEnd
+        return out
+
+
+class VoicePool:
+    """
+    A fixed number of voices for playing notes, all rendered in one pass per buffer.
+    Each voice plays the partials (frequencies and amplitudes) of a note
+        with its own envelope of level from 0 to 1:
+            attack: rises from its current level to 1 in attackTime, along x ** attackPower
+            sustain: stays at 1 until the note is released
+            release: decays as exp(-releaseDamping t) from its level,
+                rescaled to reach 0 when the decay reaches releaseFloor,
+                after which the voice is free
+    When all voices are busy, a new note steals the quietest releasing voice,
+        or the oldest one if none is releasing.
+        The stolen voice keeps its phase and level and attacks from there, so it does not click.
+    The partials of all the sounding voices are computed as one 2D array
+        with an OscillatorBank, so the cost of a buffer does not depend on
+        the number of notes that have been played, only on the sounding voices.
+    Notes only change at the start of a buffer.
+    Not thread-safe.
+    ---
+    Properties:
+        maxVoices:
+            Read-only
+            The number of voices in the pool
+        activeCount:
+            Read-only
+            The number of sounding voices
+        activeKeys:
+            Read-only
+            The keys of the sounding notes
+    ---
+    Methods:
+        noteOn
+        noteOff
+        releaseAll
+        isReleasing
+        render
+    """
+    # stages of a voice
+    _FREE = 0
+    _ATTACK = 1
+    _SUSTAIN = 2
+    _RELEASE = 3
+
+    # partialCount oscillators per voice, voice v uses rows v * partialCount + p
+    _bank = None
+    _partialCount = 1
+    _sampleRate = 48000
+    # key of the note of each voice, None if free
+    _keys = None
+    # stage of each voice
+    _stage = None
+    # frames since the stage started
+    _stageFrame = None
+    # level when the stage started
+    _stageLevel = None
+    # level at the end of the last buffer
+    _level = None
+    # order in which the voices were started, for stealing
+    _startOrder = None
+    _startCount = 0
+    _attackFrames = 1
+    _attackPower = 2.
+    _releaseDamping = 9.
+    _releaseFloor = 0.05
+
+    def __init__(self,
+                 maxVoices: int = 16,
+                 partialCount: int = 1,
+                 waveform: str = 'sine',
+                 attackTime: float = 0.02,
+                 attackPower: float = 2.,
+                 releaseDamping: float = 9.,
+                 releaseFloor: float = 0.05,
+                 sampleRate: int = 48000):
+        """
+        Constructor for VoicePool class.
+        ---
+        Parameter:
+            maxVoices:
+                Type: int
+                Default: 16
+                The number of voices
+            partialCount:
+                Type: int
+                Default: 1
+                The maximal number of partials of a note
+            waveform:
+                Type: str
+                Default: 'sine'
+                The waveform of the partials, see help(OscillatorBank.getWavetable)
+            attackTime:
+                Type: float
+                Default: 0.02
+                The time to reach the full level, in seconds
+            attackPower:
+                Type: float
+                Default: 2.0
+                The shape of the attack, 1 is linear
+            releaseDamping:
+                Type: float
+                Default: 9.0
+                The damping factor of the release, in 1 / seconds
+            releaseFloor:
+                Type: float
+                Default: 0.05
+                The relative level below which a released voice is free
+                Must be in (0, 1)
+            sampleRate:
+                Type: int
+                Default: 48000
+                The sample rate of the output signal
+        ---
+        Exception:
+            If maxVoices or partialCount is not positive, releaseFloor is not in (0, 1),
+                or waveform is unknown, a ValueError will be raised
+        """
+        if maxVoices <= 0 or partialCount <= 0:
+            raise ValueError("maxVoices and partialCount must be positive")
+        if not 0 < releaseFloor < 1:
+            raise ValueError("releaseFloor must be in (0, 1)")
+        self._bank = OscillatorBank(_np.zeros(maxVoices * partialCount),
+                                    amplitudes=0.,
+                                    waveform=waveform,
+                                    sampleRate=sampleRate)
+        self._partialCount = partialCount
+        self._sampleRate = sampleRate
+        self._keys = [None] * maxVoices
+        self._stage = _np.full(maxVoices, self._FREE, dtype=_np.int8)
+        self._stageFrame = _np.zeros(maxVoices, dtype=_np.int64)
+        self._stageLevel = _np.zeros(maxVoices)
+        self._level = _np.zeros(maxVoices)
+        self._startOrder = _np.zeros(maxVoices, dtype=_np.int64)
+        self._startCount = 0
+        self._attackFrames = max(int(attackTime * sampleRate), 1)
+        self._attackPower = attackPower
+        self._releaseDamping = releaseDamping
+        self._releaseFloor = releaseFloor
+
+    @property
+    def maxVoices(self):
+        return len(self._keys)
+
+    @property
+    def activeCount(self):
+        return int(_np.count_nonzero(self._stage != self._FREE))
+
+    @property
+    def activeKeys(self):
+        return [key for key in self._keys if key is not None]
+
+    def _voiceOf(self, key):
+        try:
+            return self._keys.index(key)
+        except ValueError:
+            return None
+
+    def _startStage(self, voice: int, stage: int):
+        self._stage[voice] = stage
+        self._stageFrame[voice] = 0
+        self._stageLevel[voice] = self._level[voice]
+
+    def noteOn(self,
+               key,
+               frequencies: Union[float, Iterable, None] = None,
+               amplitudes: Union[float, Iterable] = 1.):
+        """
+        Start a note, or restart it from its current level if it is sounding.
+        ---
+        Parameter:
+            key:
+                Type: Hashable
+                The identifier of the note, used by noteOff
+                Must not be None
+            frequencies:
+                Type: Union[float, Iterable, None]
+                Default: None
+                The frequencies of the partials, in Hz
+                At most partialCount of them
+                If None, the note must be sounding and keeps its partials
+            amplitudes:
+                Type: Union[float, Iterable]
+                Default: 1.0
+                The amplitudes of the partials
+                If a float is given, the same amplitude will be used for all partials
+        ---
+        Return:
+            The index of the voice that plays the note
+        ---
+        Exception:
+            If there are too many partials, or frequencies is None for a note
+                that is not sounding, a ValueError will be raised
+        """
+        voice = self._voiceOf(key)
+        if frequencies is None:
+            if voice is None:
+                raise ValueError(f"Note {key} is not sounding")
+            self._startStage(voice, self._ATTACK)
+            return voice
+        frequencies = _np.atleast_1d(_np.asarray(frequencies, dtype=_np.float64))
+        if len(frequencies) > self._partialCount:
+            raise ValueError(f"At most {self._partialCount} partials are allowed")
+        amplitudes = _np.broadcast_to(_np.asarray(amplitudes, dtype=_np.float64),
+                                      frequencies.shape)
+        if voice is None:
+            freeVoices = _np.flatnonzero(self._stage == self._FREE)
+            if len(freeVoices) != 0:
+                voice = int(freeVoices[0])
+                self._level[voice] = 0.
+            else:
+                releasingVoices = _np.flatnonzero(self._stage == self._RELEASE)
+                if len(releasingVoices) != 0:
+                    voice = int(releasingVoices[_np.argmin(self._level[releasingVoices])])
+                else:
+                    voice = int(_np.argmin(self._startOrder))
+            self._keys[voice] = key
+            self._startOrder[voice] = self._startCount
+            self._startCount += 1
+        rows = slice(voice * self._partialCount, (voice + 1) * self._partialCount)
+        self._bank._phaseInc[rows] = 0.
+        self._bank._phaseInc[rows][:len(frequencies)] = frequencies / self._sampleRate
+        self._bank._amp[rows] = 0.
+        self._bank._amp[rows][:len(frequencies)] = amplitudes
+        self._startStage(voice, self._ATTACK)
+        return voice
+
+    def noteOff(self, key):
+        """
+        Release a note. Does nothing if the note is not sounding or already released.
+        """
+        voice = self._voiceOf(key)
+        if voice is not None and self._stage[voice] != self._RELEASE:
+            self._startStage(voice, self._RELEASE)
+
+    def releaseAll(self):
+        """
+        Release all the sounding notes.
+        """
+        for key in self.activeKeys:
+            self.noteOff(key)
+
+    def isReleasing(self, key):
+        """
+        Whether the note is sounding and released.
+        """
+        voice = self._voiceOf(key)
+        return voice is not None and self._stage[voice] == self._RELEASE
+
+    def render(self, frameCount: int, out: Optional[_np.ndarray] = None):
+        """
+        Compute the next frameCount frames of the sum of the sounding voices,
+            and advance their envelopes.
+        ---
+        Parameter:
+            frameCount:
+                Type: int
+                The number of frames to compute
+            out:
+                Type: Optional[numpy.ndarray]
+                Default: None
+                A float64 array of length frameCount to write the result into
+                If None, a new array will be allocated
+        ---
+        Return:
+            The mixed signal as a 1D numpy.ndarray
+            Not normalized, each voice has a peak amplitude of the sum of its amplitudes
+        """
+        if out is None:
+            out = _np.empty(frameCount)
+        activeVoices = _np.flatnonzero(self._stage != self._FREE)
+        if len(activeVoices) == 0 or frameCount == 0:
+            out.fill(0)
+            return out
+        # the envelope of each sounding voice, shape (voices, frames)
+        frameIdx = self._stageFrame[activeVoices, None] + _np.arange(1, frameCount + 1)
+        levels = _np.empty((len(activeVoices), frameCount))
+        stages = self._stage[activeVoices]
+        startLevels = self._stageLevel[activeVoices, None]
+        isAttack = stages == self._ATTACK
+        if _np.any(isAttack):
+            x = _np.minimum(frameIdx[isAttack] / self._attackFrames, 1.)
+            levels[isAttack] = startLevels[isAttack] \
+                + (1 - startLevels[isAttack]) * x ** self._attackPower
+        levels[stages == self._SUSTAIN] = 1.
+        isRelease = stages == self._RELEASE
+        if _np.any(isRelease):
+            decay = _np.exp(frameIdx[isRelease] * (-self._releaseDamping / self._sampleRate))
+            levels[isRelease] = startLevels[isRelease] \
+                * _np.maximum(decay - self._releaseFloor, 0.) / (1 - self._releaseFloor)
+        # all partials of the sounding voices at once
+        rowIdx = (activeVoices[:, None] * self._partialCount
+                  + _np.arange(self._partialCount)).reshape(-1)
+        partialBuf = self._bank._renderVoices(frameCount, voiceIdx=rowIdx) \
+            .reshape(len(activeVoices), self._partialCount, frameCount)
+        voiceBuf = _np.einsum('vpn,vp->vn',
+                              partialBuf,
+                              self._bank._amp[rowIdx].reshape(len(activeVoices), -1))
+        _np.einsum('vn,vn->n', voiceBuf, levels, out=out)
+        # advance the envelopes
+        self._stageFrame[activeVoices] += frameCount
+        self._level[activeVoices] = levels[:, -1]
+        self._stage[activeVoices[isAttack
+                                 & (self._stageFrame[activeVoices] >= self._attackFrames)]] \
+            = self._SUSTAIN
+        for voice in activeVoices[isRelease & (levels[:, -1] <= 0)]:
+            self._stage[voice] = self._FREE
+            self._keys[voice] = None
+            self._level[voice] = 0.
+        return out
+
+
+class MidiScore:
+    """
+    The notes of a Standard MIDI File (format 0 or 1).
+    Note on and off events are paired per track, channel and pitch in first-in-first-out order,
+        and their times are converted to seconds with the tempo map of the file.
+    Notes that are not turned off end at the end of their track.
+    Only the notes are kept, other events (except tempo and program changes) are skipped.
+    ---
+    Properties:
+        notes:
+            Read-only
+            The notes as a numpy structured array sorted by the start time, with the fields
+                start (in seconds), duration (in seconds), pitch, velocity, channel,
+                program and track
+        noteCount:
+            Read-only
+            The number of notes
+        duration:
+            Read-only
+            The time when the last note ends, in seconds
+    ---
+    Methods:
+        Class methods:
+            fromFile
+            fromBytes
+    """
+    noteDtype = _np.dtype([('start', _np.float64),
+                           ('duration', _np.float64),
+                           ('pitch', _np.uint8),
+                           ('velocity', _np.uint8),
+                           ('channel', _np.uint8),
+                           ('program', _np.uint8),
+                           ('track', _np.uint16)])
+    _notes = None
+
+    def __init__(self, notes: _np.ndarray):
+        """
+        Constructor for MidiScore class.
+        Most of the time, this constructor should not be called directly.
+        Use fromFile or fromBytes instead.
+        ---
+        Parameter:
+            notes:
+                Type: numpy.ndarray
+                A structured array of dtype MidiScore.noteDtype
+        """
+        self._notes = _np.sort(_np.asarray(notes, dtype=self.noteDtype),
+                               order=('start', 'pitch'))
+
+    @property
+    def notes(self):
+        return self._notes
+
+    @property
+    def noteCount(self):
+        return len(self._notes)
+
+    @property
+    def duration(self):
+        if len(self._notes) == 0:
+            return 0.
+        return float(_np.max(self._notes['start'] + self._notes['duration']))
+
+    @classmethod
+    def fromFile(cls, path: str):
+        """
+        Read a Standard MIDI File.
+        See help(MidiScore.fromBytes).
+        """
+        with open(path, 'rb') as midiFile:
+            return cls.fromBytes(midiFile.read())
+
+    @staticmethod
+    def _readVarLen(data: bytes, pos: int):
+        # returns (value, position after it)
+        value = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            value = (value << 7) | (byte & 0x7f)
+            if byte < 0x80:
+                return (value, pos)
+
+    @classmethod
+    def _parseTrack(cls, data: bytes, trackIdx: int, noteList: list, tempoList: list):
+        """
+        Append (startTick, endTick, pitch, velocity, channel, program, track)
+            of each note in the track to noteList,
+            and (tick, microseconds per quarter note) of each tempo change to tempoList.
+        """
+        pos = 0
+        tick = 0
+        status = 0
+        # (channel, pitch) -> deque of (startTick, velocity, program)
+        pendingNotes = {}
+        programs = [0] * 16
+        dataLen = len(data)
+        while pos < dataLen:
+            (delta, pos) = cls._readVarLen(data, pos)
+            tick += delta
+            if data[pos] >= 0x80:
+                status = data[pos]
+                pos += 1
+            elif status == 0:
+                raise ValueError("Invalid MIDI data: running status without a status")
+            if status == 0xff:
+                metaType = data[pos]
+                (metaLen, pos) = cls._readVarLen(data, pos + 1)
+                if metaType == 0x51 and metaLen == 3:
+                    tempoList.append((tick, int.from_bytes(data[pos:pos + 3], 'big')))
+                pos += metaLen
+                if metaType == 0x2f:
+                    break
+                # meta and sysex events cancel the running status
+                status = 0
+            elif status in (0xf0, 0xf7):
+                (sysexLen, pos) = cls._readVarLen(data, pos)
+                pos += sysexLen
+                status = 0
+            else:
+                eventType = status & 0xf0
+                channel = status & 0x0f
+                if eventType in (0x80, 0x90):
+                    (pitch, velocity) = (data[pos], data[pos + 1])
+                    pos += 2
+                    if eventType == 0x90 and velocity != 0:
+                        pendingNotes.setdefault((channel, pitch), _deque()) \
+                            .append((tick, velocity, programs[channel]))
+                    elif len(pendingNotes.get((channel, pitch), ())) != 0:
+                        (startTick, startVelocity, program) = \
+                            pendingNotes[(channel, pitch)].popleft()
+                        noteList.append((startTick, tick, pitch, startVelocity,
+                                         channel, program, trackIdx))
+                elif eventType == 0xc0:
+                    programs[channel] = data[pos]
+                    pos += 1
+                elif eventType == 0xd0:
+                    pos += 1
+                else:
+                    pos += 2
+        # notes that are never turned off
+        for ((channel, pitch), pendingQueue) in pendingNotes.items():
+            for (startTick, velocity, program) in pendingQueue:
+                noteList.append((startTick, tick, pitch, velocity,
+                                 channel, program, trackIdx))
+
+    @classmethod
+    def fromBytes(cls, data: bytes):
+        """
+        Parse the content of a Standard MIDI File.
+        ---
+        Parameter:
+            data:
+                Type: bytes
+                The content of the file
+        ---
+        Return:
+            A MidiScore object
+        ---
+        Exception:
+            If the data is not a valid Standard MIDI File, a ValueError will be raised
+        """
+        if data[:4] != b'MThd':
+            raise ValueError("Not a Standard MIDI File")
+        (headerLen, midiFormat, trackCount, division) = _struct.unpack('>IHHH', data[4:14])
+        if midiFormat not in (0, 1):
+            raise ValueError(f"MIDI format {midiFormat} is not supported")
+        pos = 8 + headerLen
+        noteList = []
+        tempoList = []
+        trackIdx = 0
+        try:
+            while pos + 8 <= len(data) and trackIdx < trackCount:
+                chunkType = data[pos:pos + 4]
+                (chunkLen, ) = _struct.unpack('>I', data[pos + 4:pos + 8])
+                if chunkType == b'MTrk':
+                    cls._parseTrack(data[pos + 8:pos + 8 + chunkLen],
+                                    trackIdx, noteList, tempoList)
+                    trackIdx += 1
+                # other chunks are skipped
+                pos += 8 + chunkLen
+        except IndexError:
+            raise ValueError("Invalid MIDI data: truncated track") from None
+        ticks = _np.array([(note[0], note[1]) for note in noteList],
+                          dtype=_np.float64).reshape(-1, 2)
+        if division & 0x8000:
+            # SMPTE time: frames per second and ticks per frame
+            framesPerSecond = 256 - (division >> 8)
+            times = ticks / (framesPerSecond * (division & 0xff))
+        else:
+            # piecewise linear in the ticks, with the default tempo of 120 bpm
+            tempoList.sort(key=lambda tempo: tempo[0])
+            tempoTicks = _np.array([0] + [tempo[0] for tempo in tempoList], dtype=_np.float64)
+            secondsPerTick = _np.array([500000] + [tempo[1] for tempo in tempoList],
+                                       dtype=_np.float64) / 1e6 / division
+            tempoTimes = _np.concatenate(
+                ([0.], _np.cumsum(_np.diff(tempoTicks) * secondsPerTick[:-1])))
+            tempoIdx = _np.searchsorted(tempoTicks, ticks, side='right') - 1
+            times = tempoTimes[tempoIdx] + (ticks - tempoTicks[tempoIdx]) * secondsPerTick[tempoIdx]
+        notes = _np.empty(len(noteList), dtype=cls.noteDtype)
+        notes['start'] = times[:, 0]
+        notes['duration'] = times[:, 1] - times[:, 0]
+        for (fieldIdx, fieldName) in enumerate(('pitch', 'velocity', 'channel', 'program', 'track'),
+                                               start=2):
+            notes[fieldName] = [note[fieldIdx] for note in noteList]
+        return cls(notes)
+
+
+class AudioOutputSignal:
+    """
+    A class for generating audio signals
+    Pointwise operations (ampModify, elementwiseOp, add, mul, damping, applyEnvelope, clip) are lazy:
+        they are only recorded, and fused into a single in-place pass over each buffer
+        when the signal is consumed (e.g. by play or toNpArray)
+    Mono signals give 1D buffers, multi-channel signals give 2D buffers of shape (frames, channels)
+        Mono signals are broadcasted to all channels when mixed with multi-channel signals
+    ---
+    Properties:
+        isInEffect:
+            Read-only
+            Indicates if the signal is still valid
+        isSeekable:
+            Read-only
+            Indicates if skipTime can jump to a frame without computing the frames before it
+        channels:
+            Read-only
+            The number of channels of the signal
+        sampleRate:
+            Read-only
+            The sample rate of the signal, None if not known
+    ---
+    Methods:
+        Class methods:
+            fromNpArray
+            fromWav
+            fromFlac
+            fromChannels
+            fromAmpFunc
+            fromFreqFunc
+            fromEnvelope
+            fromFreqEnvelope
+            fromMidi
+            silentSignal
+            sineWave
+            unitSound
+            squareWave
+            sawWave
+            triangleWave
+            joinSignals
+            joinSignalsSmooth
+            sum
+            prod
+        Member methods:
+            toNpArray
+            toWav
+            toFlac
+            join
+            joinSmooth
+            damping
+            applyEnvelope
+            cutoff
+            ampModify
+            elementwiseOp
+            add
+            __add__, __radd__
+            mul
+            __mul__, __rmul__
+            enforceBufferSize
+            play
+            skipTime
+            keepTime
+            clip
+            cache
+            tee
+            repeat
+            echo
+            convolve
+            lowpass
+            highpass
+            bandpass
+            resample
+            mapChannels
+            pan
+        Static methods:
+            designFir
+    """
+    # actual data, see _genObj
+    _srcGen = None
+    # pending lazy operations, applied in place on each buffer of _srcGen
+    _ops = ()
+    # function that gives the source generator starting at a given frame, None if not seekable
+    _seekFunc = None
+    # whether the signal generator can still be used
+    _isInEffect = True
+    # referential standard buffer size
+    _bufSize = None
+    # number of chunks, float('inf') if unlimited, None if not known
+    _length = None
+    # number of channels, buffers are 1D if 1, (frames, channels) otherwise
+    _channels = 1
+    # sample rate, None if not known
+    _sampleRate = None
+    # the shared _BlockStore if the signal is from cache, see tee
+    _blockStore = None
+
+    def __init__(self,
+                 gen: Iterable,
+                 bufSize: Optional[int] = None,
+                 length: Optional[int] = None,
+                 channels: int = 1,
+                 sampleRate: Optional[int] = None,
+                 seekFunc: Optional[Callable] = None):
+        """
+        Constructor for AudioOutputSignal class.
+        Most of the time, this constructor should not be called directly.
+        To construct a signal, you may use the class methods.
+        ---
+        Parameter:
+            gen:
+                Type: iterable
+                The generator for actual signal
+            bufSize:
+                Type: Optional[int]
+                Default: None
+                The reference buffer size
+            length
+                Type: Optional[int]
+                Default: None
+                The reference length of the signal
+                For signals that have infinite length, pass None
+            channels:
+                Type: int
+                Default: 1
+                The number of channels of the signal
+                If larger than 1, gen must give buffers of shape (frames, channels)
+            sampleRate:
+                Type: Optional[int]
+                Default: None
+                The sample rate of the signal
+                If None, the sample rate is not known
+                    and the methods will assume 48000 unless told otherwise
+            seekFunc:
+                Type: Optional[Callable]
+                Default: None
+                A function that takes a frame index and returns a generator
+                    of the same signal starting from that frame,
+                    without computing the frames before it
+                If None, the signal is not seekable
+        """
+        self._srcGen = gen
+        self._ops = ()
+        self._seekFunc = seekFunc
+        self._bufSize = bufSize
+        self._length = length
+        self._channels = channels
+        self._sampleRate = sampleRate
+
+    def __next__(self):
+        res = next(self._genObj, None)
+        if res is None:
+            self._isInEffect = False
+            raise StopIteration
+        else:
+            return res
+
+    def __iter__(self):
+        self._isInEffect = False
+        return self._genObj
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def _genObj(self):
+        """
+        The generator for actual signal, with all pending operations applied.
+        Each buffer is newly allocated and can be kept by the caller.
+        """
+        return self._compile(reuseBuffer=False)
+
+    def _compile(self, reuseBuffer: bool = False):
+        """
+        Fuse the pending lazy operations into a single generator.
+        The source buffer is copied into a float32 work buffer once,
+            then all operations are applied in place on it.
+        ---
+        Parameter:
+            reuseBuffer:
+                Type: bool
+                Default: False
+                Determine if the same work buffer is yielded every time
+                If True, each buffer is only valid until the next one is requested
+                    and should not be modified by the caller
+        ---
+        Return:
+            The generator for actual signal
+        """
+        if len(self._ops) == 0:
+            return self._srcGen
+        self._srcGen = self._fuseOps(self._srcGen,
+                                     self._ops,
+                                     0,
+                                     reuseBuffer)
+        self._ops = ()
+        # the compiled generator cannot be moved to another frame
+        self._seekFunc = None
+        return self._srcGen
+
+    @staticmethod
+    def _fuseOps(gen: Iterable,
+                 ops: tuple,
+                 startFrame: int,
+                 reuseBuffer: bool):
+        """
+        The generator that applies the operations in ops (see AudioOutputSignal._ops)
+            on each buffer of gen, which starts at the frame startFrame of the source.
+        See help(AudioOutputSignal._compile).
+        """
+        def _compile_gen(_gen):
+            workBuf = _np.empty(0, dtype=_np.float32)
+            frameOffset = startFrame
+            for buf in _gen:
+                bufLen = len(buf)
+                if not reuseBuffer \
+                        or len(workBuf) < bufLen \
+                        or workBuf.shape[1:] != buf.shape[1:]:
+                    workBuf = _np.empty((bufLen, ) + buf.shape[1:],
+                                        dtype=_np.float32)
+                outBuf = workBuf[:bufLen]
+                outBuf[:] = buf
+                isLastBuf = False
+                for op in ops:
+                    validLen = op(outBuf, frameOffset)
+                    if validLen is not None:
+                        if validLen == 0:
+                            return
+                        outBuf = outBuf[:validLen]
+                        isLastBuf = True
+                yield outBuf
+                if isLastBuf:
+                    return
+                frameOffset += bufLen
+
+        return _compile_gen(gen)
+
+    @property
+    def isSeekable(self):
+        """
+        Whether the signal can skip frames without computing them.
+        Signals from fromNpArray, fromWav, fromAmpFunc, silentSignal and the oscillators
+            are seekable, and so are the results of the lazy operations,
+            enforceBufferSize, skipTime, keepTime, mapChannels and fromChannels on seekable signals.
+        Cached signals (see AudioOutputSignal.cache) are seekable, but the frames before
+            the target are computed (once) if they have not been.
+        Read-only property.
+        """
+        return self._seekFunc is not None \
+            and all(getattr(op, 'isSeekable', True) for op in self._ops)
+
+    def _seekableGen(self, reuseBuffer: bool = False):
+        """
+        Returns a function that takes a frame index and returns the generator of this signal
+            (with the pending operations applied) starting from that frame,
+            or None if the signal is not seekable.
+        Must be called before the signal is consumed.
+        Operations are assumed to depend only on the frame offset,
+            unless they have a seek method (e.g. _MixingBus).
+        """
+        if not self.isSeekable:
+            return None
+        seekFunc, ops = self._seekFunc, self._ops
+
+        def _seekableGen_func(frameIndex):
+            for op in ops:
+                if hasattr(op, 'seek'):
+                    op.seek(frameIndex)
+            gen = seekFunc(frameIndex)
+            if len(ops) == 0:
+                return gen
+            return self._fuseOps(gen, ops, frameIndex, reuseBuffer)
+
+        return _seekableGen_func
+
+    def _withOp(self, op: Callable):
+        """
+        Returns a new AudioOutputSignal with op appended to the pending operations.
+        op is called as op(buf, frameOffset) on each float32 buffer and must modify it in place.
+        buf is 2D of shape (frames, channels) for multi-channel signals.
+        It may return the number of leading frames that remain valid,
+            in which case the signal stops after this buffer.
+        This object will be set invalid.
+        """
+        self._isInEffect = False
+        res = self.__class__(self._srcGen,
+                             bufSize=self._bufSize,
+                             channels=self._channels,
+                             sampleRate=self._sampleRate,
+                             length=self._length,
+                             seekFunc=self._seekFunc)
+        res._ops = self._ops + (op, )
+        return res
+
+    @staticmethod
+    def _reusedBufferOp(buf, frameOffset):
+        """
+        An operation that does nothing, for the signals whose generator reuses its buffers.
+        As a pending operation, the buffers are copied by _genObj but not by _compile(reuseBuffer=True).
+        """
+        pass
+
+    @staticmethod
+    def _ufuncOp(ufunc: Callable, *args):
+        """
+        Wraps the numpy ufunc as an operation that computes ufunc(buf, *args) in place.
+        """
+        def _ufunc_op(buf, frameOffset):
+            ufunc(buf, *args, out=buf)
+
+        return _ufunc_op
+
+    def _withMixingBus(self,
+                       sigObjList: list,
+                       inPlaceFunc: Callable,
+                       gainList: Optional[list] = None):
+        """
+        Returns a new AudioOutputSignal with the signals in sigObjList mixed in
+            by a _MixingBus as a pending operation.
+        If the last pending operation is already a _MixingBus for the same numpy.add
+            or numpy.multiply, the signals are added to it instead.
+        If this signal is mono but some signals are not, it is broadcasted to their channels first.
+        Signals of other sample rates are resampled to that of this signal.
+        All objects will be set invalid.
+        """
+        (sampleRate, sigObjList) = self._matchSampleRate(sigObjList)
+        channelSet = set(sigObj._channels for sigObj in sigObjList) - {1}
+        if len(channelSet - {self._channels}) != 0:
+            if self._channels != 1 or len(channelSet) > 1:
+                raise ValueError("Signals have different number of channels")
+            return self.mapChannels([0] * channelSet.pop())\
+                ._withMixingBus(sigObjList, inPlaceFunc, gainList)
+        lastOp = self._ops[-1] if len(self._ops) != 0 else None
+        if isinstance(lastOp, _MixingBus) \
+                and lastOp.inPlaceFunc is inPlaceFunc \
+                and inPlaceFunc in (_np.add, _np.multiply):
+            lastOp.extend(sigObjList, gainList)
+            self._isInEffect = False
+            res = self.__class__(self._srcGen,
+                                 bufSize=self._bufSize,
+                                 channels=self._channels,
+                                 sampleRate=self._sampleRate,
+                                 length=self._length,
+                                 seekFunc=self._seekFunc)
+            res._ops = self._ops
+        else:
+            res = self._withOp(_MixingBus(sigObjList,
+                                          inPlaceFunc,
+                                          gainList=gainList,
+                                          bufferSize=self._bufSize or 4096))
+        lengthList = [self._length] + [sigObj._length for sigObj in sigObjList]
+        res._length = (min(lengthList)
+                       if all(x is not None for x in lengthList)
+                       else None)
+        res._sampleRate = sampleRate
+        return res
+
+    @property
+    def isInEffect(self):
+        """
+        Property denoting whether the object can still be used.
+        Read-only property.
+        """
+        return self._isInEffect
+
+    @isInEffect.setter
+    def isInEffect(self, newFlag):
+        raise ValueError("This property is read-only")
+
+    @property
+    def channels(self):
+        """
+        The number of channels of the signal.
+        Read-only property.
+        """
+        return self._channels
+
+    @property
+    def sampleRate(self):
+        """
+        The sample rate of the signal, None if not known.
+        Read-only property.
+        """
+        return self._sampleRate
+
+    def _sampleRateOr(self, sampleRate: Optional[int] = None):
+        """
+        Returns sampleRate if it is not None,
+            otherwise the sample rate of the signal (48000 if not known).
+        """
+        if sampleRate is not None:
+            return sampleRate
+        return self._sampleRate if self._sampleRate is not None else 48000
+
+    def _matchSampleRate(self, sigObjList: list):
+        """
+        Returns (sample rate, list of the signals in sigObjList resampled to it).
+        The sample rate is that of this signal if known,
+            otherwise the first known one in sigObjList, or None.
+        Signals of unknown sample rate are returned as is.
+        This signal is not changed, the caller should give the sample rate to its result.
+        """
+        sampleRate = self._sampleRate
+        if sampleRate is None:
+            sampleRate = next((sigObj._sampleRate for sigObj in sigObjList
+                               if sigObj._sampleRate is not None),
+                              None)
+        return (sampleRate,
+                [sigObj.resample(sampleRate)
+                 if sigObj._sampleRate not in (None, sampleRate)
+                 else sigObj
+                 for sigObj in sigObjList])
+
+    @classmethod
+    def fromNpArray(cls,
+                    npArray: _np.ndarray,
+                    bufferSize: Optional[int] = 4096,
+                    sampleRate: Optional[int] = None):
+        """
+        Constuct AudioOutputSignal from a numpy.ndarray.
+        ---
+        Parameter:
+            npArray:
+                Type: numpy.ndarray
+                The data for the signal.
+                npArray will be casted to float32 type.
+                A 2D array is taken as (frames, channels), and will be a multi-channel signal
+                    if it has more than one column
+                Other arrays will be flatten to 1D.
+            bufferSize:
+                Type: Optional[int]
+                Default: 4096
+                The buffer size for the object.
+                If None, the whole data will be taken as one buffer,
+                    which may deteriorate the performance if npArray is too large.
+            sampleRate:
+                Type: Optional[int]
+                Default: None
+                The sample rate of the data
+                If None, the sample rate is not known
+        """
+        channels = npArray.shape[1] if npArray.ndim == 2 else 1
+        npArray = (npArray.reshape(-1)
+                   if channels == 1
+                   else _np.ascontiguousarray(npArray))
+        if npArray.dtype != _np.float32:
+            npArray = npArray.astype(_np.float32)
+        if bufferSize is None:
+            bufferSize = len(npArray)
+        arrLen = len(npArray)
+        nPieces = (arrLen + bufferSize - 1) // bufferSize
+
+        def _fromNpArray_gen(startFrame):
+            return (npArray[startIdx:startIdx + bufferSize]
+                    for startIdx in range(startFrame, arrLen, bufferSize))
+
+        return cls(_fromNpArray_gen(0),
+                   bufSize=bufferSize,
+                   length=nPieces,
+                   channels=channels,
+                   sampleRate=sampleRate,
+                   seekFunc=_fromNpArray_gen)
+
+    @classmethod
+    def fromChannels(cls, *sigObj):
+        """
+        Construct a multi-channel AudioOutputSignal from signals on each channel.
+        The channels are written into each (frames, channels) buffer column by column,
+            without interleaving copies.
+        ---
+        Parameter:
+            *sigObj:
+                Type: AudioOutputSignal
+                The signals on the channels, in order
+                A multi-channel signal occupies as many channels as it has
+                Signals are resampled to the sample rate of the first one if needed
+        ---
+        Return:
+            A new AudioOutputSignal object that has all the channels
+            The signal stops when one of the signals runs out
+            If only one mono signal is given, returns it
+        ---
+        Exception:
+            If no signal is given, or some of the signals are invalid, a ValueError will be raised
+        ---
+        Side Effect:
+            All AudioOutputSignal objects will be set invalid.
+        """
+        if len(sigObj) == 0:
+            raise ValueError("No signal given")
+        if any(not sig.isInEffect for sig in sigObj):
+            raise ValueError("No valid signal data")
+        if len(sigObj) == 1 and sigObj[0]._channels == 1:
+            return sigObj[0]
+        (sampleRate, otherSigList) = sigObj[0]._matchSampleRate(sigObj[1:])
+        sigObj = (sigObj[0], ) + tuple(otherSigList)
+        bufferSize = sigObj[0]._bufSize or 4096
+        channelOffsets = _np.cumsum([0] + [sig._channels for sig in sigObj])
+        seekableGenList = [sig._seekableGen(reuseBuffer=True) for sig in sigObj]
+        genList = []
+        for sig in sigObj:
+            sig._isInEffect = False
+            genList.append(sig._compile(reuseBuffer=True))
+
+        def _fromChannels_gen(genList):
+            sourceList = [(gen, _RingBlockBuffer(2 * bufferSize, sig._channels))
+                          for (gen, sig) in zip(genList, sigObj)]
+            while True:
+                validLen = bufferSize
+                for (gen, ringBuf) in sourceList:
+                    while len(ringBuf) < validLen:
+                        nextBuf = next(gen, None)
+                        if nextBuf is None:
+                            validLen = len(ringBuf)
+                            break
+                        ringBuf.push(nextBuf)
+                if validLen == 0:
+                    return
+                outBuf = _np.empty((validLen, channelOffsets[-1]), dtype=_np.float32)
+                for (idx, (_, ringBuf)) in enumerate(sourceList):
+                    sigBuf = ringBuf.pop(validLen)
+                    outBuf[:, channelOffsets[idx]:channelOffsets[idx + 1]] \
+                        = sigBuf[:, None] if sigBuf.ndim == 1 else sigBuf
+                yield outBuf
+                if validLen < bufferSize:
+                    return
+
+        lengthList = [sig._length for sig in sigObj]
+        return cls(_fromChannels_gen(genList),
+                   bufSize=bufferSize,
+                   length=(min(lengthList)
+                           if all(x is not None for x in lengthList)
+                           else None),
+                   channels=int(channelOffsets[-1]),
+                   sampleRate=sampleRate,
+                   seekFunc=(None
+                             if any(seekableGen is None
+                                    for seekableGen in seekableGenList)
+                             else lambda startFrame: _fromChannels_gen(
+                                 [seekableGen(startFrame)
+                                  for seekableGen in seekableGenList])))
+
+    def mapChannels(self, channelMap):
+        """
+        Remix the channels of the signal by a matrix, or select channels by their indices
+        ---
+        Parameter:
+            channelMap:
+                Type: Union[numpy.ndarray, list[int]]
+                If it is a 2D array of shape (channels, newChannels),
+                    the output channel j is sum(input channel i * channelMap[i, j])
+                If it is a list of indices, the output channel j is the input channel channelMap[j]
+                    For example, [1, 0] swaps the two channels of a stereo signal,
+                    and [0, 0] turns a mono signal into a stereo one
+        ---
+        Return:
+            A new AudioOutputSignal object with the remixed channels
+            If there is only one output channel, the signal will be mono
+        ---
+        Exception:
+            If the signal is invalid, or channelMap does not match the channels, a ValueError will be raised
+        ---
+        Side Effect:
+            The object will be set invalid.
+        """
+        if not self.isInEffect:
+            raise ValueError("No valid signal data")
+        channelMap = _np.asarray(channelMap)
+        if channelMap.ndim == 1:
+            if not _np.issubdtype(channelMap.dtype, _np.integer) \
+                    or _np.any(channelMap < 0) \
+                    or _np.any(channelMap >= self._channels):
+                raise ValueError("Invalid channel indices")
+            selectMatrix = _np.zeros((self._channels, len(channelMap)),
+                                     dtype=_np.float32)
+            selectMatrix[channelMap, _np.arange(len(channelMap))] = 1
+            channelMap = selectMatrix
+        if channelMap.ndim != 2 or channelMap.shape[0] != self._channels:
+            raise ValueError("Channel map does not match the channels of the signal")
+        channelMap = channelMap.astype(_np.float32)
+        newChannels = channelMap.shape[1]
+        self._isInEffect = False
+
+        def _mapChannels_gen(_gen):
+            for buf in _gen:
+                outBuf = _np.matmul(buf.reshape(len(buf), -1), channelMap)
+                yield outBuf[:, 0] if newChannels == 1 else outBuf
+
+        seekableGen = self._seekableGen(reuseBuffer=True)
+        return self.__class__(_mapChannels_gen(self._compile(reuseBuffer=True)),
+                              bufSize=self._bufSize,
+                              length=self._length,
+                              channels=newChannels,
+                              sampleRate=self._sampleRate,
+                              seekFunc=(None
+                                        if seekableGen is None
+                                        else lambda startFrame: _mapChannels_gen(
+                                            seekableGen(startFrame))))
+
+    def pan(self,
+            position: Union[float, Envelope] = 0.,
+            sampleRate: Optional[int] = None):
+        """
+        Place the signal in the stereo field
+        ---
+        Parameter:
+            position:
+                Type: Union[float, Envelope]
+                Default: 0.0
+                The position, from -1.0 (left) to 1.0 (right)
+                A mono signal is panned with constant power,
+                    a stereo signal is balanced by attenuating the other channel
+                If an Envelope is given, the position changes over time
+            sampleRate:
+                Type: Optional[int]
+                Default: None
+                The sample rate used to render the envelope
+                If None, the sample rate of the signal will be used
+        ---
+        Return:
+            A new stereo AudioOutputSignal object
+        ---
+        Exception:
+            If the signal is invalid or not mono or stereo, a ValueError will be raised
+        ---
+        Side Effect:
+            The object will be set invalid.
+        """
+        if not self.isInEffect:
+            raise ValueError("No valid signal data")
+        if isinstance(position, Envelope):
+            if self._channels not in (1, 2):
+                raise ValueError("Only mono or stereo signals can be panned")
+            sampleRate = self._sampleRateOr(sampleRate)
+            isMono = self._channels == 1
+            positionBuf = _np.empty(self._bufSize or 0, dtype=_np.float64)
+            gainBuf = _np.empty((self._bufSize or 0, 2), dtype=_np.float64)
+
+            def _pan_op(buf, frameOffset):
+                nonlocal positionBuf, gainBuf
+                bufLen = len(buf)
+                if len(positionBuf) < bufLen:
+                    positionBuf = _np.empty(bufLen, dtype=_np.float64)
+                    gainBuf = _np.empty((bufLen, 2), dtype=_np.float64)
+                pos = _np.clip(position.render(frameOffset, bufLen,
+                                               sampleRate=sampleRate,
+                                               out=positionBuf[:bufLen]),
+                               -1., 1., out=positionBuf[:bufLen])
+                gain = gainBuf[:bufLen]
+                if isMono:
+                    # both channels are the mono signal here
+                    _np.add(pos, 1., out=pos)
+                    _np.multiply(pos, _np.pi / 4, out=pos)
+                    _np.cos(pos, out=gain[:, 0])
+                    _np.sin(pos, out=gain[:, 1])
+                else:
+                    _np.subtract(1., pos, out=gain[:, 0])
+                    _np.add(1., pos, out=gain[:, 1])
+                    _np.minimum(gain, 1., out=gain)
+                _np.multiply(buf, gain, out=buf)
+
+            return (self.mapChannels([0, 0]) if isMono else self)._withOp(_pan_op)
+        position = min(max(position, -1.), 1.)
+        if self._channels == 1:
+            angle = (position + 1) * _np.pi / 4
+            return self.mapChannels([[_np.cos(angle), _np.sin(angle)]])
+        elif self._channels == 2:
+            return self._withOp(self._ufuncOp(
+                _np.multiply,
+                _np.array([min(1., 1. - position), min(1., 1. + position)],
+                          dtype=_np.float32)))
+        else:
+            raise ValueError("Only mono or stereo signals can be panned")
+
+    @staticmethod
+    def _acceptsNpArray(func: Callable):
+        """
+        Test if func is known to map a numpy.ndarray entrywise,
+            i.e. is a numpy.ufunc or numpy.vectorize object.
+        func is not called, as it may have side effects.
+        """
+        return isinstance(func, (_np.ufunc, _np.vectorize))
+
+    @classmethod
+    def fromAmpFunc(cls,
+                    ampFunc: Callable,
+                    duration: Optional[float] = 1.,
+                    bufferSize: Optional[int] = 4096,
+                    sampleRate: int = 48000,
+                    arrayInput: Optional[bool] = None):
+        """
+        Constuct AudioOutputSignal from a function that gives the amplitude.
+        ---
+        Parameter:
+            ampFunc:
+                Type: callable
+                The function that gives the amplitude.
+                Must take only one input (time)
+                If arrayInput is True, it will be called once per buffer.
+                Otherwise, this function will be vectoized first.
+            duration:
+                Type: Optional[float]
+                Default: 1.0
+                The duration of the signal, in seconds.
+                ampFunc will be called with input values in [0, duration]
+            bufferSize:
+                Type: Optional[int]
+                Default: 4096
+                The buffer size for the object.
+                If None, the whole data will be taken as one buffer,
+                    which may deteriorate the performance if npArray is too large.
+            sampleRate:
+                Type: int
+                Default: 48000
+                The sample rate of the output signal.
+            arrayInput:
+                Type: Optional[bool]
+                Default: None
+                Determine if ampFunc takes a 1D numpy.ndarray of time
+                    and returns a numpy.ndarray of the same shape
+                If None, only numpy.ufunc and numpy.vectorize objects are called with arrays,
+                    pass True for other functions written for arrays
+        """
+        if arrayInput is None:
+            arrayInput = cls._acceptsNpArray(ampFunc)
+        ampFunc_formatted = ampFunc if arrayInput else _np.vectorize(ampFunc)
+        if duration is not None:
+            totalSamples = int(duration * sampleRate)
+            if bufferSize is None:
+                bufferSize = totalSamples
+            nPieces = (totalSamples + bufferSize - 1) // bufferSize
+
+            def _fromAmpFunc_gen(startFrame):
+                return (ampFunc_formatted(_np.arange(startIdx,
+                                                     min(startIdx + bufferSize,
+                                                         totalSamples))
+                                          / sampleRate)
+                        for startIdx in range(startFrame, totalSamples, bufferSize))
+
+            return cls(_fromAmpFunc_gen(0),
+                       bufSize=bufferSize,
+                       length=nPieces,
+                       sampleRate=sampleRate,
+                       seekFunc=_fromAmpFunc_gen)
+        else:
+            if bufferSize is None:
+                raise ValueError("No bufferSize provided")
+
+            def _fromAmpFunc_gen(startFrame):
+                return (ampFunc_formatted(_np.arange(startIdx,
+                                                     startIdx + bufferSize)
+                                          / sampleRate)
+                        for startIdx in _it.count(startFrame, bufferSize))
+
+            return cls(_fromAmpFunc_gen(0),
+                       bufSize=bufferSize,
+                       length=float('inf'),
+                       sampleRate=sampleRate,
+                       seekFunc=_fromAmpFunc_gen)
+
+    @classmethod
+    def fromFreqFunc(cls,
+                     freqFunc: Callable,
+                     duration: Optional[float] = 1.,
+                     amplitude: float = 1.,
+                     initPhase: float = 0.,
+                     bufferSize: Optional[int] = 4096,
+                     sampleRate: int = 48000,
+                     arrayInput: Optional[bool] = None):
+        """
+        Constuct AudioOutputSignal from a function that gives the frequency.
+        ---
+        Parameter:
+            freqFunc:
+                Type: callable
+                The function that gives the frequency.
+                Must take only one input (time)
+                The amplitude will be determined by sine function.
+                To speed up the calculation, this function will be vectoized first.
+            duration:
+                Type: Optional[float]
+                Default: 1.0
+                The duration of the signal, in seconds.
+                ampFunc will be called with input values in [0, duration]
+            amplitude:
+                Type: float
+                Default: 1.0
+                The amplitude of the output singal.
+            initPhase:
+                Type: float
+                Default: 0.0
+                The initial Phase for the sine function.
+            bufferSize:
+                Type: Optional[int]
+                Default: 4096
+                The buffer size for the object.
+                If None, the whole data will be taken as one buffer,
+                    which may deteriorate the performance if npArray is too large.
+            sampleRate:
+                Type: int
+                Default: 48000
+                The sample rate of the output signal.
+            arrayInput:
+                Type: Optional[bool]
+                Default: None
+                Determine if freqFunc takes a 1D numpy.ndarray of time
+                See help(AudioOutputSignal.fromAmpFunc)
+        """
+        if arrayInput is None:
+            arrayInput = cls._acceptsNpArray(freqFunc)
+        return cls.fromAmpFunc(ampFunc=lambda t: amplitude
+                               * _np.sin(2 * _np.pi * t
+                                         * freqFunc(t)
+                                         + initPhase),
+                               duration=duration,
+                               bufferSize=bufferSize,
+                               sampleRate=sampleRate,
+                               arrayInput=arrayInput)
+
+    @classmethod
+    def fromEnvelope(cls,
+                     envelope: Envelope,
+                     duration: Optional[float] = None,
+                     bufferSize: Optional[int] = 4096,
+                     sampleRate: int = 48000):
+        """
+        Constuct AudioOutputSignal that gives the values of an envelope.
+        Useful as a control signal for automating parameters with elementwiseOp.
+        ---
+        Parameter:
+            envelope:
+                Type: Envelope
+                The envelope to be rendered
+            duration:
+                Type: Optional[float]
+                Default: None
+                The duration of the signal, in seconds.
+                If None, the signal will be infinite, holding the last value of the envelope
+            bufferSize:
+                Type: Optional[int]
+                Default: 4096
+                The buffer size for the object.
+                If None, the whole data will be taken as one buffer,
+                    which may deteriorate the performance if the signal is too long.
+            sampleRate:
+                Type: int
+                Default: 48000
+                The sample rate of the output signal.
+        ---
+        Exception:
+            If both duration and bufferSize are None, a ValueError will be raised
+        """
+        if duration is not None:
+            totalSamples = int(duration * sampleRate)
+            if bufferSize is None:
+                bufferSize = totalSamples
+        elif bufferSize is None:
+            raise ValueError("No bufferSize provided")
+        else:
+            totalSamples = None
+
+        def _fromEnvelope_gen(startFrame):
+            for startIdx in (range(startFrame, totalSamples, bufferSize)
+                             if totalSamples is not None
+                             else _it.count(startFrame, bufferSize)):
+                yield envelope.render(startIdx,
+                                      (min(bufferSize, totalSamples - startIdx)
+                                       if totalSamples is not None
+                                       else bufferSize),
+                                      sampleRate=sampleRate)
+
+        return cls(_fromEnvelope_gen(0),
+                   bufSize=bufferSize,
+                   length=((totalSamples + bufferSize - 1) // bufferSize
+                           if totalSamples is not None
+                           else float('inf')),
+                   sampleRate=sampleRate,
+                   seekFunc=_fromEnvelope_gen)
+
+    @classmethod
+    def fromFreqEnvelope(cls,
+                         frequency: Envelope,
+                         duration: Optional[float] = 1.,
+                         amplitude: float = 1.,
+                         initPhase: float = 0.,
+                         waveform: str = 'sine',
+                         bufferSize: Optional[int] = 4096,
+                         sampleRate: int = 48000):
+        """
+        Constuct AudioOutputSignal with the frequency automated by an envelope.
+        The phase is accumulated frame by frame, so the signal is not seekable.
+        ---
+        Parameter:
+            frequency:
+                Type: Envelope
+                The frequency (in Hz) over time
+            duration:
+                Type: Optional[float]
+                Default: 1.0
+                The duration of the signal, in seconds.
+                If None, the signal will be infinite
+            amplitude:
+                Type: float
+                Default: 1.0
+                The amplitude of the output singal.
+            initPhase:
+                Type: float
+                Default: 0.0
+                The initial Phase, in radians.
+            waveform:
+                Type: str
+                Default: 'sine'
+                The waveform, see help(OscillatorBank.getWavetable)
+            bufferSize:
+                Type: Optional[int]
+                Default: 4096
+                The buffer size for the object.
+                If None, the whole data will be taken as one buffer,
+                    which may deteriorate the performance if the signal is too long.
+            sampleRate:
+                Type: int
+                Default: 48000
+                The sample rate of the output signal.
+        ---
+        Exception:
+            If both duration and bufferSize are None, or waveform is unknown,
+                a ValueError will be raised
+        """
+        # a 1 Hz oscillator, its frequency is multiplied by the envelope
+        bank = OscillatorBank(1.,
+                              amplitudes=amplitude,
+                              initPhases=initPhase,
+                              waveform=waveform,
+                              sampleRate=sampleRate)
+        freqSig = cls.fromEnvelope(frequency,
+                                   duration=duration,
+                                   bufferSize=bufferSize,
+                                   sampleRate=sampleRate)
+        return cls((bank.render(len(freqBuf), freqMultiplier=freqBuf)
+                    for freqBuf in freqSig._genObj),
+                   bufSize=freqSig._bufSize,
+                   length=freqSig._length,
+                   sampleRate=sampleRate)
+
+    @classmethod
+    def fromMidi(cls,
+                 score: Union[str, MidiScore],
+                 waveform: str = 'sine',
+                 amplitude: float = 0.2,
+                 dampingFactor: float = 3.,
+                 releaseTime: float = 0.05,
+                 skipPercussion: bool = True,
+                 bufferSize: int = 4096,
+                 sampleRate: int = 48000):
+        """
+        Constuct AudioOutputSignal that plays the notes of a MIDI file.
+        Each note is the waveform damped as by AudioOutputSignal.damping
+            and faded out linearly in releaseTime after it ends.
+        The notes sounding in a buffer are rendered together as the voices of one OscillatorBank,
+            so the memory used and the time of a buffer depend on the number of notes
+            sounding at the same time, not on the length of the piece.
+        ---
+        Parameter:
+            score:
+                Type: Union[str, MidiScore]
+                The path of the MIDI file, or the parsed MidiScore
+            waveform:
+                Type: str
+                Default: 'sine'
+                The waveform of the notes, case-insensitive.
+                One of 'sine', 'square', 'saw' and 'triangle'
+            amplitude:
+                Type: float
+                Default: 0.2
+                The amplitude of a note of full velocity
+                Other notes are scaled by velocity / 127
+            dampingFactor:
+                Type: float
+                Default: 3.0
+                The dampingFactor of the 'exp' damping of each note
+                See help(AudioOutputSignal.damping)
+            releaseTime:
+                Type: float
+                Default: 0.05
+                The time for a note to fade out after it ends, in seconds
+            skipPercussion:
+                Type: bool
+                Default: True
+                Determine if the notes on the percussion channel (channel 10) are skipped
+            bufferSize:
+                Type: int
+                Default: 4096
+                The buffer size for the object.
+            sampleRate:
+                Type: int
+                Default: 48000
+                The sample rate of the output signal.
+        ---
+        Exception:
+            If the file is not a valid MIDI file, or waveform is unknown, a ValueError will be raised
+        """
+        if not isinstance(score, MidiScore):
+            score = MidiScore.fromFile(score)
+        # raises the ValueError for unknown waveforms
+        OscillatorBank.getWavetable(waveform)
+        notes = score.notes
+        if skipPercussion:
+            notes = notes[notes['channel'] != 9]
+        startFrames = _np.round(notes['start'] * sampleRate).astype(_np.int64)
+        endFrames = startFrames + ((notes['duration'] + releaseTime)
+                                   * sampleRate).astype(_np.int64)
+        totalFrames = int(_np.max(endFrames)) if len(notes) != 0 else 0
+        phaseIncs = 440. * 2. ** ((notes['pitch'] - 69.) / 12) / sampleRate
+        noteAmps = amplitude * notes['velocity'] / 127
+        # the most notes in one buffer, a note holds its voice from the buffer where it starts
+        #     to the one where it ends
+        voiceCountDiff = _np.zeros((totalFrames + bufferSize - 1) // bufferSize + 1,
+                                   dtype=_np.int64)
+        _np.add.at(voiceCountDiff, startFrames // bufferSize, 1)
+        _np.add.at(voiceCountDiff,
+                   _np.maximum(startFrames, endFrames - 1) // bufferSize + 1,
+                   -1)
+        voiceCount = int(_np.max(_np.cumsum(voiceCountDiff), initial=1))
+
+        def _fromMidi_gen():
+            bank = OscillatorBank(_np.zeros(voiceCount),
+                                  amplitudes=0.,
+                                  waveform=waveform,
+                                  sampleRate=sampleRate)
+            freeSlots = list(range(bank.voiceCount))
+            decayRow = _np.exp(_np.arange(bufferSize) * (-dampingFactor / sampleRate))
+            # the note played by each slot in use
+            slotNotes = {}
+            noteIdx = 0
+            for blockStart in range(0, totalFrames, bufferSize):
+                blockLen = min(bufferSize, totalFrames - blockStart)
+                while noteIdx < len(notes) and startFrames[noteIdx] < blockStart + blockLen:
+                    slot = freeSlots.pop()
+                    slotNotes[slot] = noteIdx
+                    bank._phaseInc[slot] = phaseIncs[noteIdx]
+                    # the phase is 0 at the start of the note
+                    bank._phase[slot] = (-(startFrames[noteIdx] - blockStart)
+                                         * phaseIncs[noteIdx]) % 1.
+                    noteIdx += 1
+                slots = _np.fromiter(slotNotes.keys(), dtype=_np.intp, count=len(slotNotes))
+                noteIdxArr = _np.fromiter(slotNotes.values(), dtype=_np.intp,
+                                          count=len(slotNotes))
+                voiceBuf = bank._renderVoices(blockLen, voiceIdx=slots)
+                # the damping of a note is its level at the start of the buffer times decayRow,
+                #     so the notes that neither start nor end in the buffer are mixed by one matmul
+                noteStartFrame = blockStart - startFrames[noteIdxArr]
+                blockLevels = noteAmps[noteIdxArr] \
+                    * _np.exp(noteStartFrame * (-dampingFactor / sampleRate))
+                lastFrame = noteStartFrame + blockLen - 1
+                isSteady = (noteStartFrame >= 0) \
+                    & (lastFrame / sampleRate <= notes['duration'][noteIdxArr]) \
+                    & (lastFrame < (endFrames - startFrames)[noteIdxArr])
+                mixBuf = _np.where(isSteady, blockLevels, 0.) @ voiceBuf
+                mixBuf *= decayRow[:blockLen]
+                edgeIdx = _np.flatnonzero(~isSteady)
+                if len(edgeIdx) != 0:
+                    # the frames since the start of each note, shape (notes, frames)
+                    noteFrame = noteStartFrame[edgeIdx, None] + _np.arange(blockLen)
+                    noteTime = noteFrame / sampleRate
+                    levels = blockLevels[edgeIdx, None] * decayRow[:blockLen]
+                    if releaseTime > 0:
+                        levels *= _np.clip((notes['duration'][noteIdxArr[edgeIdx], None]
+                                            + releaseTime - noteTime) / releaseTime,
+                                           0., 1.)
+                    levels[(noteFrame < 0)
+                           | (noteFrame >= (endFrames - startFrames)[noteIdxArr[edgeIdx], None])] \
+                        = 0.
+                    mixBuf += _np.einsum('vn,vn->n', voiceBuf[edgeIdx], levels)
+                outBuf = mixBuf.astype(_np.float32)
+                for (slot, endFrame) in zip(slots, endFrames[noteIdxArr]):
+                    if endFrame <= blockStart + blockLen:
+                        del slotNotes[slot]
+                        freeSlots.append(slot)
+                yield outBuf
+
+        return cls(_fromMidi_gen(),
+                   bufSize=bufferSize,
+                   length=(totalFrames + bufferSize - 1) // bufferSize,
+                   sampleRate=sampleRate)
+
+    @classmethod
+    def silentSignal(cls,
+                     duration: Optional[float] = 1.,
+                     bufferSize: Optional[int] = 4096,
+                     sampleRate: int = 48000):
+        """
+        Constuct AudioOutputSignal that gives an empty signal.
+        ---
+        Parameter:
+            duration:
+                Type: Optional[float]
+                Default: 1.0
+                The duration of the signal, in seconds.
+                ampFunc will be called with input values in [0, duration]
+            bufferSize:
+                Type: Optional[int]
+                Default: 4096
+                The buffer size for the object.
+                If None, the whole data will be taken as one buffer,
+                    which may deteriorate the performance if npArray is too large.
+            sampleRate:
+                Type: int
+                Default: 48000
+                The sample rate of the output signal.
+        """
+        if duration is not None:
+            totalSamples = int(duration * sampleRate)
+            if bufferSize is None:
+                bufferSize = totalSamples
+        elif bufferSize is None:
+            raise ValueError("No bufferSize provided")
+        # all buffers are (read-only) views of the same zero buffer
+        zeroBuf = _np.zeros(bufferSize, dtype=_np.float32)
+        zeroBuf.flags.writeable = False
+        if duration is not None:
+            nPieces = (totalSamples + bufferSize - 1) // bufferSize
+
+            def _silentSignal_gen(startFrame):
+                return (zeroBuf[:min(bufferSize, totalSamples - startIdx)]
+                        for startIdx in range(startFrame, totalSamples, bufferSize))
+
+            return cls(_silentSignal_gen(0),
+                       bufSize=bufferSize,
+                       length=nPieces,
+                       sampleRate=sampleRate,
+                       seekFunc=_silentSignal_gen)
+        else:
+            return cls(_it.repeat(zeroBuf),
+                       bufSize=bufferSize,
+                       length=float('inf'),
+                       sampleRate=sampleRate,
+                       seekFunc=lambda startFrame: _it.repeat(zeroBuf))
+
+    @classmethod
+    def _fromOscillatorBank(cls,
+                            bank: OscillatorBank,
+                            duration: Optional[float] = 1.,
+                            bufferSize: Optional[int] = 4096,
+                            sampleRate: int = 48000):
+        """
+        Constuct AudioOutputSignal from an OscillatorBank.
+        The parameters are the same as in AudioOutputSignal.fromAmpFunc.
+        """
+        if duration is not None:
+            totalSamples = int(duration * sampleRate)
+            if bufferSize is None:
+                bufferSize = totalSamples
+            nPieces = (totalSamples + bufferSize - 1) // bufferSize
+
+            def _fromOscillatorBank_gen(startFrame):
+                # each generator has its own phases, so that seeking one does not move the others
+                genBank = bank.copy()
+                genBank.seek(startFrame)
+                return (genBank.render(min(bufferSize, totalSamples - startIdx))
+                        for startIdx in range(startFrame, totalSamples, bufferSize))
+
+            return cls(_fromOscillatorBank_gen(0),
+                       bufSize=bufferSize,
+                       length=nPieces,
+                       sampleRate=sampleRate,
+                       seekFunc=_fromOscillatorBank_gen)
+        else:
+            if bufferSize is None:
+                raise ValueError("No bufferSize provided")
+
+            def _fromOscillatorBank_gen(startFrame):
+                genBank = bank.copy()
+                genBank.seek(startFrame)
+                return (genBank.render(bufferSize) for _ in _it.count())
+
+            return cls(_fromOscillatorBank_gen(0),
+                       bufSize=bufferSize,
+                       length=float('inf'),
+                       sampleRate=sampleRate,
+                       seekFunc=_fromOscillatorBank_gen)
+
+    @classmethod
+    def sineWave(cls,
+                 frequency: float,
+                 duration: Optional[float] = 1.,
+                 amplitude: float = 1.,
+                 initPhase: float = 0.,
+                 bufferSize: Optional[int] = 4096,
+                 sampleRate: int = 48000):
+        """
+        Constuct AudioOutputSignal that gives a constant frequency signal.
+        ---
+        Parameter:
+            frequency:
+                Type: float
+                The frequency of the output signal, in Hz.
+            duration:
+                Type: Optional[float]
+                Default: 1.0
+                The duration of the signal, in seconds.
+                ampFunc will be called with input values in [0, duration]
+            amplitude:
+                Type: float
+                Default: 1.0
+                The amplitude of the output singal.
+            initPhase:
+                Type: float
+                Default: 0.0
+                The initial Phase for the sine function.
+            bufferSize:
+                Type: Optional[int]
+                Default: 4096
+                The buffer size for the object.
+                If None, the whole data will be taken as one buffer,
+                    which may deteriorate the performance if npArray is too large.
+            sampleRate:
+                Type: int
+                Default: 48000
+                The sample rate of the output signal.
+        """
+        return cls._fromOscillatorBank(
+            OscillatorBank(frequency,
+                           amplitudes=amplitude,
+                           initPhases=initPhase,
+                           waveform='sine',
+                           sampleRate=sampleRate),
+            duration=duration,
+            bufferSize=bufferSize,
+            sampleRate=sampleRate)
+
+    @classmethod
+    def unitSound(cls, frequency: float):
+        """
+        Constuct AudioOutputSignal that gives an empty signal.
+        Wrapper of sineWave.
+        The duration is exactly one period of the signal.
+        All other parameters for sineWave are the default parameters.
+        ---
+        Parameter:
+            frequency:
+                Type: float
+                The frequency of the output signal.
+        """
+        return cls.sineWave(frequency=frequency,
+                            duration=1. / frequency)
+
+    @classmethod
+    def squareWave(cls,
+                   frequency: float,
+                   duration: Optional[float] = 1.,
+                   amplitude: float = 1.,
+                   bufferSize: Optional[int] = 4096,
+                   sampleRate: int = 48000):
+        """
+        Constuct AudioOutputSignal that gives a square wave.
+        ---
+        Parameter:
+            frequency:
+                Type: float
+                The frequency of the output signal, in Hz.
+            duration:
+                Type: Optional[float]
+                Default: 1.0
+                The duration of the signal, in seconds.
+                ampFunc will be called with input values in [0, duration]
+            amplitude:
+                Type: float
+                Default: 1.0
+                The amplitude of the output singal.
+            initPhase:
+                Type: float
+                Default: 0.0
+                The initial Phase for the sine function.
+            bufferSize:
+                Type: Optional[int]
+                Default: 4096
+                The buffer size for the object.
+                If None, the whole data will be taken as one buffer,
+                    which may deteriorate the performance if npArray is too large.
+            sampleRate:
+                Type: int
+                Default: 48000
+                The sample rate of the output signal.
+        """
+        return cls._fromOscillatorBank(
+            OscillatorBank(frequency,
+                           amplitudes=amplitude,
+                           waveform='square',
+                           sampleRate=sampleRate),
+            duration=duration,
+            bufferSize=bufferSize,
+            sampleRate=sampleRate)
+
+    @classmethod
+    def sawWave(cls,
+                frequency: float,
+                duration: Optional[float] = 1.,
+                amplitude: float = 1.,
+                bufferSize: Optional[int] = 4096,
+                sampleRate: int = 48000):
+        """
+        Constuct AudioOutputSignal that gives a saw wave.
+        ---
+        Parameter:
+            frequency:
+                Type: float
+                The frequency of the output signal, in Hz.
+            duration:
+                Type: Optional[float]
+                Default: 1.0
+                The duration of the signal, in seconds.
+                ampFunc will be called with input values in [0, duration]
+            amplitude:
+                Type: float
+                Default: 1.0
+                The amplitude of the output singal.
+            bufferSize:
+                Type: Optional[int]
+                Default: 4096
+                The buffer size for the object.
+                If None, the whole data will be taken as one buffer,
+                    which may deteriorate the performance if npArray is too large.
+            sampleRate:
+                Type: int
+                Default: 48000
+                The sample rate of the output signal.
+        """
+        return cls._fromOscillatorBank(
+            OscillatorBank(frequency,
+                           amplitudes=amplitude,
+                           waveform='saw',
+                           sampleRate=sampleRate),
+            duration=duration,
+            bufferSize=bufferSize,
+            sampleRate=sampleRate)
+
+    @classmethod
+    def triangleWave(cls,
+                     frequency: float,
+                     duration: Optional[float] = 1.,
+                     amplitude: float = 1.,
+                     bufferSize: Optional[int] = 4096,
+                     sampleRate: int = 48000):
+        """
+        Constuct AudioOutputSignal that gives a triangle wave.
+        ---
+        Parameter:
+            frequency:
+                Type: float
+                The frequency of the output signal, in Hz.
+            duration:
+                Type: Optional[float]
+                Default: 1.0
+                The duration of the signal, in seconds.
+                ampFunc will be called with input values in [0, duration]
+            amplitude:
+                Type: float
+                Default: 1.0
+                The amplitude of the output singal.
+            bufferSize:
+                Type: Optional[int]
+                Default: 4096
+                The buffer size for the object.
+                If None, the whole data will be taken as one buffer,
+                    which may deteriorate the performance if npArray is too large.
+            sampleRate:
+                Type: int
+                Default: 48000
+                The sample rate of the output signal.
+        """
+        return cls._fromOscillatorBank(
+            OscillatorBank(frequency,
+                           amplitudes=amplitude,
+                           waveform='triangle',
+                           sampleRate=sampleRate),
+            duration=duration,
+            bufferSize=bufferSize,
+            sampleRate=sampleRate)
+
+    def toNpArray(self,
+                  frameLimit: int = 60 * 48000,
+                  getLenOnly: bool = False):
+        """
+        Returns the underlying data as a numpy.ndarray.
+        ---
+        Parameter:
+            frameLimit:
+                Type: int
+                Default: 60 * 48000
+                The maximal number of frames outputed.
+                The default corresponds to 60 seconds in 48k sample rate.
+                If frameLimit is negative, the whole signal will be outputed.
+            getLenOnly:
+                Type: bool
+                Default: False
+                Returns only the length of the signal in number of frames.
+        ---
+        Return:
+            The whole data as encoded in a 1D numpy.ndarray,
+                or a 2D numpy.ndarray of shape (frames, channels) for multi-channel signals.
+            If getLenOnly is True, returns only the length of the numpy.ndarray.
+        ---
+        Exception:
+            If the object is invalid, a ValueError will be raised
+        ---
+        Side Effect:
+            The object will be set invalided after calling this function.
+        """
+        if not self.isInEffect:
+            raise ValueError("No valid signal data")
+        if getLenOnly:
+            # TODO: isolate this to a separate function
+            return len(self.toNpArray(frameLimit=frameLimit,
+                                      getLenOnly=False))
+        # extract np array till the end if frameLimit is negative
+        self._isInEffect = False
+        frameLimit = int(frameLimit)
+        if frameLimit < 0:
+            return _np.concatenate(tuple(self._genObj))
+        else:
+            # fill an array growing geometrically up to frameLimit,
+            # so that the buffers can be reused
+            res = None
+            filledFrames = 0
+            for buf in self._compile(reuseBuffer=True):
+                bufLen = min(len(buf), frameLimit - filledFrames)
+                if res is None:
+                    if self._length is not None and self._bufSize is not None \
+                            and self._length != float('inf'):
+                        capacity = int(self._length * self._bufSize)
+                    else:
+                        capacity = 4 * len(buf)
+                    res = _np.empty((max(min(capacity, frameLimit), bufLen), )
+                                    + buf.shape[1:],
+                                    dtype=buf.dtype)
+                elif filledFrames + bufLen > len(res):
+                    newRes = _np.empty((min(2 * len(res) + bufLen, frameLimit), )
+                                       + res.shape[1:],
+                                       dtype=res.dtype)
+                    newRes[:filledFrames] = res[:filledFrames]
+                    res = newRes
+                res[filledFrames:filledFrames + bufLen] = buf[:bufLen]
+                filledFrames += bufLen
+                if filledFrames >= frameLimit:
+                    break
+            if res is None:
+                raise ValueError("No valid signal data")
+            if filledFrames < len(res) // 2:
+                # do not keep the unused part alive
+                return res[:filledFrames].copy()
+            return res[:filledFrames]
+
+    @staticmethod
+    def _wavHeader(frameCount: int, sampleRate: int, channels: int = 1):
+        """
+        The header of a 32-bit IEEE float WAV file with frameCount frames.
+        """
+        dataSize = frameCount * 4 * channels
+        return (b'RIFF'
+                + _struct.pack('<I', 4 + (8 + 18) + (8 + 4) + (8 + dataSize))
+                + b'WAVE'
+                + b'fmt ' + _struct.pack('<IHHIIHHH',
+                                         18, 3, channels, sampleRate,
+                                         sampleRate * 4 * channels,
+                                         4 * channels, 32, 0)
+                + b'fact' + _struct.pack('<II', 4, frameCount)
+                + b'data' + _struct.pack('<I', dataSize))
+
+    def toWav(self,
+              path: str,
+              sampleRate: Optional[int] = None,
+              frameLimit: int = -1):
+        """
+        Write the signal to a 32-bit float WAV file, with the channels of the signal.
+        The buffers are written to the file one by one,
+            so the signal does not need to fit in memory.
+        ---
+        Parameter:
+            path:
+                Type: str
+                The path of the output file
+            sampleRate:
+                Type: Optional[int]
+                Default: None
+                The sample rate recorded in the file
+                If None, the sample rate of the signal will be used
+            frameLimit:
+                Type: int
+                Default: -1
+                The maximal number of frames written
+                If frameLimit is negative, the whole signal will be written
+        ---
+        Return:
+            The number of frames written
+        ---
+        Exception:
+            If the object is invalid, a ValueError will be raised
+            If the data exceeds the 4 GiB limit of WAV files, a ValueError will be raised
+        ---
+        Side Effect:
+            The object will be set invalid after calling this function.
+        """
+        sampleRate = self._sampleRateOr(sampleRate)
+        if not self.isInEffect:
+            raise ValueError("No valid signal data")
+        self._isInEffect = False
+        maxFrameCount = (2 ** 32 - 1 - len(self._wavHeader(0, sampleRate))) \
+            // (4 * self._channels)
+        frameCount = 0
+        with open(path, 'wb') as f:
+            f.write(self._wavHeader(0, sampleRate, self._channels))
+            for buf in self._compile(reuseBuffer=True):
+                if frameLimit >= 0:
+                    buf = buf[:frameLimit - frameCount]
+                if frameCount + len(buf) > maxFrameCount:
+                    raise ValueError("Signal too long for a WAV file")
+                buf.astype('<f4', copy=False).tofile(f)
+                frameCount += len(buf)
+                if frameLimit >= 0 and frameCount >= frameLimit:
+                    break
+            f.seek(0)
+            f.write(self._wavHeader(frameCount, sampleRate, self._channels))
+        return frameCount
+
+    @classmethod
+    def fromWav(cls,
+                path: str,
+                bufferSize: Optional[int] = 4096,
+                sampleRate: Optional[int] = None,
+                keepChannels: bool = False):
+        """
+        Construct AudioOutputSignal from a WAV file.
+        The file is memory-mapped and read buffer by buffer.
+        For mono 32-bit float files, the buffers are views of the file without copying.
+        Other files are converted to float32 in [-1, 1] on each buffer,
+            and multiple channels are averaged to one unless keepChannels is True.
+        ---
+        Parameter:
+            path:
+                Type: str
+                The path of the WAV file
+            bufferSize:
+                Type: Optional[int]
+                Default: 4096
+                The buffer size for the object.
+                If None, the whole data will be taken as one buffer.
+            sampleRate:
+                Type: Optional[int]
+                Default: None
+                The sample rate of the output signal
+                If it differs from that of the file, the signal will be resampled
+                If None, the sample rate of the file is used
+            keepChannels:
+                Type: bool
+                Default: False
+                Determine if a multi-channel file gives a multi-channel signal
+        ---
+        Exception:
+            If the file is not a supported WAV file, a ValueError will be raised
+        """
+        fmtChunk = None
+        with open(path, 'rb') as f:
+            riffHeader = f.read(12)
+            if len(riffHeader) < 12 \
+                    or riffHeader[:4] != b'RIFF' or riffHeader[8:] != b'WAVE':
+                raise ValueError(f"{path} is not a WAV file")
+            while True:
+                chunkHeader = f.read(8)
+                if len(chunkHeader) < 8:
+                    raise ValueError(f"No data chunk found in {path}")
+                chunkId, chunkSize = _struct.unpack('<4sI', chunkHeader)
+                if chunkId == b'fmt ':
+                    fmtChunk = f.read(chunkSize)
+                    f.seek(chunkSize % 2, 1)
+                elif chunkId == b'data':
+                    dataOffset = f.tell()
+                    dataSize = chunkSize
+                    fileSize = f.seek(0, 2)
+                    break
+                else:
+                    f.seek(chunkSize + chunkSize % 2, 1)
+        if fmtChunk is None:
+            raise ValueError(f"No format chunk found in {path}")
+        formatTag, channels, fileSampleRate, _, blockAlign, bitDepth \
+            = _struct.unpack('<HHIIHH', fmtChunk[:16])
+        if formatTag == 0xFFFE:  # WAVE_FORMAT_EXTENSIBLE
+            formatTag = _struct.unpack('<H', fmtChunk[24:26])[0]
+        # dtype, offset, scale
+        dtypeInfo = {
+            (1, 8): ('u1', 128., 128.),
+            (1, 16): ('<i2', 0., 2. ** 15),
+            (1, 32): ('<i4', 0., 2. ** 31),
+            (3, 32): ('<f4', 0., 1.),
+            (3, 64): ('<f8', 0., 1.),
+        }.get((formatTag, bitDepth), None)
+        if dtypeInfo is None:
+            raise ValueError(f"Unsupported WAV format {formatTag} "
+                             f"with {bitDepth} bits")
+        dtype, offset, scale = dtypeInfo
+        # the data size may be unset (or wrong) if the file was not closed properly
+        frameCount = min(dataSize, fileSize - dataOffset) // blockAlign
+        outChannels = channels if keepChannels else 1
+        if frameCount == 0:
+            return cls(iter(()),
+                       bufSize=bufferSize,
+                       length=0,
+                       channels=outChannels,
+                       sampleRate=sampleRate or fileSampleRate)
+        dataArr = _np.memmap(path,
+                             dtype=dtype,
+                             mode='r',
+                             offset=dataOffset,
+                             shape=(frameCount, channels))
+        if bufferSize is None:
+            bufferSize = frameCount
+        if dtype == '<f4' and (channels == 1 or keepChannels):
+            return cls.fromNpArray(dataArr if channels > 1 else dataArr.reshape(-1),
+                                   bufferSize=bufferSize,
+                                   sampleRate=fileSampleRate)\
+                .resample(sampleRate or fileSampleRate)
+
+        def _fromWav_gen(startFrame):
+            for startIdx in range(startFrame, frameCount, bufferSize):
+                buf = dataArr[startIdx:startIdx + bufferSize]
+                buf = (buf.mean(axis=1, dtype=_np.float32)
+                       if outChannels == 1 and channels > 1
+                       else buf[:, 0].astype(_np.float32)
+                       if channels == 1
+                       else buf.astype(_np.float32))
+                if scale != 1.:
+                    buf -= offset
+                    buf /= scale
+                yield buf
+
+        return cls(_fromWav_gen(0),
+                   bufSize=bufferSize,
+                   length=(frameCount + bufferSize - 1) // bufferSize,
+                   channels=outChannels,
+                   sampleRate=fileSampleRate,
+                   seekFunc=_fromWav_gen).resample(sampleRate or fileSampleRate)
+
+    def toFlac(self,
+               path: str,
+               sampleRate: Optional[int] = None,
+               frameLimit: int = -1):
+        """
+        Write the signal to a 24-bit FLAC file, with the channels of the signal.
+        The buffers are encoded one by one,
+            so the signal does not need to fit in memory.
+        Requires soundfile.
+        ---
+        Parameter:
+            path:
+                Type: str
+                The path of the output file
+            sampleRate:
+                Type: Optional[int]
+                Default: None
+                The sample rate recorded in the file
+                If None, the sample rate of the signal will be used
+            frameLimit:
+                Type: int
+                Default: -1
+                The maximal number of frames written
+                If frameLimit is negative, the whole signal will be written
+        ---
+        Return:
+            The number of frames written
+        ---
+        Exception:
+            If the object is invalid, a ValueError will be raised
+        ---
+        Side Effect:
+            The object will be set invalid after calling this function.
+        """
+        import soundfile as sf
+        sampleRate = self._sampleRateOr(sampleRate)
+        if not self.isInEffect:
+            raise ValueError("No valid signal data")
+        self._isInEffect = False
+        frameCount = 0
+        with sf.SoundFile(path, 'w',
+                          samplerate=sampleRate,
+                          channels=self._channels,
+                          format='FLAC',
+                          subtype='PCM_24') as f:
+            for buf in self._compile(reuseBuffer=True):
+                if frameLimit >= 0:
+                    buf = buf[:frameLimit - frameCount]
+                f.write(buf)
+                frameCount += len(buf)
+                if frameLimit >= 0 and frameCount >= frameLimit:
+                    break
+        return frameCount
+
+    @classmethod
+    def fromFlac(cls,
+                 path: str,
+                 bufferSize: int = 4096,
+                 sampleRate: Optional[int] = None,
+                 keepChannels: bool = False):
+        """
+        Construct AudioOutputSignal from a FLAC file.
+        The file is decoded buffer by buffer,
+            and multiple channels are averaged to one unless keepChannels is True.
+        Requires soundfile.
+        ---
+        Parameter:
+            path:
+                Type: str
+                The path of the FLAC file
+            bufferSize:
+                Type: int
+                Default: 4096
+                The buffer size for the object.
+            sampleRate:
+                Type: Optional[int]
+                Default: None
+                The sample rate of the output signal
+                If it differs from that of the file, the signal will be resampled
+                If None, the sample rate of the file is used
+            keepChannels:
+                Type: bool
+                Default: False
+                Determine if a multi-channel file gives a multi-channel signal
+        """
+        import soundfile as sf
+        fileInfo = sf.info(path)
+
+        def _fromFlac_gen():
+            for buf in sf.blocks(path,
+                                 blocksize=bufferSize,
+                                 dtype='float32',
+                                 always_2d=True):
+                yield (buf[:, 0]
+                       if buf.shape[1] == 1
+                       else buf
+                       if keepChannels
+                       else buf.mean(axis=1, dtype=_np.float32))
+
+        return cls(_fromFlac_gen(),
+                   bufSize=bufferSize,
+                   length=(fileInfo.frames + bufferSize - 1) // bufferSize,
+                   channels=fileInfo.channels if keepChannels else 1,
+                   sampleRate=fileInfo.samplerate)\
+            .resample(sampleRate or fileInfo.samplerate)
+
+    def join(self, *sigObj):
+        """
+        Joining multiple AudioOutputSignal objects.
+        ---
+        Parameters:
+            *sigObj:
+                Type: AudioOutputSignal
+                The objects to be joined with this AudioOutputSignal object.
+                All objects will be joined in order.
+                Objects of other sample rates are resampled to that of this object.
+        ---
+        Return:
+            A new AudioOutputSignal object that contains all data joined in sequence.
+        ---
+        Exception:
+            If some of the objects is invalid, a ValueError will be raised
+        ---
+        Side Effect:
+            All AudioOutputSignal objects, including this one, will be set invalid.
+            In the case where an exception is raised, all objects iterated before the
+                exception is raised will be set invalid
+        """
+        if not self.isInEffect:
+            raise ValueError("No valid signal data")
+        if len(sigObj) == 0:
+            return self
+        elif len(sigObj) == 1:
+            # TODO: deal with different buffer size
+            # currently use only the first one (self)
+            sigObj = sigObj[0]
+            if not sigObj.isInEffect:
+                raise ValueError("No valid signal data")
+            if sigObj._channels != self._channels:
+                raise ValueError("Signals have different number of channels")
+            (sampleRate, (sigObj, )) = self._matchSampleRate([sigObj])
+            self._isInEffect = False
+            sigObj._isInEffect = False
+            return self.__class__(
+                _it.chain(self._genObj, sigObj._genObj),
+                bufSize=self._bufSize,
+                channels=self._channels,
+                sampleRate=sampleRate,
+                length=(self._length + sigObj._length
+                        if all(x is not None
+                               for x in (self._length, sigObj._length))
+                        else float('inf')))
+        else:
+            return self.join(sigObj[0]).join(*(sigObj[1:]))
+
+    @classmethod
+    def joinSignals(cls, *sigObj):
+        """
+        Construct a new AudioOutputSignal from all AudioOutputSignal inputted.
+        Wrapper of AudioOutputSignal.join.
+        ---
+        Parameter:
+            *sigObj:
+                Type: AudioOutputSignal
+                The AudioOutputSignal objects to be joined.
+                All objects will be joined in order.
+        ---
+        Return:
+            A new AudioOutputSignal object that contains all data joined in sequence.
+        ---
+        Exception:
+            If some of the objects is invalid, a ValueError will be raised
+        ---
+        Side Effect:
+            All AudioOutputSignal objects, including this one, will be set invalid.
+            In the case where an exception is raised, all objects iterated before the
+                exception is raised will be set invalid
+        """
+        if len(sigObj) == 0:
+            return cls.silentSignal(duration=None)
+        else:
+            return sigObj[0].join(*sigObj[1:])
+
+    def joinSmooth(self,
+                   *sigObj,
+                   mode: str = 'linear',
+                   transitDuration: float = 0.1,
+                   sampleRate: Optional[int] = None):
+        """
+        Join AudioOutputSignal, but smoothly
+        ---
+        Parameter:
+            *sigObj:
+                Type: AudioOutputSignal
+                The objects to be joined with this one
+                Objects of other sample rates are resampled to that of this object
+            mode:
+                Type: str
+                Default: 'linear'
+                Keyword only
+                The method used to join the signals together
+                Currently only accept two options:
+                    'linear': The amplitude during the transition period is linearly interpolated
+                              from the adjacent buffers
+                    'zero':   The amplitude during the transition period is simple zero
+            transitDuration:
+                Type: float
+                Default: 0.1
+                The length of the transition period, in seconds
+            sampleRate:
+                Type: Optional[int]
+                Default: None
+                The sample rate of the output signal
+                If None, the sample rate of the signal will be used
+        ---
+        Return:
+            A new AudioOutputSignal object that contains all data joined in sequence.
+            If no sigObj is given, will return self
+        ---
+        Exception:
+            If some of the objects is invalid, a ValueError will be raised
+        ---
+        Side Effect:
+            All AudioOutputSignal objects, including this one, will be set invalid.
+            In the case where an exception is raised, all objects iterated before the
+                exception is raised will be set invalid
+        """
+        sampleRate = self._sampleRateOr(sampleRate)
+        if not self.isInEffect:
+            raise ValueError("No valid signal data")
+        transitFrameCount = int(transitDuration * sampleRate)
+        if len(sigObj) == 0:
+            return self
+        elif len(sigObj) == 1:
+            if not sigObj[0].isInEffect:
+                raise ValueError("No valid signal data")
+            if sigObj[0]._channels != self._channels:
+                raise ValueError("Signals have different number of channels")
+            (newSampleRate, sigObj) = self._matchSampleRate(sigObj[:1])
+            self._isInEffect = False
+            sigObj[0]._isInEffect = False
+            interpolFunc = {
+                'linear': (
+                    lambda buf1, buf2:
+                    _np.linspace(buf1[-1] if len(buf1) != 0 else 0. * buf2[0],
+                                 buf2[0],
+                                 num=transitFrameCount)),
+                'zero': (lambda buf1, buf2:
+                         _np.zeros((transitFrameCount, ) + buf2.shape[1:])),
+            }.get(mode,
+                  lambda buf1, buf2: _np.zeros(0))
+
+            def _joinSmooth_gen(firstGen, secondGen):
+                lastBuf = _np.zeros(0)
+                for buf in firstGen:
+                    yield buf
+                    lastBuf = buf
+                newBuf = next(secondGen, None)
+                if newBuf is not None:
+                    yield interpolFunc(lastBuf, newBuf)
+                    yield newBuf
+                    yield from secondGen
+
+            return self.__class__(
+                _joinSmooth_gen(self._genObj, sigObj[0]._genObj),
+                bufSize=self._bufSize,
+                channels=self._channels,
+                sampleRate=newSampleRate,
+                length=(self._length + 1 + sigObj[0]._length
+                        if all(x is not None
+                               for x in (self._length, sigObj[0]._length))
+                        else float('inf')))
+        else:
+            return self.joinSmooth(
+                sigObj[0],
+                mode=mode,
+                transitDuration=transitDuration,
+                sampleRate=sampleRate).joinSmooth(
+                *(sigObj[1:]),
+                mode=mode,
+                transitDuration=transitDuration,
+                sampleRate=sampleRate)
+
+    @classmethod
+    def joinSignalsSmooth(cls,
+                          *sigObj,
+                          mode: str = 'linear',
+                          transitDuration: float = 1.,
+                          sampleRate: Optional[int] = None):
+        """
+        Join AudioOutputSignal, but smoothly
+        ---
         Parameter:
-            frameLimit:
-                Type: int
-                Default: 60 * 48000
-                The maximal number of frames outputed.
-                The default corresponds to 60 seconds in 48k sample rate.
-                If frameLimit is negative, the whole signal will be outputed.
-            getLenOnly:
+            *sigObj:
+                Type: AudioOutputSignal
+                The objects to be joined together
+            mode:
+                Type: str
+                Default: 'linear'
+                Keyword only
+                The method used to join the signals together
+                Currently only accept two options:
+                    'linear': The amplitude during the transition period is linearly interpolated
+                              from the adjacent buffers
+                    'zero':   The amplitude during the transition period is simple zero
+            transitDuration:
+                Type: float
+                Default: 0.1
+                The length of the transition period, in seconds
+            sampleRate:
+                Type: Optional[int]
+                Default: None
+                The sample rate of the output signal
+                If None, the sample rate of the signal will be used
+        ---
+        Return:
+            A new AudioOutputSignal object that contains all data joined in sequence.
+            If no sigObj is given, will return a silent signal of infinite length
+        ---
+        Exception:
+            If some of the objects is invalid, a ValueError will be raised
+        ---
+        Side Effect:
+            All AudioOutputSignal objects, including this one, will be set invalid.
+            In the case where an exception is raised, all objects iterated before the
+                exception is raised will be set invalid
+        """
+        if len(sigObj) == 0:
+            return cls.silentSignal(duration=None)
+        else:
+            return sigObj[0].joinSmooth(*sigObj[1:],
+                                        mode=mode,
+                                        transitDuration=transitDuration,
+                                        sampleRate=sampleRate)
+
+    def damping(self,
+                dampingFactor: float = 1.,
+                dampingMethod: Union[str, Callable] = 'exp',
+                tol: Optional[float] = None,
+                stopBelowTol: bool = False,
+                sampleRate: Optional[int] = None):
+        """
+        Tone down the signal to zero
+        ---
+        Parameter:
+            dampingFactor:
+                Type: float
+                Default: 1.0
+                On default dampingMethod, the frequency factor used to damp the signal
+                Ignored if dampingMethod is a callable
+            dampingMethod:
+                Type: Union[str, Callable]
+                Default: 'exp'
+                The method used to give the multiplie to damp the signal on its amplitude
+                The following default damping methods can be specified with a case-insensitive string:
+                    'exp': the amplitude will decrease as exp(- a t)
+                    'linear': the amplitude will decrease as 1 / (1 + a t)
+                    'quad': the amplitude will decrease as 1 / (1 + (a t) ** 2)
+                    'cubic': the amplitude will decrease as 1 / (1 + (a t) ** 3)
+                    where a is the dampingFactor
+                If dampingMethod is a string not in the above list, will fall back to 'exp'
+                If dampingMethod is callable, it will be used to directly
+                    In this case, it is assumed to take a 1D numpy.ndarray as time
+                        and returns a numpy.ndarray of the same length
+            tol:
+                Type: Optional[float]
+                Default: None
+                The minimal playable damping multiplier to be seen nonzero
+                If the damping multiplier goes below this value, the output will be consider zero
+                If None, tol will be set to -1 and stopBelowTol will be set to False
+            stopBelowTol:
                 Type: bool
                 Default: False
-                Returns only the length of the signal in number of frames.
+                Determine if the signal should stop on the first time the damping multiplier goes
+                    below tol
+            sampleRate:
+                Type: Optional[int]
+                Default: None
+                The sample rate of the output signal
+                If None, the sample rate of the signal will be used
+        ---
+        Return:
+            An AudioOutputSignal object that records the damped signal
+        ---
+        Exception:
+            If the object is invalid, a ValueError will be raised
+        ---
+        Side Effect:
+            The original AudioOutputSignal object will be set invalid
+        """
+        sampleRate = self._sampleRateOr(sampleRate)
+        if not self.isInEffect:
+            raise ValueError("No valid signal data")
+        if tol is None:
+            tol = -1
+            stopBelowTol = False
+        if not callable(dampingMethod):
+            # computed in place, t will be overwritten by the multiplier
+            dampingFuncDict = {
+                'exp': lambda t: _np.exp(
+                    _np.multiply(t, -dampingFactor, out=t), out=t),
+                'linear': lambda t: _np.reciprocal(
+                    _np.add(_np.multiply(t, dampingFactor, out=t), 1, out=t),
+                    out=t),
+                'quad': lambda t: _np.reciprocal(
+                    _np.add(_np.square(_np.multiply(t, dampingFactor, out=t),
+                                       out=t), 1, out=t),
+                    out=t),
+                'cubic': lambda t: _np.reciprocal(
+                    _np.add(_np.power(_np.multiply(t, dampingFactor, out=t),
+                                      3, out=t), 1, out=t),
+                    out=t)
+            }
+            dampingMethod = dampingFuncDict.get(dampingMethod.lower(),
+                                                dampingFuncDict['exp'])
+        rampBuf = _np.arange(self._bufSize or 0, dtype=_np.float64)
+        timeBuf = _np.empty_like(rampBuf)
+        maskBuf = _np.empty(len(rampBuf), dtype=bool)
+
+        def _damping_op(buf, frameOffset):
+            nonlocal rampBuf, timeBuf, maskBuf
+            bufLen = len(buf)
+            if len(rampBuf) < bufLen:
+                rampBuf = _np.arange(bufLen, dtype=_np.float64)
+                timeBuf = _np.empty_like(rampBuf)
+                maskBuf = _np.empty(bufLen, dtype=bool)
+            damper = _np.add(rampBuf[:bufLen], frameOffset, out=timeBuf[:bufLen])
+            _np.divide(damper, sampleRate, out=damper)
+            damper = dampingMethod(damper)
+            if damper[0] < tol:
+                if stopBelowTol:
+                    return 0
+                buf.fill(0)
+            else:
+                mask = _np.less(damper, tol, out=maskBuf[:bufLen])
+                if buf.ndim == 2:
+                    damper, mask = damper[:, None], mask[:, None]
+                _np.multiply(buf, damper, out=buf)
+                _np.copyto(buf, 0, where=mask)
+
+        return self._withOp(_damping_op)
+
+    def applyEnvelope(self,
+                      envelope: Union[Envelope, Iterable],
+                      stopAtEnd: bool = False,
+                      sampleRate: Optional[int] = None):
+        """
+        Multiply the signal by an envelope
+        ---
+        Parameter:
+            envelope:
+                Type: Union[Envelope, Iterable]
+                The gain over time, counted from the current start of the signal
+                If an iterable is given, it is taken as the breakpoints of a linear Envelope
+                See help(Envelope.adsr) for attack-decay-sustain-release envelopes
+            stopAtEnd:
+                Type: bool
+                Default: False
+                Determine if the signal should stop at the last breakpoint of the envelope
+                    (e.g. after the release of an ADSR envelope)
+            sampleRate:
+                Type: Optional[int]
+                Default: None
+                The sample rate of the output signal
+                If None, the sample rate of the signal will be used
+        ---
+        Return:
+            An AudioOutputSignal object that records the modified signal
+        ---
+        Exception:
+            If the object is invalid, a ValueError will be raised
+        ---
+        Side Effect:
+            The original AudioOutputSignal object will be set invalid
+        """
+        sampleRate = self._sampleRateOr(sampleRate)
+        if not self.isInEffect:
+            raise ValueError("No valid signal data")
+        if not isinstance(envelope, Envelope):
+            envelope = Envelope(envelope)
+        endFrame = envelope.endFrame(sampleRate)
+        gainBuf = _np.empty(self._bufSize or 0, dtype=_np.float64)
+
+        def _applyEnvelope_op(buf, frameOffset):
+            nonlocal gainBuf
+            validLen = None
+            if stopAtEnd and frameOffset + len(buf) >= endFrame:
+                validLen = max(endFrame - frameOffset, 0)
+                if validLen == 0:
+                    return 0
+                buf = buf[:validLen]
+            bufLen = len(buf)
+            if len(gainBuf) < bufLen:
+                gainBuf = _np.empty(bufLen, dtype=_np.float64)
+            gain = envelope.render(frameOffset, bufLen,
+                                   sampleRate=sampleRate,
+                                   out=gainBuf[:bufLen])
+            _np.multiply(buf, gain[:, None] if buf.ndim == 2 else gain, out=buf)
+            return validLen
+
+        return self._withOp(_applyEnvelope_op)
+
+    def cutoff(self, chunkTotalVarTol: float = 1e-3):
+        """
+        Stop signal when the signal is too quiet
+        ---
+        Parameter:
+            chunkTotalVarTol:
+                Type: float
+                Default: 1e-3
+                The minimal L1 norm for the buffer to continue
+        ---
+        Return:
+            The original signal, except the signal will be stopped
+                if the L1 norm of the signal is smaller than chunkTotalVarTol
+                in some buffer
+        ---
+        Exception:
+            If the object is invalid, a ValueError will be raised
+        ---
+        Side Effect:
+            The original AudioOutputSignal object will be set invalid
+        """
+        if not self.isInEffect:
+            raise ValueError("No valid signal data")
+        self._isInEffect = False
+
+        def _cutoff_gen(_gen):
+            for chunk in _gen:
+                if len(chunk) == 1 and _np.max(_np.abs(chunk[0])) < chunkTotalVarTol:
+                    return
+                elif _np.sum(_np.abs(_np.diff(chunk, axis=0))) < chunkTotalVarTol:
+                    return
+                else:
+                    yield chunk
+
+        return self.__class__(_cutoff_gen(self._genObj),
+                              bufSize=self._bufSize,
+                              channels=self._channels,
+                              sampleRate=self._sampleRate,
+                              length=self._length)
+
+    def ampModify(self, ampFunc: Callable):
+        """
+        Modify the signal by changing the amplitude
+        ---
+        Parameter:
+            ampFunc:
+                Type: Callable
+                Must take only one parameter, which is the amplitude of the signal
+                To speed up the computation, the function will be vectorized
+        ---
+        Return:
+            The original signal, with the amplitude changed by ampFunc
+        ---
+        Exception:
+            If the object is invalid, a ValueError will be raised
+        ---
+        Side Effect:
+            The original AudioOutputSignal object will be set invalid
+        """
+        if not self.isInEffect:
+            raise ValueError("No valid signal data")
+        ampFunc = _np.vectorize(ampFunc)
+
+        def _ampModify_op(buf, frameOffset):
+            buf[:] = ampFunc(buf)
+
+        return self._withOp(_ampModify_op)
+
+    def elementwiseOp(self, secondSigObj, ampFunc: Callable):
+        """
+        Mixing one signal with another
+        ---
+        Parameter:
+            secondSigObj:
+                Type: AudioOutputSignal
+                The second signal object to interactive with
+            ampFunc:
+                Type: Callable
+                The operation for the interaction
+                Must take two parameters, which are the amplitudes of the two signals
+                To speed up the computation, the function will be vectorized
         ---
         Return:
-            The whole data as encoded in a 1D numpy.ndarray.
-            If getLenOnly is True, returns only the length of the numpy.ndarray.
+            The resulting AudioOutputSignal that records the mixed signal
+            The resulting amplitudes will be the values of ampFunc on the two signals
+            (ampFunc(amp1, amp2))
+            The signal will stop when one of the signals runs out
         ---
         Exception:
-            If the object is invalid, a ValueError will be raised
+            If one of the object is invalid, a ValueError will be raised
         ---
         Side Effect:
-            The object will be set invalided after calling this function.
+            The two AudioOutputSignal objects will be set invalid
         """
+        # if not isinstance(secondSigObj, AudioOutputSignal):
+            # raise ValueError(
+                # f"Not a signal class ({secondSigObj.__class__.__name__})"
+            # )
         if not self.isInEffect:
             raise ValueError("No valid signal data")
-        if getLenOnly:
-            # TODO: isolate this to a separate function
-            return len(self.toNpArray(frameLimit=frameLimit,
-                                      getLenOnly=False))
-        # extract np array till the end if frameLimit is negative
-        if frameLimit < 0:
-            self._isInEffect = False
-            return _np.hstack(tuple(self._genObj))
-        else:
-            return _np.hstack(tuple(
-                self.keepTime(timeToKeep=frameLimit,
-                              sampleRate=1)._genObj))
+        if not secondSigObj.isInEffect:
+            raise ValueError("No valid signal data")
+        ampFunc = _np.vectorize(ampFunc)
 
-    def join(self, *sigObj):
+        def _elementwiseOp_func(buf0, buf1, out):
+            out[:] = ampFunc(buf0, buf1)
+
+        return self._withMixingBus([secondSigObj], _elementwiseOp_func)
+
+    def add(self,
+            *signalObj,
+            average: bool = False,
+            gains: Optional[Iterable] = None):
         """
-        Joining multiple AudioOutputSignal objects.
+        Adding signals
+        All signals are mixed in a single pass over each buffer
         ---
-        Parameters:
-            *sigObj:
-                Type: AudioOutputSignal
-                The objects to be joined with this AudioOutputSignal object.
-                All objects will be joined in order.
+        Parameter:
+            *signalObj:
+                Type: Union[AudioOutputSignal, float]
+                The signal objects to add with
+                If the type is float, will be taken as a constant signal
+            average:
+                Type: bool
+                Default: False
+                Determine if the output signal amplitude should be averaged
+            gains:
+                Type: Optional[Iterable[float]]
+                Default: None
+                The amplitude multipliers of this signal and each of signalObj, in order
+                If None, all multipliers are 1
+                If average is True, the multipliers are also divided by the number of signals
         ---
         Return:
-            A new AudioOutputSignal object that contains all data joined in sequence.
+            The resulting AudioOutputSignal that records the added signal
+            The resulting amplitudes will be the (weighted) sum of amplitudes of the signals
+            If average is True, the resulting amplitudes will be averaged
+            If no signalObj is given, will return the original signal
+            The signal will stop when one of the signals runs out
         ---
         Exception:
             If some of the objects is invalid, a ValueError will be raised
+            If gains does not have one more entry than signalObj, a ValueError will be raised
         ---
         Side Effect:
-            All AudioOutputSignal objects, including this one, will be set invalid.
+            All AudioOutputSignal objects, including this one, will be set invalid,
+                unless no signalObj is given
             In the case where an exception is raised, all objects iterated before the
                 exception is raised will be set invalid
         """
         if not self.isInEffect:
             raise ValueError("No valid signal data")
-        if len(sigObj) == 0:
+        if len(signalObj) == 0:
             return self
-        elif len(sigObj) == 1:
-            # TODO: deal with different buffer size
-            # currently use only the first one (self)
-            sigObj = sigObj[0]
-            if not sigObj.isInEffect:
-                raise ValueError("No valid signal data")
-            self._isInEffect = False
-            sigObj._isInEffect = False
-            return self.__class__(
-                _it.chain(self._genObj, sigObj._genObj),
-                bufSize=self._bufSize,
-                length=(self._length + sigObj._length
-                        if all(x is not None
-                               for x in (self._length, sigObj._length))
-                        else float('inf')))
-        else:
-            return self.join(sigObj[0]).join(*(sigObj[1:]))
+        gains = ((1., ) * (len(signalObj) + 1)
+                 if gains is None
+                 else tuple(gains))
+        if len(gains) != len(signalObj) + 1:
+            raise ValueError("gains should have one more entry than signalObj")
+        if average:
+            gains = tuple(gain / len(gains) for gain in gains)
+        constSum = sum(gain * sig
+                       for (sig, gain) in zip(signalObj, gains[1:])
+                       if isinstance(sig, _numClass))
+        sigList, gainList = [], []
+        for (sig, gain) in zip(signalObj, gains[1:]):
+            if not isinstance(sig, _numClass):
+                if not sig.isInEffect:
+                    raise ValueError("No valid signal data")
+                sigList.append(sig)
+                gainList.append(gain)
+        res = self
+        if gains[0] != 1:
+            res = res._withOp(self._ufuncOp(_np.multiply, gains[0]))
+        if len(sigList) != 0:
+            res = res._withMixingBus(sigList, _np.add, gainList=gainList)
+        if constSum != 0:
+            res = res._withOp(self._ufuncOp(_np.add, constSum))
+        return res
+
+    def __add__(self, secondSigObj):
+        return self.add(secondSigObj, average=False)
+
+    def __radd__(self, secondSigObj):
+        return self.__add__(secondSigObj)
 
     @classmethod
-    def joinSignals(cls, *sigObj):
+    def sum(cls, *signalObj, average=False, gains=None):
         """
-        Construct a new AudioOutputSignal from all AudioOutputSignal inputted.
-        Wrapper of AudioOutputSignal.join.
+        Adding signals
+        Wrapper of AudioOutputSignal.add
         ---
         Parameter:
-            *sigObj:
-                Type: AudioOutputSignal
-                The AudioOutputSignal objects to be joined.
-                All objects will be joined in order.
+            *signalObj:
+                Type: Union[AudioOutputSignal, float]
+                The signal objects to add with
+                If the type is float, will be taken as a constant signal
+            average:
+                Type: bool
+                Default: False
+                Determine if the output signal amplitude should be averaged
+            gains:
+                Type: Optional[Iterable[float]]
+                Default: None
+                The amplitude multipliers of each of signalObj, in order
+                If None, all multipliers are 1
         ---
         Return:
-            A new AudioOutputSignal object that contains all data joined in sequence.
+            The resulting AudioOutputSignal that records the added signal
+            The resulting amplitudes will be the sum of amplitudes of the signals
+            If average is True, the resulting amplitudes will be averaged
+            If no signalObj is given, will return a silent signal of infinite length
         ---
         Exception:
             If some of the objects is invalid, a ValueError will be raised
         ---
         Side Effect:
-            All AudioOutputSignal objects, including this one, will be set invalid.
+            All AudioOutputSignal objects will be set invalid.
             In the case where an exception is raised, all objects iterated before the
                 exception is raised will be set invalid
         """
-        if len(sigObj) == 0:
+        if len(signalObj) == 0:
             return cls.silentSignal(duration=None)
         else:
-            return sigObj[0].join(*sigObj[1:])
+            return signalObj[0].add(*signalObj[1:],
+                                    average=average,
+                                    gains=gains)
 
-    def joinSmooth(self,
-                   *sigObj,
-                   mode: str = 'linear',
-                   transitDuration: float = 0.1,
-                   sampleRate: int = 48000):
+    def mul(self, *signalObj):
         """
-        Join AudioOutputSignal, but smoothly
+        Multiplying signals
+        All signals are multiplied in a single pass over each buffer
         ---
         Parameter:
-            *sigObj:
-                Type: AudioOutputSignal
-                The objects to be joined with this one
-            mode:
-                Type: str
-                Default: 'linear'
-                Keyword only
-                The method used to join the signals together
-                Currently only accept two options:
-                    'linear': The amplitude during the transition period is linearly interpolated
-                              from the adjacent buffers
-                    'zero':   The amplitude during the transition period is simple zero
-            transitDuration:
-                Type: float
-                Default: 0.1
-                The length of the transition period, in seconds
-            sampleRate:
-                Type: int
-                Default: 48000
-                The sample rate of the output signal
+            *signalObj:
+                Type: Union[AudioOutputSignal, float]
+                The signal objects to multipled with
+                If the type is float, will be taken as a constant signal
         ---
         Return:
-            A new AudioOutputSignal object that contains all data joined in sequence.
-            If no sigObj is given, will return self
+            The resulting AudioOutputSignal that records the multiplied signal
+            The resulting amplitudes will be the product of amplitudes of the signals
+            If no signalObj is given, will return the original signal
+            The signal will stop when one of the signals runs out
         ---
         Exception:
             If some of the objects is invalid, a ValueError will be raised
         ---
         Side Effect:
-            All AudioOutputSignal objects, including this one, will be set invalid.
+            All AudioOutputSignal objects, including this one, will be set invalid,
+                unless no signalObj is given
             In the case where an exception is raised, all objects iterated before the
                 exception is raised will be set invalid
         """
         if not self.isInEffect:
             raise ValueError("No valid signal data")
-        transitFrameCount = int(transitDuration * sampleRate)
-        if len(sigObj) == 0:
+        if len(signalObj) == 0:
             return self
-        elif len(sigObj) == 1:
-            self._isInEffect = False
-            if not sigObj[0].isInEffect:
-                raise ValueError("No valid signal data")
-            sigObj[0]._isInEffect = False
-            lastBuf = _np.zeros(0)
-            while (buf := next(self._genObj, None)) is not None:
-                yield buf
-                lastBuf = buf
-            newBuf = next(sigObj[0]._genObj, None)
-            if newBuf is not None:
-                interpolBuf = {
-                    'linear': (
-                        lambda buf1, buf2:
-                        _np.linspace(buf1[-1], buf2[0],
-                                     num=transitFrameCount)),
-                    'zero': (lambda buf1, buf2: _np.zeros(transitFrameCount)),
-                }.get(mode,
-                      lambda buf1, buf2: _np.zeros(0))(lastBuf, newBuf)
-                yield interpolBuf
-                yield newBuf
-                # yield sigObj[0]._genObj
-                for buf in sigObj[0]._genObj:
-                    yield buf
-        else:
-            return self.joinSmooth(
-                sigObj[0],
-                mode=mode,
-                transitDuration=transitDuration,
-                sampleRate=sampleRate).join(
-                *(sigObj[1:]),
-                mode=mode,
-                transitDuration=transitDuration,
-                sampleRate=sampleRate)
+        constProd = 1.
+        sigList = []
+        for sig in signalObj:
+            if isinstance(sig, _numClass):
+                constProd *= sig
+            else:
+                if not sig.isInEffect:
+                    raise ValueError("No valid signal data")
+                sigList.append(sig)
+        res = self
+        if len(sigList) != 0:
+            res = res._withMixingBus(sigList, _np.multiply)
+        if constProd != 1:
+            res = res._withOp(self._ufuncOp(_np.multiply, constProd))
+        return res
+
+    def __mul__(self, secondSigObj):
+        return self.mul(secondSigObj)
+
+    def __rmul__(self, secondSigObj):
+        return self.__mul__(secondSigObj)
 
     @classmethod
-    def joinSignalsSmooth(cls,
-                          *sigObj,
-                          mode: str = 'linear',
-                          transitDuration: float = 1.,
-                          sampleRate: int = 48000):
+    def prod(cls, *signalObj):
         """
-        Join AudioOutputSignal, but smoothly
+        Multiplying signals
         ---
         Parameter:
-            *sigObj:
-                Type: AudioOutputSignal
-                The objects to be joined together
-            mode:
-                Type: str
-                Default: 'linear'
-                Keyword only
-                The method used to join the signals together
-                Currently only accept two options:
-                    'linear': The amplitude during the transition period is linearly interpolated
-                              from the adjacent buffers
-                    'zero':   The amplitude during the transition period is simple zero
-            transitDuration:
-                Type: float
-                Default: 0.1
-                The length of the transition period, in seconds
-            sampleRate:
-                Type: int
-                Default: 48000
-                The sample rate of the output signal
+            *signalObj:
+                Type: Union[AudioOutputSignal, float]
+                The signal objects to multipled with
+                If the type is float, will be taken as a constant signal
         ---
         Return:
-            A new AudioOutputSignal object that contains all data joined in sequence.
-            If no sigObj is given, will return a silent signal of infinite length
+            The resulting AudioOutputSignal that records the multiplied signal
+            The resulting amplitudes will be the product of amplitudes of the signals
+            If no signalObj is given, will return a signal of unit amplitude and infinite length
         ---
         Exception:
             If some of the objects is invalid, a ValueError will be raised
         ---
         Side Effect:
-            All AudioOutputSignal objects, including this one, will be set invalid.
+            All AudioOutputSignal objects will be set invalid,
+                unless no signalObj is given
             In the case where an exception is raised, all objects iterated before the
                 exception is raised will be set invalid
         """
-        if len(sigObj) == 0:
-            return cls.silentSignal(duration=None)
+        if len(signalObj) == 0:
+            return cls.fromAmpFunc(_np.ones_like, None, arrayInput=True)
         else:
-            return sigObj[0].joinSmooth(*sigObj[1:],
-                                        mode=mode,
-                                        transitDuration=transitDuration,
-                                        sampleRate=sampleRate)
+            return signalObj[0].mul(*signalObj[1:])
 
-    def damping(self,
-                dampingFactor: float = 1.,
-                dampingMethod: Union[str, Callable] = 'exp',
-                tol: Optional[float] = None,
-                stopBelowTol: bool = False,
-                sampleRate: int = 48000):
+    def enforceBufferSize(self,
+                          bufferSize: Optional[int] = 4096,
+                          frameLimit: Optional[int] = None,
+                          reuseBuffer: bool = False):
         """
-        Tone down the signal to zero
+        Set the buffer size to some fixed number
         ---
         Parameter:
-            dampingFactor:
-                Type: float
-                Default: 1.0
-                On default dampingMethod, the frequency factor used to damp the signal
-                Ignored if dampingMethod is a callable
-            dampingMethod:
-                Type: Union[str, Callable]
-                Default: 'exp'
-                The method used to give the multiplie to damp the signal on its amplitude
-                The following default damping methods can be specified with a case-insensitive string:
-                    'exp': the amplitude will decrease as exp(- a t)
-                    'linear': the amplitude will decrease as 1 / (1 + a t)
-                    'quad': the amplitude will decrease as 1 / (1 + (a t) ** 2)
-                    'cubic': the amplitude will decrease as 1 / (1 + (a t) ** 3)
-                    where a is the dampingFactor
-                If dampingMethod is a string not in the above list, will fall back to 'exp'
-                If dampingMethod is callable, it will be used to directly
-                    In this case, it is assumed to take a 1D numpy.ndarray as time
-                        and returns a numpy.ndarray of the same length
-            tol:
-                Type: Optional[float]
+            bufferSize:
+                Type: Optional[int]
+                Default: 4096
+                The target buffer size of the output signal
+                If None, the whole data will be taken as a single buffer
+                bufferSize and frameLimit cannot both be None
+            frameLimit:
+                Type: Optional[int]
                 Default: None
-                The minimal playable damping multiplier to be seen nonzero
-                If the damping multiplier goes below this value, the output will be consider zero
-                If None, tol will be set to -1 and stopBelowTol will be set to False
-            stopBelowTol:
+                The maximal number of frames to be outputted
+                If None, will return as many frames as possible
+                bufferSize and frameLimit cannot both be None
+            reuseBuffer:
                 Type: bool
                 Default: False
-                Determine if the signal should stop on the first time the damping multiplier goes
-                    below tol
-            sampleRate
-                Type: int
-                Default: 48000
-                The sample rate of the output signal
+                Determine if the output buffers are views of one preallocated buffer
+                If True, no memory is allocated per buffer,
+                    but each buffer is only valid until the next one is requested
+                If False, each buffer is a copy and can be kept
         ---
         Return:
-            An AudioOutputSignal object that records the damped signal
+            A AudioOutputSignal object that encodes the same signal but
+                with the required buffer size
         ---
         Exception:
-            If the object is invalid, a ValueError will be raised
+            If both bufferSize and frameLimit are both None, will raise a ValueError
+            If the signal is invalid, will raise a ValueError
         ---
         Side Effect:
-            The original AudioOutputSignal object will be set invalid
+            The object will be set invalid.
         """
         if not self.isInEffect:
             raise ValueError("No valid signal data")
+        if bufferSize is None:
+            if frameLimit is None:
+                raise ValueError("bufferSize and frameLimit cannot both be None")
+            arr = self.toNpArray(frameLimit=frameLimit)
+            return self.__class__.fromNpArray(arr, bufferSize=len(arr))
         self._isInEffect = False
-        if tol is None:
-            tol = -1
-            stopBelowTol = False
-        if not callable(dampingMethod):
-            dampingFuncDict = {
-                'exp': lambda t: _np.exp(-dampingFactor * t),
-                'linear': lambda t: _np.reciprocal(1 + dampingFactor * t),
-                'quad': lambda t: _np.reciprocal(1 + (dampingFactor * t) ** 2),
-                'cubic': lambda t: _np.reciprocal(1 + (dampingFactor * t) ** 3)
-            }
-            dampingMethod = dampingFuncDict.get(dampingMethod.lower(),
-                                                dampingFuncDict['exp'])
 
-        def _damping_gen(_gen):
-            blockOffset = 0
-            for amp in _gen:
-                blockLen = len(amp)
-                if dampingMethod(blockOffset / sampleRate) < tol:
-                    if stopBelowTol:
-                        return
-                    yield _np.zeros(blockLen)
-                else:
-                    damper = dampingMethod(_np.arange(blockOffset,
-                                                      blockOffset + blockLen)
-                                           / sampleRate)
-                    yield _np.where(damper < tol, 0, amp * damper)
-                blockOffset += blockLen
+        def _enforceBufferSize_gen(_gen):
+            # each push is at most bufferSize frames and is popped right after
+            # so the buffer never holds more than 2 * bufferSize frames
+            ringBuf = _RingBlockBuffer(2 * bufferSize, self._channels)
+            for nextBuf in _gen:
+                for offset in range(0, len(nextBuf), bufferSize):
+                    ringBuf.push(nextBuf[offset:offset + bufferSize])
+                    if len(ringBuf) >= bufferSize:
+                        buf = ringBuf.pop(bufferSize)
+                        yield buf if reuseBuffer else buf.copy()
+            if len(ringBuf) > 0:
+                buf = ringBuf.pop(len(ringBuf))
+                yield buf if reuseBuffer else buf.copy()
 
-        return self.__class__(_damping_gen(self._genObj),
-                              bufSize=self._bufSize,
-                              length=self._length)
+        seekableGen = self._seekableGen(reuseBuffer=True)
+        return self.__class__(_enforceBufferSize_gen(
+                                  self._compile(reuseBuffer=True)),
+                              bufSize=bufferSize,
+                              channels=self._channels,
+                              sampleRate=self._sampleRate,
+                              length=0 if self._length is not None else None,
+                              seekFunc=(None
+                                        if seekableGen is None
+                                        else lambda startFrame: _enforceBufferSize_gen(
+                                            seekableGen(startFrame))))
 
-    def cutoff(self, chunkTotalVarTol: float = 1e-3):
+    def play(self,
+             playerAO,
+             keepActive: bool = True,
+             volume: float = 1.,
+             forceAsTwoChannel: bool = False,
+             forcePrecompute: bool = False,
+             smoothClip: bool = False,
+             blocking: bool = True,
+             prefetch: int = 4):
         """
-        Stop signal when the signal is too quiet
+        Play the signal through the speaker
+        Wrapper function for AudioOutputInterface.play
         ---
         Parameter:
-            chunkTotalVarTol:
+            For details, please refer to help(AudioOutputInterface.play)
+            playAO:
+                Type: AudioOutputInterface
+            keepActive:
+                Type: bool
+                Default: True
+            volume:
                 Type: float
-                Default: 1e-3
-                The minimal L1 norm for the buffer to continue
+                Default: 1.0
+            forceAsTwoChannel:
+                Type: bool
+                Default: False
+            forcePrecompute:
+                Type: bool
+                Default: False
+            smoothClip:
+                Type: bool
+                Default: False
+            blocking:
+                Type: bool
+                Default: True
+                If False, returns a PlaybackHandle while the signal plays in the background
+            prefetch:
+                Type: int
+                Default: 4
+                The number of buffers computed ahead when blocking is False
         ---
         Return:
-            The original signal, except the signal will be stopped
-                if the L1 norm of the signal is smaller than chunkTotalVarTol
-                in some buffer
+            None if blocking is True, otherwise a PlaybackHandle
         ---
         Exception:
-            If the object is invalid, a ValueError will be raised
+            If the signal is invalid, will raise a ValueError
+            If playerAO is None, will raise a ValueError
         ---
         Side Effect:
-            The original AudioOutputSignal object will be set invalid
+            The object will be set invalid.
         """
-        if not self.isInEffect:
+        if playerAO is None:
+            raise ValueError("No AudioOutputInterface object given")
+        elif not self.isInEffect:
             raise ValueError("No valid signal data")
-        self._isInEffect = False
-
-        def _cutoff_gen(_gen):
-            for chunk in _gen:
-                if len(chunk) == 1 and _np.abs(chunk[0]) < chunkTotalVarTol:
-                    return
-                elif _np.sum(_np.abs(_np.diff(chunk))) < chunkTotalVarTol:
-                    return
-                else:
-                    yield chunk
-
-        return self.__class__(_cutoff_gen(self._genObj),
-                              bufSize=self._bufSize,
-                              length=self._length)
+        else:
+            return playerAO.play(self,
+                                 keepActive=keepActive,
+                                 volume=volume,
+                                 forceAsTwoChannel=forceAsTwoChannel,
+                                 forcePrecompute=forcePrecompute,
+                                 smoothClip=smoothClip,
+                                 blocking=blocking,
+                                 prefetch=prefetch)
 
-    def ampModify(self, ampFunc: Callable):
+    def skipTime(self, timeToSkip: float = 0., sampleRate: Optional[int] = None):
         """
-        Modify the signal by changing the amplitude
+        Skip some frames of the signal
+        If the signal is seekable (see AudioOutputSignal.isSeekable),
+            the skipped frames are not computed
         ---
         Parameter:
-            ampFunc:
-                Type: Callable
-                Must take only one parameter, which is the amplitude of the signal
-                To speed up the computation, the function will be vectorized
+            timeToSkip:
+                Type: float
+                Default: 0.0
+                The time to skip in the signal
+                If a non-positive number is given, the original sigal will not be altered
+            sampleRate:
+                Type: Optional[int]
+                Default: None
+                The sample rate of the output signal
+                Will be used to compute the number of data points to skip
+                If None, the sample rate of the signal will be used
         ---
         Return:
-            The original signal, with the amplitude changed by ampFunc
+            A new AudioOutputSignal object with some data points skipped
         ---
         Exception:
-            If the object is invalid, a ValueError will be raised
+            If the signal is invalid, will raise a ValueError
         ---
         Side Effect:
-            The original AudioOutputSignal object will be set invalid
+            The object will be set invalid unless timeToSkip is non-positive.
         """
+        sampleRate = self._sampleRateOr(sampleRate)
+        if timeToSkip <= 0:
+            return self
+        # TODO: check if it is actually rounded down
         if not self.isInEffect:
             raise ValueError("No valid signal data")
+        framesToSkip = int(sampleRate * timeToSkip)
+        newLength = ((self._length - framesToSkip)
+                     if self._length is not None
+                     else None)
+        seekableGen = self._seekableGen()
         self._isInEffect = False
-        return self.__class__(map(_np.vectorize(ampFunc),
-                                  self._genObj),
-                              bufSize=self._bufSize,
-                              length=self._length)
+        if seekableGen is not None:
+            # jump directly to the frame
+            return self.__class__(
+                seekableGen(framesToSkip),
+                bufSize=self._bufSize,
+                channels=self._channels,
+                sampleRate=self._sampleRate,
+                length=newLength,
+                seekFunc=lambda startFrame: seekableGen(framesToSkip + startFrame))
 
-    def elementwiseOp(self, secondSigObj, ampFunc: Callable):
+        def _skipTime_gen(_gen):
+            skippedFrames = 0
+            while True:
+                buf = next(_gen, None)
+                if buf is None:
+                    break
+                if skippedFrames + len(buf) > framesToSkip:
+                    yield buf[framesToSkip - skippedFrames:]
+                    break
+                else:
+                    skippedFrames += len(buf)
+            yield from _gen
+
+        return self.__class__(
+            _skipTime_gen(self._genObj),
+            bufSize=self._bufSize,
+            channels=self._channels,
+            sampleRate=self._sampleRate,
+            length=newLength)
+
+    def keepTime(self,
+                 timeToKeep: float = 0.,
+                 sampleRate: Optional[int] = None):
         """
-        Mixing one signal with another
+        Keep only some frames of the signal
         ---
         Parameter:
-            secondSigObj:
-                Type: AudioOutputSignal
-                The second signal object to interactive with
-            ampFunc:
-                Type: Callable
-                The operation for the interaction
-                Must take two parameters, which are the amplitudes of the two signals
-                To speed up the computation, the function will be vectorized
+            timeToKeep:
+                Type: float
+                Default: 0.0
+                The time to keep in the signal
+                If a negative number is given, the original sigal will not be altered
+            sampleRate:
+                Type: Optional[int]
+                Default: None
+                The sample rate of the output signal
+                Will be used to compute the number of data points to keep
+                If None, the sample rate of the signal will be used
         ---
         Return:
-            The resulting AudioOutputSignal that records the mixed signal
-            The resulting amplitudes will be the values of ampFunc on the two signals
-            (ampFunc(amp1, amp2))
-            The signal will stop when one of the signals runs out
+            A new AudioOutputSignal object with only some data points kept
         ---
         Exception:
-            If one of the object is invalid, a ValueError will be raised
+            If the signal is invalid, will raise a ValueError
         ---
         Side Effect:
-            The two AudioOutputSignal objects will be set invalid
+            The object will be set invalid unless timeToKeep is negative.
         """
-        # if not isinstance(secondSigObj, AudioOutputSignal):
-            # raise ValueError(
-                # f"Not a signal class ({secondSigObj.__class__.__name__})"
-            # )
+        sampleRate = self._sampleRateOr(sampleRate)
         if not self.isInEffect:
             raise ValueError("No valid signal data")
-        if not secondSigObj.isInEffect:
-            raise ValueError("No valid signal data")
+        if timeToKeep < 0:
+            return self
         self._isInEffect = False
-        secondSigObj._isInEffect = False
-        ampFunc = _np.vectorize(ampFunc)
+        framesToKeep = int(sampleRate * timeToKeep)
+        seekableGen = self._seekableGen()
 
-        def _elementwiseOp_gen(gen0, gen1, npVectFunc):
-            buf = [_np.zeros(0), _np.zeros(0)]
-            gen1IsEmpty = False
-            while not gen1IsEmpty:
-                buf[0] = next(gen0, None)
-                if buf[0] is None:
+        def _keepTime_gen(_gen, keepedFrames=0):
+            while keepedFrames < framesToKeep:
+                buf = next(_gen, None)
+                if buf is None:
+                    break
+                if keepedFrames + len(buf) > framesToKeep:
+                    yield buf[:framesToKeep - keepedFrames]
                     break
-                while len(buf[0]) > len(buf[1]):
-                    nextBuf = next(gen1, None)
-                    if nextBuf is None:
-                        gen1IsEmpty = True
-                        break
-                    buf[1] = _np.hstack((buf[1], nextBuf))
-                if gen1IsEmpty:
-                    buf[0] = buf[0][:len(buf[1])]
-                yield npVectFunc(buf[0], buf[1][:len(buf[0])])
-                buf[1] = buf[1][len(buf[0]):]
+                else:
+                    yield buf
+                    keepedFrames += len(buf)
 
-        return self.__class__(
-            _elementwiseOp_gen(self._genObj,
-                               secondSigObj._genObj,
-                               ampFunc),
-            bufSize=self._bufSize,
-            length=(min(self._length, secondSigObj._length)
-                    if all(x is not None
-                           for x in (self._length, secondSigObj._length))
-                    else None))
+        return self.__class__(_keepTime_gen(self._genObj),
+                              bufSize=self._bufSize,
+                              channels=self._channels,
+                              sampleRate=self._sampleRate,
+                              length=framesToKeep,
+                              seekFunc=(None
+                                        if seekableGen is None
+                                        else lambda startFrame: _keepTime_gen(
+                                            seekableGen(startFrame), startFrame)))
 
-    def add(self, *signalObj, average: bool = False):
+    @classmethod
+    def fromFourier(cls,
+                    ampList: list[float],
+                    freqList: list[float],
+                    initPhaseList: Union[float, list[float]] = 0.,
+                    duration: float = 1.,
+                    ampWeightNormalize: bool = True,
+                    bufferSize: int = 4096,
+                    sampleRate: int = 48000):
         """
-        Adding signals
+        Construct a signal from Fourier components
+        All components are computed together by an OscillatorBank
         ---
         Parameter:
-            *signalObj:
-                Type: Union[AudioOutputSignal, float]
-                The signal objects to add with
-                If the type is float, will be taken as a constant signal
-            average:
+            ampLst:
+                Type: list[float]
+                A list of float that denotes the peak amplitudes of the components
+            freqList:
+                Type: list[float]
+                A list of float that denotes the frequencies of the components
+            initPhaseList:
+                Type: Union[float, list[float]]
+                Default: 0.0
+                A float or a list of float that denotes the initial phases of the components
+                If initPhaseList is a float, the same initial phases will be used for all components
+            duration:
+                Type: float
+                Default: 1.0
+                The duration of the signal, in seconds
+            ampWeightNormalize:
                 Type: bool
-                Default: False
-                Determine if the output signal amplitude should be averaged
+                Default: True
+                Determine if the amplitudes will be normalzed to sum 1
+            bufferSize:
+                Type: int
+                Default: 4096
+                The buffer size of the output signal
+            sampleRate:
+                Type: int
+                Default: 48000
+                The sample rate of the output signal
         ---
-        Return:
-            The resulting AudioOutputSignal that records the added signal
-            The resulting amplitudes will be the sum of amplitudes of the signals
-            If average is True, the resulting amplitudes will be averaged
-            If no signalObj is given, will return the original signal
+        Return:
+            The resulting AudioOutputSignal object that records the multiplied signal
+            The resulting amplitudes will be the sum of the sine components
+                (f(t) = sum(amp[i] * sin(2 * pi * freq[i] * t + initPhase[i])))
+            If ampList has length 0, will return a silent signal with required length
         ---
         Exception:
-            If some of the objects is invalid, a ValueError will be raised
-        ---
-        Side Effect:
-            All AudioOutputSignal objects, including this one, will be set invalid,
-                unless no signalObj is given
-            In the case where an exception is raised, all objects iterated before the
-                exception is raised will be set invalid
+            If ampList and freqList have different lengths, will raise a ValueError
+            If initPhaseList is a list and has different length with previous lists,
+                will raise a ValueError
         """
-        if not self.isInEffect:
-            raise ValueError("No valid signal data")
-        if len(signalObj) == 0:
-            return self
-        elif len(signalObj) == 1:
-            if isinstance(signalObj[0], float):
-                return self.ampModify(lambda amp:
-                                      (amp + signalObj[0]) / (
-                                          2 if average else 1))
-            else:
-                if not signalObj[0].isInEffect:
-                    raise ValueError("No valid signal data")
-                return self.elementwiseOp(signalObj[0],
-                                          lambda x, y:
-                                          (x + y) / (2 if average else 1))
-        elif average:
-            n = len(signalObj) + 1
-            return self.mul(1 / n).add(*(sig.mul(1 / n)
-                                         for sig in signalObj),
-                                       average=False)
-
+        if len(ampList) != len(freqList):
+            raise ValueError("ampList and freqList have different lengths")
+        if len(ampList) == 0:
+            return cls.silentSignal(duration=duration,
+                                    bufferSize=bufferSize,
+                                    sampleRate=sampleRate)
         else:
-            return self.add(signalObj[0],
-                            average=False).add(*signalObj[1:],
-                                               average=False)
-
-    def __add__(self, secondSigObj):
-        return self.add(secondSigObj, average=False)
-
-    def __radd__(self, secondSigObj):
-        return self.__add__(secondSigObj)
+            if isinstance(initPhaseList, float):
+                initPhaseList = (initPhaseList, ) * len(ampList)
+            if len(ampList) != len(initPhaseList):
+                raise ValueError("ampList and initPhaseList have different lengths")
+            if ampWeightNormalize:
+                ampSum = _np.sum(_np.abs(ampList))
+                ampList = list(amp / ampSum for amp in ampList)
+            return cls._fromOscillatorBank(
+                OscillatorBank(freqList,
+                               amplitudes=ampList,
+                               initPhases=initPhaseList,
+                               waveform='sine',
+                               sampleRate=sampleRate),
+                duration=duration,
+                bufferSize=bufferSize,
+                sampleRate=sampleRate)
 
-    @classmethod
-    def sum(cls, *signalObj, average=False):
+    def clip(self, smoothClip: bool = False):
         """
-        Adding signals
+        Clipping the amplitude of a signal
         ---
         Parameter:
-            *signalObj:
-                Type: Union[AudioOutputSignal, float]
-                The signal objects to add with
-                If the type is float, will be taken as a constant signal
-            average:
+            smoothClip:
                 Type: bool
                 Default: False
-                Determine if the output signal amplitude should be averaged
+                Determine if smooth clipping is used
+                If True, the amplitude will be mapped as 2 / (1 + exp(-2 * amp)) - 1
+                Otherwise the amplitude will be clipped in [-1, 1]
         ---
         Return:
-            The resulting AudioOutputSignal that records the added signal
-            The resulting amplitudes will be the sum of amplitudes of the signals
-            If average is True, the resulting amplitudes will be averaged
-            If no signalObj is given, will return a silent signal of infinite length
+            An AudioOutputSignal object where all the amplitudes are clipped in [-1, 1]
         ---
         Exception:
-            If some of the objects is invalid, a ValueError will be raised
+            If the signal is invalid, will raise a ValueError
         ---
         Side Effect:
-            All AudioOutputSignal objects will be set invalid.
-            In the case where an exception is raised, all objects iterated before the
-                exception is raised will be set invalid
+            The object will be set invalid.
         """
-        if len(signalObj) == 0:
-            return cls.silentSignal(duration=None)
+        if not self.isInEffect:
+            raise ValueError("No valid signal data")
+        if smoothClip:
+            # 2 / (1 + exp(-2 * amp)) - 1 is exactly tanh(amp)
+            return self._withOp(self._ufuncOp(_np.tanh))
         else:
-            return signalObj[0].add(*signalObj[1:], average=average)
+            return self._withOp(self._ufuncOp(_np.clip, -1., 1.))
 
-    def mul(self, *signalObj):
+    def cache(self,
+              memoryLimit: float = 64.,
+              spillLimit: float = 1024.,
+              spillDir: Optional[str] = None):
         """
-        Multiplying signals
+        Store the blocks of the signal so that it can be read multiple times (see tee)
+        The blocks are only computed once, when they are first read
         ---
         Parameter:
-            *signalObj:
-                Type: Union[AudioOutputSignal, float]
-                The signal objects to multipled with
-                If the type is float, will be taken as a constant signal
+            memoryLimit:
+                Type: float
+                Default: 64.0
+                The size (in MiB) of the blocks kept in memory
+                Beyond that, the least recently used blocks are saved to a temporary directory
+            spillLimit:
+                Type: float
+                Default: 1024.0
+                The size (in MiB) of the blocks kept in the temporary directory
+                Beyond that, the least recently used blocks are deleted,
+                    and reading them again raises a ValueError
+            spillDir:
+                Type: Optional[str]
+                Default: None
+                The directory in which the temporary directory is created
+                If None, the system default is used
         ---
         Return:
-            The resulting AudioOutputSignal that records the multiplied signal
-            The resulting amplitudes will be the product of amplitudes of the signals
-            If no signalObj is given, will return the original signal
+            A new AudioOutputSignal object, whose tee method gives more copies of the signal
         ---
         Exception:
-            If some of the objects is invalid, a ValueError will be raised
+            If the signal is invalid, will raise a ValueError
         ---
         Side Effect:
-            All AudioOutputSignal objects, including this one, will be set invalid,
-                unless no signalObj is given
-            In the case where an exception is raised, all objects iterated before the
-                exception is raised will be set invalid
+            The object will be set invalid.
+            The blocks stay in memory or on disk until all the signals reading them are gone.
         """
         if not self.isInEffect:
             raise ValueError("No valid signal data")
-        if len(signalObj) == 0:
-            return self
-        elif len(signalObj) == 1:
-            if not signalObj[0].isInEffect:
-                raise ValueError("No valid signal data")
-            if isinstance(signalObj[0], _numClass):
-                return self.ampModify(lambda amp: amp * signalObj[0])
-            else:
-                return self.elementwiseOp(signalObj[0],
-                                          lambda x, y: x * y)
-        else:
-            return self.mul(signalObj[0]).mul(*signalObj[1:])
-
-    def __mul__(self, secondSigObj):
-        return self.mul(secondSigObj)
-
-    def __rmul__(self, secondSigObj):
-        return self.__mul__(secondSigObj)
+        self._isInEffect = False
+        # the store copies each block, so the work buffer can be reused
+        blockStore = _BlockStore(self._compile(reuseBuffer=True),
+                                 memoryLimit=int(memoryLimit * 2**20),
+                                 spillLimit=int(spillLimit * 2**20),
+                                 spillDir=spillDir)
+        res = self.__class__(blockStore.reader(),
+                             bufSize=self._bufSize,
+                             channels=self._channels,
+                             sampleRate=self._sampleRate,
+                             length=self._length,
+                             seekFunc=blockStore.reader)
+        res._blockStore = blockStore
+        return res
 
-    @classmethod
-    def prod(cls, *signalObj):
+    def tee(self, count: Optional[int] = None):
         """
-        Multiplying signals
+        Give new copies of a cached signal (see AudioOutputSignal.cache)
+        Each copy starts from the beginning of the signal and reuses the computed blocks
         ---
         Parameter:
-            *signalObj:
-                Type: Union[AudioOutputSignal, float]
-                The signal objects to multipled with
-                If the type is float, will be taken as a constant signal
+            count:
+                Type: Optional[int]
+                Default: None
+                The number of copies
+                If None, a single copy is returned instead of a tuple
         ---
         Return:
-            The resulting AudioOutputSignal that records the multiplied signal
-            The resulting amplitudes will be the product of amplitudes of the signals
-            If no signalObj is given, will return a signal of unit amplitude and infinite length
+            A new AudioOutputSignal object if count is None,
+                otherwise a tuple of count AudioOutputSignal objects
+            The copies can also be teed
         ---
         Exception:
-            If some of the objects is invalid, a ValueError will be raised
+            If the signal is not from cache, will raise a ValueError
         ---
         Side Effect:
-            All AudioOutputSignal objects will be set invalid,
-                unless no signalObj is given
-            In the case where an exception is raised, all objects iterated before the
-                exception is raised will be set invalid
+            None. The object can be teed even if it is no longer valid.
         """
-        if len(signalObj) == 0:
-            return cls.fromAmpFunc(lambda x: 1, None)
-        else:
-            return signalObj[0].mul(*signalObj[1:])
+        if self._blockStore is None:
+            raise ValueError("Only cached signals can be teed, use cache first")
+        if count is None:
+            res = self.__class__(self._blockStore.reader(),
+                                 bufSize=self._bufSize,
+                                 channels=self._channels,
+                                 sampleRate=self._sampleRate,
+                                 length=self._length,
+                                 seekFunc=self._blockStore.reader)
+            res._blockStore = self._blockStore
+            return res
+        return tuple(self.tee() for _ in range(count))
 
-    def enforceBufferSize(self,
-                          bufferSize: Optional[int] = 4096,
-                          frameLimit: Optional[int] = None):
+    def repeat(self,
+               repeatTimes: Optional[int] = 1,
+               eachDuration: float = 1.,
+               patchLenWithZero: bool = False,
+               sampleRate: Optional[int] = None):
         """
-        Set the buffer size to some fixed number
+        Repeat the signal multiple times
+        The repeated part is cached (see AudioOutputSignal.cache) and computed only once
         ---
         Parameter:
-            bufferSize:
+            repeatTimes:
                 Type: Optional[int]
-                Default: 4096
-                The target buffer size of the output signal
-                If None, the whole data will be taken as a single buffer
-                bufferSize and frameLimit cannot both be None
-            frameLimit:
+                Default: 1
+                The number of repetitions of the signal
+                If None, the signal will repeat indefinitely
+            eachDuration:
+                Type: float
+                Default: 1.0
+                The length for each repetition
+            patchLenWithZero:
+                Type: bool
+                Default: False
+                Determine if the signal should be patched with 0 if the original signal
+                    is shorter than eachDuration
+            sampleRate:
                 Type: Optional[int]
                 Default: None
-                The maximal number of frames to be outputted
-                If None, will return as many frames as possible
-                bufferSize and frameLimit cannot both be None
-        ---
-        Return:
-            A AudioOutputSignal object that encodes the same signal but
-                with the required buffer size
+                The sample rate of the output signal
+                If None, the sample rate of the signal will be used
         ---
         Exception:
-            If both bufferSize and frameLimit are both None, will raise a ValueError
             If the signal is invalid, will raise a ValueError
         ---
         Side Effect:
             The object will be set invalid.
         """
-        if not self.isInEffect:
-            raise ValueError("No valid signal data")
-        if bufferSize is None:
-            if frameLimit is None:
-                raise ValueError("bufferSize and frameLimit cannot both be None")
-            arr = self.toNpArray(frameLimit=frameLimit)
-            return self.__class__.fromNpArray(arr, bufferSize=len(arr))
-        self._isInEffect = False
+        sampleRate = self._sampleRateOr(sampleRate)
+        eachBlockLen = int(eachDuration * sampleRate)
+        blockStore = self.cache()._blockStore
+        channelShape = (self._channels, ) if self._channels != 1 else ()
 
-        def _enforceBufferSize_gen(_gen):
-            buf = _np.zeros(0)
-            while True:
-                nextBuf = next(_gen, None)
-                if nextBuf is None:
-                    break
-                buf = _np.hstack((buf, nextBuf))
-                while len(buf) >= bufferSize:
-                    yield buf[:bufferSize]
-                    buf = buf[bufferSize:]
-            if len(buf) > 0:
-                yield buf
+        def _repeat_gen(startFrame=0):
+            period = eachBlockLen \
+                if patchLenWithZero \
+                else min(eachBlockLen, blockStore.fill(eachBlockLen))
+            if period == 0:
+                return
+            (repeatCount, frameOffset) = divmod(startFrame, period)
+            while repeatTimes is None or repeatCount < repeatTimes:
+                yield from blockStore.reader(frameOffset, period)
+                frameOffset = max(frameOffset, blockStore.frameCount)
+                if frameOffset < period:
+                    yield _np.zeros((period - frameOffset, ) + channelShape,
+                                    dtype=_np.float32)
+                frameOffset = 0
+                repeatCount += 1
 
-        return self.__class__(_enforceBufferSize_gen(self._genObj),
-                              bufSize=bufferSize,
-                              length=0 if self._length is not None else None)
+        return self.__class__(_repeat_gen(),
+                              bufSize=self._bufSize,
+                              channels=self._channels,
+                              sampleRate=self._sampleRate,
+                              length=(float('inf')
+                                      if repeatTimes is None
+                                      else ((self._length * repeatTimes)
+                                            if self._length is not None
+                                            else None)),
+                              seekFunc=_repeat_gen)
 
-    def play(self,
-             playerAO,
-             keepActive: bool = True,
-             volume: float = 1.,
-             forceAsTwoChannel: bool = False,
-             forcePrecompute: bool = False,
-             smoothClip: bool = False):
+    def echo(self,
+             delayTime: float = 0.5,
+             echoAmp: float = 0.7,
+             infEcho: bool = False,
+             sampleRate: Optional[int] = None):
         """
-        Play the signal through the speaker
-        Wrapper function for AudioOutputInterface.play
+        Add an echoing effect of the signal
         ---
         Parameter:
-            For details, please refer to help(AudioOutputInterface.play)
-            playAO:
-                Type: AudioOutputInterface
-            keepActive:
-                Type: bool
-                Default: True
-            volume:
+            delayTime:
                 Type: float
-                Default: 1.0
-            forceAsTwoChannel:
-                Type: bool
-                Default: False
-            forcePrecompute:
-                Type: bool
-                Default: False
-            smoothClip:
+                Default: 0.5
+                The time delayed before the echo starts, in seconds
+            echoAmp:
+                Type: float
+                Default: 0.7
+                The amplitude multiplier for the echo
+                Typically in [0, 1]
+            infEcho:
                 Type: bool
                 Default: False
+                Determine if the echoes should also be echoed
+            sampleRate:
+                Type: Optional[int]
+                Default: None
+                The sample rate of the output signal
+                If None, the sample rate of the signal will be used
+        ---
+        Return:
+            An AudioOutputSignal object that recores the output signal
         ---
         Exception:
             If the signal is invalid, will raise a ValueError
-            If playerAO is None, will raise a ValueError
         ---
         Side Effect:
             The object will be set invalid.
         """
-        if playerAO is None:
-            raise ValueError("No AudioOutputInterface object given")
-        elif not self.isInEffect:
+        sampleRate = self._sampleRateOr(sampleRate)
+        if not self.isInEffect:
             raise ValueError("No valid signal data")
-        else:
-            playerAO.play(self,
-                          keepActive=keepActive,
-                          volume=volume,
-                          forceAsTwoChannel=forceAsTwoChannel,
-                          forcePrecompute=forcePrecompute,
-                          smoothClip=smoothClip)
+        delayFrame = int(sampleRate * delayTime)
+
+        def _echo_gen(_gen):
+            channelShape = (self._channels, ) if self._channels != 1 else ()
+            memBuf = _np.zeros((delayFrame, ) + channelShape, dtype=_np.float32)
+            outBuf = _np.empty_like(memBuf)
+            emptyBuf = _np.zeros((0, ) + channelShape, dtype=_np.float32)
+            while True:
+                # nextBuf is a view that is only valid in this iteration
+                nextBuf = next(_gen, emptyBuf)
+                bufLen = len(nextBuf)
+                _np.multiply(memBuf, echoAmp, out=outBuf)
+                outBuf[:bufLen] += nextBuf
+                yield outBuf
+                if infEcho:
+                    memBuf[:] = outBuf
+                else:
+                    memBuf[:bufLen] = nextBuf
+                    memBuf[bufLen:] = 0
 
-    def skipTime(self, timeToSkip: float = 0., sampleRate: int = 48000):
+        return self.__class__(
+            _echo_gen(self.enforceBufferSize(bufferSize=delayFrame,
+                                             reuseBuffer=True)._genObj),
+            bufSize=delayFrame,
+            channels=self._channels,
+            sampleRate=self._sampleRate,
+            length=self._length)._withOp(self._reusedBufferOp)
+
+    def convolve(self,
+                 impulseResponse,
+                 partitionSize: Optional[int] = None,
+                 keepTail: bool = True):
         """
-        Skip some frames of the signal
+        Convolve the signal with an impulse response (e.g. for reverb or FIR filters)
+        The convolution is streamed by partitioned FFT,
+            so long impulse responses and signals of unbounded length can be used
         ---
         Parameter:
-            timeToSkip:
-                Type: float
-                Default: 0.0
-                The time to skip in the signal
-                If a non-positive number is given, the original sigal will not be altered
-            sampleRate:
-                Type: int
-                Default: 48000
-                The sample rate of the output signal
-                Will be used to compute the number of data points to skip
+            impulseResponse:
+                Type: Union[numpy.ndarray, AudioOutputSignal]
+                The impulse response
+                If it is an AudioOutputSignal, the whole signal will be used,
+                    and it will be set invalid
+            partitionSize:
+                Type: Optional[int]
+                Default: None
+                The buffer size of the output signal, and the length of each partition of impulseResponse
+                Larger values are faster for long impulse responses but delay the first output buffer more
+                If None, the buffer size of this signal will be used (4096 if not known)
+            keepTail:
+                Type: bool
+                Default: True
+                Determine if the tail of the convolution (len(impulseResponse) - 1 frames)
+                    is outputted after the signal ends
         ---
         Return:
-            A new AudioOutputSignal object with some data points skipped
+            An AudioOutputSignal object that records the output signal
         ---
         Exception:
-            If the signal is invalid, will raise a ValueError
+            If the signal or impulseResponse is invalid, will raise a ValueError
         ---
         Side Effect:
-            The object will be set invalid unless timeToSkip is non-positive.
+            The object will be set invalid.
         """
-        if timeToSkip <= 0:
-            return self
-        # TODO: check if it is actually rounded down
         if not self.isInEffect:
             raise ValueError("No valid signal data")
-        framesToSkip = int(sampleRate * timeToSkip)
-        self._isInEffect = False
+        if isinstance(impulseResponse, AudioOutputSignal):
+            if not impulseResponse.isInEffect:
+                raise ValueError("No valid impulse response data")
+            impulseResponse = impulseResponse.toNpArray(frameLimit=-1)
+        impulseResponse = _np.asarray(impulseResponse).reshape(-1)
+        if len(impulseResponse) == 0:
+            raise ValueError("Impulse response is empty")
+        if partitionSize is None:
+            partitionSize = self._bufSize or 4096
+        convolver = _PartitionedConvolver(impulseResponse,
+                                          partitionSize,
+                                          self._channels)
 
-        def _skipTime_gen(_gen):
-            skippedFrames = 0
-            while True:
-                buf = next(_gen, None)
-                if buf is None:
+        def _convolve_gen(_gen):
+            for buf in _gen:
+                bufLen = len(buf)
+                outBuf = convolver.process(buf)
+                if bufLen < partitionSize:
+                    # last buffer, the tail starts right after it
                     break
-                if skippedFrames + len(buf) > framesToSkip:
-                    yield buf[framesToSkip - skippedFrames:]
-                    break
-                else:
-                    skippedFrames += len(buf)
-            yield from _gen
+                yield outBuf
+            else:
+                bufLen = 0
+                outBuf = None
+            if keepTail:
+                tailLen = bufLen + len(impulseResponse) - 1
+                while tailLen > 0:
+                    if outBuf is None:
+                        outBuf = convolver.process()
+                    yield outBuf[:min(tailLen, partitionSize)]
+                    tailLen -= partitionSize
+                    outBuf = None
+            elif bufLen > 0:
+                yield outBuf[:bufLen]
 
+        # rechunked to partitionSize, with the tail appended
+        if self._length is None or self._length == float('inf') or self._bufSize is None:
+            newLength = self._length
+        else:
+            outFrames = self._length * self._bufSize \
+                + (len(impulseResponse) - 1 if keepTail else 0)
+            newLength = (outFrames + partitionSize - 1) // partitionSize
         return self.__class__(
-            _skipTime_gen(self._genObj),
-            bufSize=self._bufSize,
-            length=((self._length - framesToSkip)
-                    if self._length is not None
-                    else None))
+            _convolve_gen(self.enforceBufferSize(bufferSize=partitionSize,
+                                                 reuseBuffer=True)._genObj),
+            bufSize=partitionSize,
+            channels=self._channels,
+            sampleRate=self._sampleRate,
+            length=newLength)
 
-    def keepTime(self,
-                 timeToKeep: float = 0.,
-                 sampleRate: int = 48000):
+    def resample(self,
+                 newRate: int,
+                 tapsPerPhase: int = 32,
+                 sampleRate: Optional[int] = None):
         """
-        Keep only some frames of the signal
+        Change the sample rate of the signal by a streaming polyphase resampler
         ---
         Parameter:
-            timeToKeep:
-                Type: float
-                Default: 0.0
-                The time to keep in the signal
-                If a negative number is given, the original sigal will not be altered
-            sampleRate:
+            newRate:
                 Type: int
-                Default: 48000
                 The sample rate of the output signal
-                Will be used to compute the number of data points to keep
+            tapsPerPhase:
+                Type: int
+                Default: 32
+                The number of filter taps used for each output frame
+                More taps give better quality and longer latency (tapsPerPhase / 2 input frames)
+            sampleRate:
+                Type: Optional[int]
+                Default: None
+                The sample rate of this signal
+                If None, the sample rate of the signal will be used
         ---
         Return:
-            A new AudioOutputSignal object with only some data points kept
+            A new AudioOutputSignal object of sample rate newRate
+            If the sample rate is already newRate, returns this object
         ---
         Exception:
-            If the signal is invalid, will raise a ValueError
+            If the signal is invalid or newRate is not a positive integer, will raise a ValueError
         ---
         Side Effect:
-            The object will be set invalid unless timeToKeep is negative.
+            The object will be set invalid unless the sample rate is already newRate.
         """
+        sampleRate = self._sampleRateOr(sampleRate)
         if not self.isInEffect:
             raise ValueError("No valid signal data")
-        if timeToKeep < 0:
+        if not isinstance(newRate, int) or newRate <= 0:
+            raise ValueError("newRate must be positive integer")
+        if newRate == sampleRate:
+            self._sampleRate = sampleRate
             return self
         self._isInEffect = False
-        framesToKeep = int(sampleRate * timeToKeep)
+        resampler = _PolyphaseResampler(sampleRate,
+                                        newRate,
+                                        channels=self._channels,
+                                        tapsPerPhase=tapsPerPhase)
 
-        def _keepTime_gen(_gen):
-            keepedFrames = 0
-            while True:
-                buf = next(_gen, None)
-                if buf is None:
-                    break
-                if keepedFrames + len(buf) > framesToKeep:
-                    yield buf[:framesToKeep - keepedFrames]
-                    break
-                else:
-                    yield buf
-                    keepedFrames += len(buf)
+        def _resample_gen(_gen):
+            for buf in _gen:
+                outBuf = resampler.process(buf)
+                if len(outBuf) != 0:
+                    yield outBuf
+            outBuf = resampler.process()
+            if len(outBuf) != 0:
+                yield outBuf
 
-        return self.__class__(_keepTime_gen(self._genObj),
-                              bufSize=self._bufSize,
-                              length=framesToKeep)
+        # the resampler outputs ceil(frames * newRate / sampleRate) frames in total
+        if self._bufSize is None:
+            (newBufSize, newLength) = (None, self._length)
+        else:
+            newBufSize = (self._bufSize * newRate + sampleRate - 1) // sampleRate
+            if self._length is None or self._length == float('inf'):
+                newLength = self._length
+            else:
+                outFrames = (self._length * self._bufSize * newRate + sampleRate - 1) \
+                    // sampleRate
+                newLength = (outFrames + newBufSize - 1) // newBufSize
+        return self.__class__(_resample_gen(self._compile(reuseBuffer=True)),
+                              bufSize=newBufSize,
+                              length=newLength,
+                              channels=self._channels,
+                              sampleRate=newRate)
 
-    @classmethod
-    def fromFourier(cls,
-                    ampList: list[float],
-                    freqList: list[float],
-                    initPhaseList: Union[float, list[float]] = 0.,
-                    duration: float = 1.,
-                    ampWeightNormalize: bool = True,
-                    bufferSize: int = 4096,
-                    sampleRate: int = 48000):
+    @staticmethod
+    def designFir(passBand,
+                  numTaps: int = 255,
+                  sampleRate: int = 48000,
+                  window: str = 'hamming'):
         """
-        Construct a signal from Fourier components
-        Wrapper of AudioOutputSignal.fromAmpFunc
+        Design a linear phase FIR filter by the windowed sinc method
         ---
         Parameter:
-            ampLst:
-                Type: list[float]
-                A list of float that denotes the peak amplitudes of the components
-            freqList:
-                Type: list[float]
-                A list of float that denotes the frequencies of the components
-            initPhaseList:
-                Type: Union[float, list[float]]
-                Default: 0.0
-                A float or a list of float that denotes the initial phases of the components
-                If initPhaseList is a float, the same initial phases will be used for all components
-            duration:
-                Type: float
-                Default: 1.0
-                The duration of the signal, in seconds
-            ampWeightNormalize:
-                Type: bool
-                Default: True
-                Determine if the amplitudes will be normalzed to sum 1
-            bufferSize:
+            passBand:
+                Type: tuple[Optional[float], Optional[float]]
+                The (lower, upper) cutoff frequencies of the pass band, in Hz
+                If lower is None, the filter is lowpass
+                If upper is None, the filter is highpass
+            numTaps:
                 Type: int
-                Default: 4096
-                The buffer size of the output signal
+                Default: 255
+                The number of taps of the filter
+                Will be increased by 1 if even
+                More taps give sharper transitions
             sampleRate:
                 Type: int
                 Default: 48000
-                The sample rate of the output signal
+                The sample rate of the signal to be filtered
+            window:
+                Type: str
+                Default: 'hamming'
+                The window function, one of 'hamming', 'hanning', 'blackman'
         ---
         Return:
-            The resulting AudioOutputSignal object that records the multiplied signal
-            The resulting amplitudes will be the sum of the sine components
-                (f(t) = sum(amp[i] * sin(2 * pi * freq[i] * t + initPhase[i])))
-            If ampList has length 0, will return a silent signal with required length
+            A numpy.ndarray of the filter taps
         ---
         Exception:
-            If ampList and freqList have different lengths, will raise a ValueError
-            If initPhaseList is a list and has different length with previous lists,
-                will raise a ValueError
+            If passBand is invalid, will raise a ValueError
         """
-        if len(ampList) != len(freqList):
-            raise ValueError("ampList and freqList have different lengths")
-        if len(ampList) == 0:
-            return cls.silentSignal(duration=duration,
-                                    bufferSize=bufferSize,
-                                    sampleRate=sampleRate)
-        else:
-            if isinstance(initPhaseList, float):
-                initPhaseList = (initPhaseList, ) * len(ampList)
-            if len(ampList) != len(initPhaseList):
-                raise ValueError("ampList and initPhaseList have different lengths")
-            if ampWeightNormalize:
-                ampSum = _np.sum(_np.abs(ampList))
-                ampList = list(amp / ampSum for amp in ampList)
-            return cls.fromAmpFunc(
-                ampFunc=lambda t: sum(
-                    amp * _np.sin(2 * _np.pi * freq * t
-                                  + initPhase)
-                    for (amp, freq, initPhase)
-                    in zip(ampList, freqList, initPhaseList)),
-                duration=duration,
-                bufferSize=bufferSize,
-                sampleRate=sampleRate)
+        lowCut, highCut = passBand
+        nyquist = sampleRate / 2
+        if (lowCut is None and highCut is None) \
+                or (lowCut is not None and not 0 < lowCut < nyquist) \
+                or (highCut is not None and not 0 < highCut < nyquist) \
+                or (lowCut is not None and highCut is not None and lowCut >= highCut):
+            raise ValueError("Invalid pass band")
+        if window not in ('hamming', 'hanning', 'blackman'):
+            raise ValueError(f"Unknown window {window}")
+        numTaps |= 1
+        t = _np.arange(numTaps) - (numTaps - 1) / 2
+        # highpass = delta - lowpass at the lower cutoff
+        taps = _np.zeros(numTaps)
+        taps[(numTaps - 1) // 2] = 1.
+        if highCut is not None:
+            taps = 2 * highCut / sampleRate * _np.sinc(2 * highCut / sampleRate * t)
+        if lowCut is not None:
+            taps -= 2 * lowCut / sampleRate * _np.sinc(2 * lowCut / sampleRate * t)
+        taps *= getattr(_np, window)(numTaps)
+        # normalize the gain at the center of the pass band
+        centerFreq = (0. if lowCut is None
+                      else nyquist if highCut is None
+                      else (lowCut + highCut) / 2)
+        taps /= abs(_np.sum(taps * _np.exp(-2j * _np.pi * centerFreq / sampleRate * t)))
+        return taps
+
+    def lowpass(self,
+                cutoff: float,
+                numTaps: int = 255,
+                sampleRate: Optional[int] = None):
+        """
+        Apply a lowpass FIR filter to the signal
+        Wrapper of AudioOutputSignal.convolve with the taps from AudioOutputSignal.designFir
+        ---
+        Parameter:
+            cutoff:
+                Type: float
+                The cutoff frequency, in Hz
+            numTaps:
+                Type: int
+                Default: 255
+                The number of taps of the filter
+            sampleRate:
+                Type: Optional[int]
+                Default: None
+                The sample rate of the signal
+                If None, the sample rate of the signal will be used
+        ---
+        Return:
+            An AudioOutputSignal object that records the filtered signal
+            The output is delayed by numTaps // 2 frames
+        ---
+        Exception:
+            If the signal is invalid or cutoff is invalid, will raise a ValueError
+        ---
+        Side Effect:
+            The object will be set invalid.
+        """
+        sampleRate = self._sampleRateOr(sampleRate)
+        return self.convolve(self.designFir((None, cutoff), numTaps, sampleRate))
+
+    def highpass(self,
+                 cutoff: float,
+                 numTaps: int = 255,
+                 sampleRate: Optional[int] = None):
+        """
+        Apply a highpass FIR filter to the signal
+        See help(AudioOutputSignal.lowpass)
+        """
+        sampleRate = self._sampleRateOr(sampleRate)
+        return self.convolve(self.designFir((cutoff, None), numTaps, sampleRate))
+
+    def bandpass(self,
+                 lowCutoff: float,
+                 highCutoff: float,
+                 numTaps: int = 255,
+                 sampleRate: Optional[int] = None):
+        """
+        Apply a bandpass FIR filter to the signal
+        See help(AudioOutputSignal.lowpass)
+        """
+        sampleRate = self._sampleRateOr(sampleRate)
+        return self.convolve(self.designFir((lowCutoff, highCutoff),
+                                            numTaps,
+                                            sampleRate))
+
+
+class AudioSink:
+    """
+    Base class for the destination of the data played by AudioOutputInterface.
+    The data are given as interleaved float32 numpy.ndarray.
+    Subclasses should override write, and open and close if needed.
+    ---
+    Properties:
+        sampleRate:
+            Read-only
+        channels:
+            Read-only
+        frameCount:
+            Read-only
+            The number of frames written since the last open
+    ---
+    Methods:
+        open
+        close
+        start
+        stop
+        isActive
+        write
+        startCallback
+        stopCallback
+    """
+    _sr = None
+    _channel = None
+    _isActive = False
+    _frameCount = 0
+    _callbackThread = None
+
+    @property
+    def sampleRate(self):
+        return self._sr
+
+    @property
+    def channels(self):
+        return self._channel
+
+    @property
+    def frameCount(self):
+        return self._frameCount
+
+    def open(self, sampleRate: int, channels: int):
+        """
+        (Re)configure the sink. Called by AudioOutputInterface on parameter changes.
+        """
+        self._sr = sampleRate
+        self._channel = channels
+        self._isActive = False
+        self._frameCount = 0
+
+    def close(self):
+        self._isActive = False
+
+    def start(self):
+        self._isActive = True
+
+    def stop(self):
+        self._isActive = False
+
+    def isActive(self):
+        return self._isActive
+
+    def write(self, buf: _np.ndarray):
+        """
+        Consume the interleaved float32 data in buf.
+        buf may be reused by the caller after this call returns.
+        """
+        self._frameCount += len(buf) // self._channel
+
+    def startCallback(self, callback: Callable, framesPerBuffer: int):
+        """
+        Start pulling data from callback in the background and return immediately.
+        callback is called as callback(waitForData) and returns the next interleaved buffer,
+            or None when there is no more data.
+        If waitForData is False, callback returns silence instead of waiting for data.
+        By default, a thread writes the buffers as fast as they are available.
+        """
+        def _drain():
+            self.start()
+            while (buf := callback(True)) is not None:
+                self.write(buf)
+
+        self._callbackThread = _threading.Thread(target=_drain, daemon=True)
+        self._callbackThread.start()
+
+    def stopCallback(self):
+        """
+        Stop playing after startCallback, once callback has returned None.
+        Must not be called from the thread that calls callback.
+        """
+        if self._callbackThread is not None:
+            self._callbackThread.join()
+            self._callbackThread = None
+        self.stop()
+
+
+class NullSink(AudioSink):
+    """
+    A sink that discards all data and only counts the frames.
+    Useful for benchmarking the signal pipeline.
+    """
+    pass
+
+
+class MemorySink(AudioSink):
+    """
+    A sink that keeps all data in memory.
+    ---
+    Methods:
+        toNpArray
+    """
+    _bufList = None
+
+    def open(self, sampleRate: int, channels: int):
+        super().open(sampleRate, channels)
+        self._bufList = []
+
+    def write(self, buf: _np.ndarray):
+        super().write(buf)
+        self._bufList.append(buf.copy())
+
+    def toNpArray(self):
+        """
+        Returns all the data written since the last open,
+            as a numpy.ndarray of shape (frames, channels).
+        """
+        if len(self._bufList) == 0:
+            return _np.zeros((0, self._channel), dtype=_np.float32)
+        return _np.hstack(self._bufList).reshape(-1, self._channel)
+
+
+class FileSink(AudioSink):
+    """
+    A sink that writes all data to a 32-bit float WAV file.
+    The file is (re)written from the start on every open,
+        and is complete after close.
+    """
+    _path = None
+    _file = None
+
+    def __init__(self, path: str):
+        self._path = path
+
+    def open(self, sampleRate: int, channels: int):
+        self.close()
+        super().open(sampleRate, channels)
+        self._file = open(self._path, 'wb')
+        self._file.write(AudioOutputSignal._wavHeader(0, sampleRate, channels))
+
+    def write(self, buf: _np.ndarray):
+        super().write(buf)
+        buf.astype('<f4', copy=False).tofile(self._file)
+
+    def close(self):
+        super().close()
+        if self._file is not None:
+            self._file.seek(0)
+            self._file.write(AudioOutputSignal._wavHeader(self._frameCount,
+                                                          self._sr,
+                                                          self._channel))
+            self._file.close()
+            self._file = None
+
+
+class PyAudioSink(AudioSink):
+    """
+    A sink that plays the data through the speaker with PyAudio.
+    The blocking stream (for write) and the callback stream (see startCallback)
+        are never open on the device at the same time:
+        startCallback closes the blocking stream,
+        and writing again stops and closes the callback stream.
+    Requires pyaudio.
+    """
+    _paObj = None
+    _stream = None
+    # stream in callback mode, see startCallback
+    _callbackStream = None
+
+    def open(self, sampleRate: int, channels: int):
+        if _pa is None:
+            raise ImportError("pyaudio is required for PyAudioSink")
+        self.close()
+        super().open(sampleRate, channels)
+        self._paObj = _pa.PyAudio()
+        self._ensureBlockingStream()
+
+    @staticmethod
+    def _closeStream(stream):
+        if stream is not None:
+            if stream.is_active():
+                stream.stop_stream()
+            stream.close()
+
+    def _ensureBlockingStream(self):
+        if self._callbackStream is not None:
+            self.stopCallback()
+        if self._stream is None:
+            self._stream = self._paObj.open(rate=self._sr,
+                                            channels=self._channel,
+                                            format=_pa.paFloat32,
+                                            output=True)
+
+    def close(self):
+        super().close()
+        for stream in (self._stream, self._callbackStream):
+            self._closeStream(stream)
+        self._stream = None
+        self._callbackStream = None
+        if self._paObj is not None:
+            self._paObj.terminate()
+            self._paObj = None
+
+    def start(self):
+        self._ensureBlockingStream()
+        if self._stream.is_stopped():
+            self._stream.start_stream()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+
+    def isActive(self):
+        return any(stream is not None and stream.is_active()
+                   for stream in (self._stream, self._callbackStream))
+
+    def write(self, buf: _np.ndarray):
+        self._ensureBlockingStream()
+        super().write(buf)
+        self._stream.write(buf.astype(_np.float32,
+                                      casting='same_kind',
+                                      copy=False).tobytes())
+
+    def startCallback(self, callback: Callable, framesPerBuffer: int):
+        """
+        Play the data from callback in the callback mode of PyAudio.
+        The buffers from callback may have any length,
+            the frames that do not fit in a PyAudio buffer are played in the next one.
+        See help(AudioSink.startCallback).
+        """
+        self._closeStream(self._stream)
+        self._stream = None
+        self._closeStream(self._callbackStream)
+        self._callbackStream = None
+        frameBytes = 4 * self._channel
+        # the bytes of the last buffer from callback that are not played yet
+        pendingBytes = b''
+
+        def _pa_callback(inData, frameCount, timeInfo, status):
+            nonlocal pendingBytes
+            outLen = frameCount * frameBytes
+            data = pendingBytes
+            while len(data) < outLen:
+                buf = callback(False)
+                if buf is None:
+                    pendingBytes = b''
+                    return (data + bytes(outLen - len(data)), _pa.paComplete)
+                self._frameCount += len(buf) // self._channel
+                data += buf.astype(_np.float32, copy=False).tobytes()
+            pendingBytes = data[outLen:]
+            return (data[:outLen], _pa.paContinue)
+
+        self._callbackStream = self._paObj.open(rate=self._sr,
+                                                channels=self._channel,
+                                                format=_pa.paFloat32,
+                                                output=True,
+                                                frames_per_buffer=framesPerBuffer,
+                                                stream_callback=_pa_callback)
+
+    def stopCallback(self):
+        """
+        Close the stream opened by startCallback.
+        Waits for the buffers already handed to PyAudio to be played.
+        The blocking stream is opened again when the sink is written to.
+        See help(AudioSink.stopCallback).
+        """
+        if self._callbackStream is not None:
+            if not self._callbackStream.is_stopped():
+                self._callbackStream.stop_stream()
+            self._callbackStream.close()
+            self._callbackStream = None
+
+
+class PlaybackMeter:
+    """
+    Instrumentation of AudioOutputInterface.play.
+    Pass it as the meter argument of play to collect, for each block,
+        the render time, the peak and RMS levels and the number of clipped samples,
+        the depth of the prefetch queue (for non-blocking play),
+        and optionally a running FFT spectrum.
+    The levels are measured before clipping and volume scaling,
+        so a peak above 1 means the signal is clipped.
+    The same meter can be used for several plays, the statistics accumulate until reset.
+    Without a meter, play does not do any of these.
+    ---
+    Properties:
+        blockCount:
+            Read-only
+            The number of blocks measured
+        frameCount:
+            Read-only
+            The number of frames measured
+        blockRenderTime:
+            Read-only
+            The time to compute the last block, in seconds
+        blockPeak:
+            Read-only
+            The peak level of each channel in the last block
+        blockRms:
+            Read-only
+            The RMS level of each channel in the last block
+        blockClipCount:
+            Read-only
+            The number of clipped samples in the last block
+        meanRenderTime:
+            Read-only
+            The mean time to compute a block, in seconds
+        maxRenderTime:
+            Read-only
+            The maximal time to compute a block, in seconds
+        lateBlockCount:
+            Read-only
+            The number of blocks that took longer to compute than to play
+        clipCount:
+            Read-only
+            The total number of clipped samples
+        clippedBlockCount:
+            Read-only
+            The number of blocks with clipped samples
+        peak:
+            Read-only
+            The peak level of each channel over all blocks
+        rms:
+            Read-only
+            The RMS level of each channel over all blocks
+        queueDepth:
+            Read-only
+            The number of computed blocks waiting when the sink took the last one
+            None for blocking play
+        minQueueDepth:
+            Read-only
+            The minimum of queueDepth
+        underrunCount:
+            Read-only
+            The number of times the sink found no computed block
+        spectrum:
+            Read-only
+            The running power spectrum of the mixed down signal, in dB
+                (0 dB for a full-scale sine)
+            None if spectrumSize is 0
+        spectrumFrequencies:
+            Read-only
+            The frequencies of the bins of spectrum, in Hz
+    ---
+    Methods:
+        reset
+        summary
+        report
+    """
+    _onBlock = None
+    _onClip = None
+    _onUnderrun = None
+    _spectrumSize = 0
+    _spectrumSmoothing = 0.
+    _sr = None
+    _channel = None
+    _window = None
+    _windowScale = 1.
+    _specInBuf = None
+    _specPower = None
+    _absBuf = None
+    _blockCount = 0
+    _frameCount = 0
+    _blockRenderTime = 0.
+    _blockPeak = None
+    _blockRms = None
+    _blockClipCount = 0
+    _totalRenderTime = 0.
+    _maxRenderTime = 0.
+    _lateBlockCount = 0
+    _clipCount = 0
+    _clippedBlockCount = 0
+    _peak = None
+    _sumSquare = None
+    _queueDepth = None
+    _minQueueDepth = None
+    _underrunCount = 0
 
-    def clip(self, smoothClip: bool = False):
+    def __init__(self,
+                 onBlock: Optional[Callable] = None,
+                 onClip: Optional[Callable] = None,
+                 onUnderrun: Optional[Callable] = None,
+                 spectrumSize: int = 0,
+                 spectrumSmoothing: float = 0.8):
         """
-        Clipping the amplitude of a signal
+        Constructor for PlaybackMeter class.
         ---
         Parameter:
-            smoothClip:
-                Type: bool
-                Default: False
-                Determine if smooth clipping is used
-                If True, the amplitude will be mapped as 2 / (1 + exp(-2 * amp)) - 1
-                Otherwise the amplitude will be clipped in [-1, 1]
+            onBlock:
+                Type: Optional[Callable]
+                Default: None
+                Called with this meter after each block is measured
+                Called in the thread computing the signal, so it should return quickly
+            onClip:
+                Type: Optional[Callable]
+                Default: None
+                Called with this meter after each block with clipped samples
+            onUnderrun:
+                Type: Optional[Callable]
+                Default: None
+                Called with this meter when the sink found no computed block
+                Called in the audio callback for PyAudioSink, so it must return quickly
+            spectrumSize:
+                Type: int
+                Default: 0
+                The FFT size of the running spectrum
+                If 0, no spectrum is computed
+            spectrumSmoothing:
+                Type: float
+                Default: 0.8
+                The weight of the old spectrum when a new block is added,
+                    in [0, 1)
+        """
+        if spectrumSize < 0:
+            raise ValueError("spectrumSize must be non-negative")
+        if not 0 <= spectrumSmoothing < 1:
+            raise ValueError("spectrumSmoothing must be in [0, 1)")
+        self._onBlock = onBlock
+        self._onClip = onClip
+        self._onUnderrun = onUnderrun
+        self._spectrumSize = spectrumSize
+        self._spectrumSmoothing = spectrumSmoothing
+        if spectrumSize > 0:
+            self._window = _np.hanning(spectrumSize).astype(_np.float32)
+            # so that a full-scale sine gives 0 dB
+            self._windowScale = 2. / self._window.sum()
+        self.reset()
+
+    def reset(self):
+        """
+        Clear the statistics and the spectrum.
+        """
+        self._blockCount = 0
+        self._frameCount = 0
+        self._blockRenderTime = 0.
+        self._blockClipCount = 0
+        self._totalRenderTime = 0.
+        self._maxRenderTime = 0.
+        self._lateBlockCount = 0
+        self._clipCount = 0
+        self._clippedBlockCount = 0
+        self._queueDepth = None
+        self._minQueueDepth = None
+        self._underrunCount = 0
+        self._peak = None
+        self._sumSquare = None
+        self._blockPeak = None
+        self._blockRms = None
+        self._specInBuf = None
+        self._specPower = None
+
+    def _start(self, sampleRate: int, channels: int):
+        # called by AudioOutputInterface.play
+        if self._channel != channels or self._sr != sampleRate:
+            if self._blockCount != 0:
+                self.reset()
+            self._sr = sampleRate
+            self._channel = channels
+        if self._peak is None:
+            self._peak = _np.zeros(channels)
+            self._sumSquare = _np.zeros(channels)
+        if self._spectrumSize > 0 and self._specInBuf is None:
+            self._specInBuf = _np.zeros(self._spectrumSize, dtype=_np.float32)
+            self._specPower = _np.zeros(self._spectrumSize // 2 + 1)
+
+    def _measureBlock(self, buf: _np.ndarray, renderTime: float):
+        # buf is of shape (frames, channels), before clipping
+        bufLen = len(buf)
+        self._blockCount += 1
+        self._frameCount += bufLen
+        self._blockRenderTime = renderTime
+        self._totalRenderTime += renderTime
+        if renderTime > self._maxRenderTime:
+            self._maxRenderTime = renderTime
+        if renderTime * self._sr > bufLen:
+            self._lateBlockCount += 1
+        if bufLen == 0:
+            return
+        if self._absBuf is None or self._absBuf.size < buf.size:
+            self._absBuf = _np.empty(buf.size, dtype=_np.float32)
+        absBuf = self._absBuf[:buf.size].reshape(buf.shape)
+        _np.abs(buf, out=absBuf)
+        blockPeak = absBuf.max(axis=0)
+        blockSumSquare = _np.einsum('ij,ij->j', buf, buf, dtype=_np.float64)
+        self._blockPeak = blockPeak
+        self._blockRms = _np.sqrt(blockSumSquare / bufLen)
+        _np.maximum(self._peak, blockPeak, out=self._peak)
+        self._sumSquare += blockSumSquare
+        # only count when there is something to count
+        self._blockClipCount = int(_np.count_nonzero(absBuf > 1.)) \
+            if blockPeak.max() > 1. else 0
+        if self._blockClipCount != 0:
+            self._clipCount += self._blockClipCount
+            self._clippedBlockCount += 1
+        if self._specInBuf is not None:
+            self._addToSpectrum(buf.mean(axis=1) if self._channel != 1 else buf[:, 0])
+        if self._onBlock is not None:
+            self._onBlock(self)
+        if self._blockClipCount != 0 and self._onClip is not None:
+            self._onClip(self)
+
+    def _addToSpectrum(self, monoBuf: _np.ndarray):
+        # the latest spectrumSize frames, one FFT per block
+        size = self._spectrumSize
+        if len(monoBuf) >= size:
+            self._specInBuf[:] = monoBuf[-size:]
+        else:
+            self._specInBuf[:-len(monoBuf)] = self._specInBuf[len(monoBuf):]
+            self._specInBuf[-len(monoBuf):] = monoBuf
+        power = _np.abs(_np.fft.rfft(self._specInBuf * self._window)
+                        * self._windowScale) ** 2
+        self._specPower *= self._spectrumSmoothing
+        self._specPower += (1 - self._spectrumSmoothing) * power
+
+    def _measureConsume(self, queueDepth: int):
+        # called by PlaybackHandle in the consumer thread
+        self._queueDepth = queueDepth
+        if self._minQueueDepth is None or queueDepth < self._minQueueDepth:
+            self._minQueueDepth = queueDepth
+
+    def _measureUnderrun(self):
+        self._underrunCount += 1
+        if self._onUnderrun is not None:
+            self._onUnderrun(self)
+
+    @property
+    def blockCount(self):
+        return self._blockCount
+
+    @property
+    def frameCount(self):
+        return self._frameCount
+
+    @property
+    def blockRenderTime(self):
+        return self._blockRenderTime
+
+    @property
+    def blockPeak(self):
+        return self._blockPeak
+
+    @property
+    def blockRms(self):
+        return self._blockRms
+
+    @property
+    def blockClipCount(self):
+        return self._blockClipCount
+
+    @property
+    def meanRenderTime(self):
+        return self._totalRenderTime / self._blockCount \
+            if self._blockCount != 0 else 0.
+
+    @property
+    def maxRenderTime(self):
+        return self._maxRenderTime
+
+    @property
+    def lateBlockCount(self):
+        return self._lateBlockCount
+
+    @property
+    def clipCount(self):
+        return self._clipCount
+
+    @property
+    def clippedBlockCount(self):
+        return self._clippedBlockCount
+
+    @property
+    def peak(self):
+        return None if self._peak is None else self._peak.copy()
+
+    @property
+    def rms(self):
+        if self._sumSquare is None or self._frameCount == 0:
+            return None
+        return _np.sqrt(self._sumSquare / self._frameCount)
+
+    @property
+    def queueDepth(self):
+        return self._queueDepth
+
+    @property
+    def minQueueDepth(self):
+        return self._minQueueDepth
+
+    @property
+    def underrunCount(self):
+        return self._underrunCount
+
+    @property
+    def spectrum(self):
+        if self._specPower is None:
+            return None
+        return 10 * _np.log10(self._specPower + 1e-20)
+
+    @property
+    def spectrumFrequencies(self):
+        if self._spectrumSize == 0 or self._sr is None:
+            return None
+        return _np.fft.rfftfreq(self._spectrumSize, 1 / self._sr)
+
+    def summary(self):
+        """
+        The statistics collected so far.
         ---
         Return:
-            An AudioOutputSignal object where all the amplitudes are clipped in [-1, 1]
-        ---
-        Exception:
-            If the signal is invalid, will raise a ValueError
-        ---
-        Side Effect:
-            The object will be set invalid.
+            A dict of the statistics, with times in seconds and levels in dBFS
         """
-        if not self.isInEffect:
-            raise ValueError("No valid signal data")
-        self._isInEffect = False
-        return self.__class__(((2 / (1 + _np.exp(-2 * amp)) - 1) if smoothClip else amp.clip(-1., 1.)
-                               for amp in self._gen),
-                              bufSize=self._bufSize,
-                              length=self._length)
+        def _toDb(levels):
+            return None if levels is None \
+                else [20 * _math.log10(level) if level > 0 else float('-inf')
+                      for level in levels]
 
-    def repeat(self,
-               repeatTimes: Optional[int] = 1,
-               eachDuration: float = 1.,
-               patchLenWithZero: bool = False,
-               sampleRate: int = 48000):
+        return {
+            'blockCount': self._blockCount,
+            'duration': self._frameCount / self._sr if self._sr else 0.,
+            'meanRenderTime': self.meanRenderTime,
+            'maxRenderTime': self._maxRenderTime,
+            'lateBlockCount': self._lateBlockCount,
+            'clipCount': self._clipCount,
+            'clippedBlockCount': self._clippedBlockCount,
+            'peak': _toDb(self._peak),
+            'rms': _toDb(self.rms),
+            'minQueueDepth': self._minQueueDepth,
+            'underrunCount': self._underrunCount,
+        }
+
+    def report(self):
         """
-        Repeat the signal multiple times
+        The statistics collected so far, as a human readable string.
+        """
+        res = self.summary()
+        blockTime = res['duration'] / res['blockCount'] \
+            if res['blockCount'] != 0 else 0.
+        lines = [
+            f"{res['blockCount']} blocks ({res['duration']:.2f} s)",
+            f"render time: mean {res['meanRenderTime'] * 1e3:.3f} ms, "
+            f"max {res['maxRenderTime'] * 1e3:.3f} ms "
+            f"(block is {blockTime * 1e3:.3f} ms), "
+            f"{res['lateBlockCount']} late",
+            f"clipped: {res['clipCount']} samples in "
+            f"{res['clippedBlockCount']} blocks",
+        ]
+        if res['peak'] is not None:
+            lines.append("peak: " + ", ".join(f"{level:.1f}" for level in res['peak'])
+                         + " dBFS")
+        if res['rms'] is not None:
+            lines.append("RMS: " + ", ".join(f"{level:.1f}" for level in res['rms'])
+                         + " dBFS")
+        if res['minQueueDepth'] is not None or res['underrunCount'] != 0:
+            lines.append(f"queue depth: min {res['minQueueDepth']}, "
+                         f"{res['underrunCount']} underruns")
+        return '\n'.join(lines)
+
+
+class PlaybackHandle:
+    """
+    Handle of a non-blocking playback started by AudioOutputInterface.play.
+    A producer thread computes the buffers into a bounded pool of preallocated blocks,
+        which is drained by the sink (in the audio callback for PyAudioSink).
+    The two sides only exchange blocks through deques (atomic append and popleft),
+        so the consumer never waits for a lock.
+    ---
+    Properties:
+        underrunCount:
+            Read-only
+            The number of times the sink asked for data before it was computed
+        playedFrameCount:
+            Read-only
+            The number of frames handed to the sink
+        isDone:
+            Read-only
+            Whether the playback has finished or is cancelled
+    ---
+    Methods:
+        wait
+        cancel
+    """
+    _sink = None
+    _channel = 1
+    _freeBlocks = None
+    # list of (block, valid length)
+    _filledBlocks = None
+    _outBuf = None
+    _silenceBuf = None
+    _pollInterval = 0.
+    _producerIsDone = False
+    _isCancelled = False
+    _error = None
+    _doneEvent = None
+    _underrunCount = 0
+    _playedFrameCount = 0
+    _meter = None
+
+    def __init__(self,
+                 blockGen: Iterable,
+                 sink: AudioSink,
+                 framesPerBuffer: int,
+                 prefetch: int = 4,
+                 keepActive: bool = True,
+                 meter: Optional[PlaybackMeter] = None):
+        """
+        Constructor for PlaybackHandle class.
+        Most of the time, this constructor should not be called directly.
+        Use AudioOutputInterface.play with blocking=False instead.
         ---
         Parameter:
-            repeatTimes:
-                Type: Optional[int]
-                Default: 1
-                The number of repetitions of the signal
-                If None, the signal will repeat indefinitely
-            eachDuration:
-                Type: float
-                Default: 1.0
-                The length for each repetition
-            patchLenWithZero:
-                Type: bool
-                Default: False
-                Determine if the signal should be patched with 0 if the original signal
-                    is shorter than eachDuration
-            sampleRate:
+            blockGen:
+                Type: Iterable
+                The interleaved float32 buffers to play
+            sink:
+                Type: AudioSink
+                The (opened) sink to play to
+            framesPerBuffer:
                 Type: int
-                Default: 48000
-                The sample rate of the output signal
-        ---
-        Exception:
-            If the signal is invalid, will raise a ValueError
-        ---
-        Side Effect:
-            The object will be set invalid.
+                The number of frames in each buffer
+            prefetch:
+                Type: int
+                Default: 4
+                The number of buffers that can be computed ahead
+            keepActive:
+                Type: bool
+                Default: True
+                If False, the sink will be stopped when the playback finishes
+            meter:
+                Type: Optional[PlaybackMeter]
+                Default: None
+                If given, the queue depth and underruns are reported to it
         """
-        eachBlockLen = int(eachDuration * sampleRate)
-        signalArr = self.toNpArray(frameLimit=eachBlockLen)
-        if patchLenWithZero and len(signalArr) < eachBlockLen:
-            signalArr = _np.hstack((signalArr,
-                                   _np.zeros(eachBlockLen - len(signalArr))))
-        if repeatTimes is None:
-            return self.__class__(_it.repeat(signalArr),
-                                  bufSize=self._bufSize,
-                                  length=float('inf'))
-        else:
-            return self.__class__(_it.repeat(signalArr, repeatTimes),
-                                  bufSize=self._bufSize,
-                                  length=((self._length
-                                           * repeatTimes)
-                                          if self._length is not None
-                                          else None))
+        self._sink = sink
+        self._channel = sink.channels
+        blockSize = framesPerBuffer * self._channel
+        self._freeBlocks = _deque(_np.empty(blockSize, dtype=_np.float32)
+                                  for _ in range(max(prefetch, 1)))
+        self._filledBlocks = _deque()
+        self._outBuf = _np.empty(blockSize, dtype=_np.float32)
+        self._silenceBuf = _np.zeros(blockSize, dtype=_np.float32)
+        self._pollInterval = framesPerBuffer / sink.sampleRate / 4
+        self._producerIsDone = False
+        self._isCancelled = False
+        self._error = None
+        self._doneEvent = _threading.Event()
+        self._underrunCount = 0
+        self._playedFrameCount = 0
+        self._meter = meter
+        _threading.Thread(target=self._produce,
+                          args=(blockGen, ),
+                          daemon=True).start()
+        if not keepActive:
+            # _finish runs in the audio callback, where the stream cannot be stopped
+            _threading.Thread(target=self._stopSinkWhenDone, daemon=True).start()
+        sink.startCallback(self._consume, framesPerBuffer)
 
-    def echo(self,
-             delayTime: float = 0.5,
-             echoAmp: float = 0.7,
-             infEcho: bool = False,
-             sampleRate: int = 48000):
+    @property
+    def underrunCount(self):
+        return self._underrunCount
+
+    @property
+    def playedFrameCount(self):
+        return self._playedFrameCount
+
+    @property
+    def isDone(self):
+        return self._doneEvent.is_set()
+
+    def _produce(self, blockGen: Iterable):
+        try:
+            for buf in blockGen:
+                while len(self._freeBlocks) == 0:
+                    if self._isCancelled:
+                        return
+                    _time.sleep(self._pollInterval)
+                if self._isCancelled:
+                    return
+                block = self._freeBlocks.popleft()
+                if len(block) < len(buf):
+                    block = _np.empty(len(buf), dtype=_np.float32)
+                block[:len(buf)] = buf
+                self._filledBlocks.append((block, len(buf)))
+        except Exception as e:
+            self._error = e
+        finally:
+            self._producerIsDone = True
+
+    def _consume(self, waitForData: bool):
+        while len(self._filledBlocks) == 0:
+            if self._producerIsDone or self._isCancelled:
+                self._finish()
+                return None
+            if not waitForData:
+                self._underrunCount += 1
+                if self._meter is not None:
+                    self._meter._measureUnderrun()
+                return self._silenceBuf
+            _time.sleep(self._pollInterval)
+        if self._isCancelled:
+            self._finish()
+            return None
+        block, bufLen = self._filledBlocks.popleft()
+        if self._meter is not None:
+            self._meter._measureConsume(len(self._filledBlocks))
+        if len(self._outBuf) < bufLen:
+            self._outBuf = _np.empty(bufLen, dtype=_np.float32)
+        self._outBuf[:bufLen] = block[:bufLen]
+        self._freeBlocks.append(block)
+        self._playedFrameCount += bufLen // self._channel
+        return self._outBuf[:bufLen]
+
+    def _finish(self):
+        self._doneEvent.set()
+
+    def _stopSinkWhenDone(self):
+        self._doneEvent.wait()
+        self._sink.stopCallback()
+
+    def wait(self, timeout: Optional[float] = None):
         """
-        Add an echoing effect of the signal
+        Wait until the playback finishes.
         ---
         Parameter:
-            delayTime:
-                Type: float
-                Default: 0.5
-                The time delayed before the echo starts, in seconds
-            echoAmp:
-                Type: float
-                Default: 0.7
-                The amplitude multiplier for the echo
-                Typically in [0, 1]
-            infEcho:
-                Type: bool
-                Default: False
-                Determine if the echoes should also be echoed
-            sampleRate:
-                Type: int
-                Default: 48000
-                The sample rate of the output signal
+            timeout:
+                Type: Optional[float]
+                Default: None
+                The maximal time to wait, in seconds
+                If None, wait until the playback finishes
         ---
         Return:
-            An AudioOutputSignal object that recores the output signal
+            Whether the playback has finished
         ---
         Exception:
-            If the signal is invalid, will raise a ValueError
-        ---
-        Side Effect:
-            The object will be set invalid.
+            If computing the signal raised an exception, it will be raised here
         """
-        if not self.isInEffect:
-            raise ValueError("No valid signal data")
-        delayFrame = int(sampleRate * delayTime)
-
-        def _echo_gen(_gen):
-            memBuf = _np.zeros(delayFrame)
-            while True:
-                nextBuf = next(_gen, None)
-                if nextBuf is None:
-                    nextBuf = _np.zeros(delayFrame)
-                elif len(nextBuf) < delayFrame:
-                    nextBuf = _np.hstack((nextBuf,
-                                          _np.zeros(delayFrame - len(nextBuf))))
-                yield nextBuf + memBuf * echoAmp
-                if infEcho:
-                    memBuf = nextBuf + memBuf * echoAmp
-                else:
-                    memBuf = nextBuf
+        isDone = self._doneEvent.wait(timeout)
+        if self._error is not None:
+            raise self._error
+        return isDone
 
-        return self.__class__(
-            _echo_gen(self.enforceBufferSize(bufferSize=delayFrame)._genObj),
-            bufSize=delayFrame,
-            length=self._length)
+    def cancel(self):
+        """
+        Stop the playback as soon as possible.
+        The buffers already handed to the sink may still be played.
+        """
+        self._isCancelled = True
 
 
 class AudioOutputInterface:
-    _paObj = None
-    _stream = None
+    _sink = None
     _sr = None
     _channel = None
     _buffSize = None
 
     def _init_stream(self):
-        if self._stream is not None:
-            self._ensureStreamClosed()
-        self._stream = self._paObj.open(rate=self._sr,
-                                        channels=self._channel,
-                                        format=_pa.paFloat32,
-                                        output=True)
+        self._sink.open(self._sr, self._channel)
 
     def _ensureStreamClosed(self):
-        if self._stream is not None:
-            if self._stream.is_active():
-                self._stream.stop_stream()
-            self._stream.close()
+        if self._sink is not None:
+            self._sink.close()
 
     def __del__(self):
         self._ensureStreamClosed()
-        self._paObj.terminate()
+
+    def close(self):
+        """
+        Close the sink, e.g. to complete the file of a FileSink.
+        Nothing can be played afterwards.
+        Also called on leaving a with block:
+            >>> with AudioOutputInterface(sink=FileSink('out.wav')) as playerAO:
+            ...     AudioOutputSignal.sineWave(440., 1.).play(playerAO)
+        """
+        self._ensureStreamClosed()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
 
     @staticmethod
     def _checkParaValid(paraName, paraVal):
@@ -1569,8 +5872,8 @@ class AudioOutputInterface:
             if not isinstance(paraVal, int) or paraVal <= 0:
                 raise ValueError("SampleRate must be positive integer")
         elif paraName == 'channels':
-            if paraVal not in (1, 2):
-                raise ValueError("Channel count must be 1 or 2")
+            if not isinstance(paraVal, int) or paraVal <= 0:
+                raise ValueError("Channel count must be positive integer")
         elif paraName == 'bufferSize':
             if not isinstance(paraVal, int) or paraVal <= 0:
                 raise ValueError("BufferSize must be positive integer")
@@ -1608,17 +5911,57 @@ class AudioOutputInterface:
         self._checkParaValid('bufferSize', bufferSize)
         self._buffSize = bufferSize
 
+    @property
+    def sink(self):
+        return self._sink
+
     def __init__(self,
                  sampleRate: int = 48000,
                  channels: int = 2,
-                 bufferSize: int = 4096):
+                 bufferSize: int = 4096,
+                 sink: Union[str, AudioSink, None] = None):
+        """
+        Constructor for AudioOutputInterface class.
+        ---
+        Parameter:
+            sampleRate:
+                Type: int
+                Default: 48000
+            channels:
+                Type: int
+                Default: 2
+            bufferSize:
+                Type: int
+                Default: 4096
+            sink:
+                Type: Union[str, AudioSink, None]
+                Default: None
+                Where the data are played to
+                Can be an AudioSink object, or one of the following strings:
+                    'pyaudio': play through the speaker, see PyAudioSink
+                    'null':    discard the data, see NullSink
+                    'memory':  keep the data in memory, see MemorySink
+                To write to a file, pass a FileSink object
+                If None, 'pyaudio' will be used
+        """
         self._checkParaValid('sampleRate', sampleRate)
         self._sr = sampleRate
         self._checkParaValid('channels', channels)
         self._channel = channels
         self._checkParaValid('bufferSize', bufferSize)
         self._buffSize = bufferSize
-        self._paObj = _pa.PyAudio()
+        if sink is None:
+            sink = 'pyaudio'
+        if isinstance(sink, str):
+            sinkClass = {
+                'pyaudio': PyAudioSink,
+                'null': NullSink,
+                'memory': MemorySink,
+            }.get(sink.lower(), None)
+            if sinkClass is None:
+                raise ValueError(f"Unknown sink {sink}")
+            sink = sinkClass()
+        self._sink = sink
         self._init_stream()
 
     def _ensureSigGen(self, obj, forcePrecompute: Optional[bool]):
@@ -1628,6 +5971,8 @@ class AudioOutputInterface:
         if isinstance(obj, AudioOutputSignal):
             if not obj._isInEffect:
                 raise ValueError("Signal has no valid data")
+            # signals of unknown sample rate are assumed to be of this one
+            obj = obj.resample(self._sr, sampleRate=obj._sampleRate or self._sr)
             if forcePrecompute is None:
                 forcePrecompute = True
             if isinstance(forcePrecompute, bool):
@@ -1635,10 +5980,11 @@ class AudioOutputInterface:
                     # obj._isInEffect = False
                     # will be declared invalid in enforceBufferSize
                     return obj.enforceBufferSize(
-                        bufferSize=self.bufferSize)._genObj
+                        bufferSize=self.bufferSize,
+                        reuseBuffer=True)._genObj
                 else:
                     forcePrecompute = 60.
-            obj = obj.toNpArray(frameLimit=forcePrecompute * self.bufferSize)
+            obj = obj.toNpArray(frameLimit=int(forcePrecompute * self.bufferSize))
         if isinstance(obj, _np.ndarray):
             return AudioOutputSignal\
                 .fromNpArray(obj,
@@ -1653,35 +5999,155 @@ class AudioOutputInterface:
              volume: float = 1.,
              forceAsTwoChannel: bool = False,
              forcePrecompute: bool = False,
-             smoothClip: bool = False):
+             smoothClip: bool = False,
+             blocking: bool = True,
+             prefetch: int = 4,
+             meter: Optional[PlaybackMeter] = None):
+        """
+        Play the signal.
+        ---
+        Parameter:
+            signal:
+                Type: Union[AudioOutputSignal, generator, numpy.ndarray, tuple]
+                The signal to play
+                A mono signal is played on all channels
+                A multi-channel signal must have the same number of channels as this object
+                If a tuple of two signals is given on two channels,
+                    they are played on the left and right channels
+            signalR:
+                Type: Optional[AudioOutputSignal]
+                Default: None
+                The signal on the right channel
+                If None, signal is played on all channels
+            keepActive:
+                Type: bool
+                Default: True
+                If False, the sink will be stopped after playing
+            volume:
+                Type: float
+                Default: 1.0
+            forceAsTwoChannel:
+                Type: bool
+                Default: False
+                If True, signal is assumed to be 1D and interleaved already
+            forcePrecompute:
+                Type: bool
+                Default: False
+                If True, the first 60 buffers of signal are computed before playing
+            smoothClip:
+                Type: bool
+                Default: False
+                Determine if smooth clipping is used
+            blocking:
+                Type: bool
+                Default: True
+                If True, returns after the whole signal is written to the sink
+                If False, the signal is computed in a background thread
+                    and drained by the sink in its callback, see PlaybackHandle
+            prefetch:
+                Type: int
+                Default: 4
+                The number of buffers computed ahead when blocking is False
+            meter:
+                Type: Optional[PlaybackMeter]
+                Default: None
+                If given, the render time, levels, clipping and queue depth
+                    of each block are reported to it
+        ---
+        Return:
+            None if blocking is True, otherwise a PlaybackHandle
+        """
         if isinstance(signal, tuple) \
                 and len(signal) >= 2 \
                 and self.channels == 2:
             signal, signalR = signal[0], signal[1]
         signal = self._ensureSigGen(signal, forcePrecompute)
-        if self._channel == 2 and not forceAsTwoChannel:
-            if signalR is None or not signalR._isInEffect:
-                signal = (_np.vstack((sig, sig)).T.ravel()
-                          for sig in signal)
-            else:
-                signalR = self._ensureSigGen(signalR, forcePrecompute)
-                signal = (_np.vstack((signalPair[0][:maxLen],
-                                      signalPair[1][:maxLen])).T.ravel()
-                          for signalPair in zip(signal, signalR)
-                          for maxLen in (len(min(signalPair, key=len)), ))
-        if self._stream.is_stopped():
-            self._stream.start_stream()
+        if signalR is not None and signalR._isInEffect and self._channel == 2:
+            signalR = self._ensureSigGen(signalR, forcePrecompute)
+            signal = (bufPair[0][:maxLen] if idx == 0 else bufPair[1][:maxLen]
+                      for bufPair in zip(signal, signalR)
+                      for maxLen in (min(len(bufPair[0]), len(bufPair[1])), )
+                      for idx in (0, 1))
+            channelCycle = _it.cycle(((0, 1), (1, 2)))
+        else:
+            channelCycle = _it.repeat((0, self._channel))
+        if meter is not None:
+            meter._start(self._sr, self._channel)
+        signal = self._interleave(signal,
+                                  channelCycle,
+                                  forceAsTwoChannel,
+                                  volume,
+                                  smoothClip,
+                                  meter)
+        if not blocking:
+            return PlaybackHandle(signal,
+                                  self._sink,
+                                  framesPerBuffer=self._buffSize,
+                                  prefetch=prefetch,
+                                  keepActive=keepActive,
+                                  meter=meter)
+        self._sink.start()
         for buf in signal:
+            self._sink.write(buf)
+        if not keepActive:
+            self._sink.stop()
+
+    def _interleave(self,
+                    signal: Iterable,
+                    channelCycle: Iterable,
+                    asInterleaved: bool,
+                    volume: float,
+                    smoothClip: bool,
+                    meter: Optional[PlaybackMeter] = None):
+        """
+        Write the buffers of signal into the channels of one preallocated
+            (bufferSize, channels) float32 buffer, clip and scale it in place,
+            and yield it as an interleaved 1D view.
+        Each yielded view is only valid until the next one is requested.
+        channelCycle gives the (first, last + 1) channels for each buffer in signal,
+            and a buffer is yielded whenever the last channel is filled.
+        If asInterleaved is True, the buffers are copied as is.
+        If meter is given, each yielded buffer is measured before clipping,
+            with the time since the previous one was yielded as the render time.
+        """
+        outBuf = _np.empty((self._buffSize, self._channel), dtype=_np.float32)
+        flatBuf = outBuf.reshape(-1)
+        if meter is not None:
+            renderStartTime = _time.perf_counter()
+        for (buf, (startCh, endCh)) in zip(signal, channelCycle):
+            bufLen = len(buf)
+            if asInterleaved:
+                if len(flatBuf) < bufLen:
+                    flatBuf = _np.empty(bufLen, dtype=_np.float32)
+                outView = flatBuf[:bufLen]
+                outView[:] = buf
+            else:
+                if len(outBuf) < bufLen:
+                    outBuf = _np.empty((bufLen, self._channel), dtype=_np.float32)
+                if buf.ndim == 2 and buf.shape[1] != endCh - startCh:
+                    raise ValueError(f"Signal has {buf.shape[1]} channels, "
+                                     f"but {self._channel} are expected")
+                # strided write, mono signals are broadcasted to the channels
+                outBuf[:bufLen, startCh:endCh] \
+                    = buf[:, None] if buf.ndim == 1 else buf
+                if endCh != self._channel:
+                    continue
+                outView = outBuf[:bufLen].reshape(-1)
+            if meter is not None:
+                meter._measureBlock(
+                        outView.reshape(-1, self._channel
+                                        if len(outView) % self._channel == 0 else 1),
+                        _time.perf_counter() - renderStartTime)
             if smoothClip:
-                buf = volume * (2 / (1 + _np.exp(-2 * buf)) - 1)
                 # ~ 75% peak loss
+                _np.tanh(outView, out=outView)
             else:
-                buf = buf.clip(-1., 1.) * volume
-            self._stream.write(buf.astype(_np.float32,
-                                          casting='same_kind',
-                                          copy=False).tobytes())
-        if not keepActive:
-            self._stream.stop_stream()
+                _np.clip(outView, -1., 1., out=outView)
+            if volume != 1:
+                _np.multiply(outView, volume, out=outView)
+            yield outView
+            if meter is not None:
+                renderStartTime = _time.perf_counter()
 
     def playNpArray(self,
                     npArray,
@@ -1694,21 +6160,24 @@ class AudioOutputInterface:
         #     if len(npArray[0]) != len(npArray[1]):
         #         raise ValueError("Input arrays are not of equal length")
         #     npArray = _np.vstack(npArray[0:2]).T.ravel()
-        if self.channels != 1:
-            raise ValueError("Not supported for multiple channels")
         if not isinstance(npArray, _np.ndarray):
             raise ValueError("Input array not np ndarray")
+        if npArray.ndim == 2 and npArray.shape[1] != self.channels:
+            raise ValueError(f"Input array has {npArray.shape[1]} channels, "
+                             f"but {self.channels} are expected")
+        elif npArray.ndim == 1 and self.channels != 1:
+            npArray = _np.broadcast_to(npArray[:, None],
+                                       (len(npArray), self.channels))
         if smoothClip:
             npArray = (2 / (1 + _np.exp(-2 * npArray)) - 1) * volume
         else:
             npArray = npArray.clip(-1, 1) * volume
-        if self._stream.is_stopped():
-            self._stream.start_stream()
-        self._stream.write(npArray.astype(_np.float32,
-                                          casting='same_kind',
-                                          copy=False).tobytes())
+        self._sink.start()
+        self._sink.write(npArray.astype(_np.float32,
+                                        casting='same_kind',
+                                        copy=False).reshape(-1))
         if not keepActive:
-            self._stream.stop_stream()
+            self._sink.stop()
 
     def clearBuf(self, duration: float = 0.1):
         self.play(AudioOutputSignal.silentSignal(duration=duration,
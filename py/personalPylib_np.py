@@ -1,10 +1,169 @@
 import numpy as np
-from typing import Callable
+import decimal as _decimal
+import math as _math
+import multiprocessing as _mp
+import os
+from multiprocessing import shared_memory as _sharedMemory
+from typing import Callable, Optional, Union
 
 # NOTE: when plotting in plt, the y-axis begins from the top to bottom
 #       an additional np.flipud may be needed
 # TODO: numba compatible
 
+def _escapeTimeTile(xs: np.ndarray,
+                    ys: np.ndarray,
+                    isJulia: bool,
+                    c: complex,
+                    power: float,
+                    radius: float,
+                    nmax: int,
+                    interiorCheck: bool = False,
+                    periodicityCheck: bool = False,
+                    smooth: bool = False,
+                    periodTolerance: float = 1e-12) -> np.ndarray:
+    # escape time of a (len(ys), len(xs)) tile, nmax + 1 for points that do not escape
+    # all work arrays are of the tile size and are compacted in place,
+    #     so that the working set stays in cache
+    # with smooth, the escape time is n - log_power(log|z_n| / log radius),
+    #     where z_n is the first point outside a much larger radius
+    grid = (xs[None, :] + 1j * ys[:, None]).ravel()
+    n = np.full(grid.size, nmax + 1, dtype=np.float64 if smooth else np.uint32)
+    idx = np.arange(grid.size)
+    if isJulia:
+        z = grid
+    else:
+        z = np.zeros_like(grid)
+        c = grid
+        if interiorCheck:
+            # the main cardioid and the period-2 bulb never escape
+            x = c.real - 0.25
+            y2 = c.imag * c.imag
+            q = x * x + y2
+            msk = (q * (q + x) > y2 / 4) & ((c.real + 1) ** 2 + y2 > 1 / 16)
+            idx, z, c = idx[msk], z[msk], c[msk]
+    if smooth:
+        escRadius = max(radius, 2. ** 8)
+        logRadius = _math.log(max(radius, 2.))
+        # some more iterations for the points just escaped radius to reach escRadius
+        iterLimit = nmax \
+            + int(_math.log(_math.log(escRadius) / logRadius, power)) + 2
+    else:
+        escRadius = radius
+        iterLimit = nmax
+    if periodicityCheck:
+        # Brent's cycle detection, comparing with the point saved at the last power of 2
+        savedZ = z.copy()
+        nextSaveTime = 1
+        tmpBuf = np.empty(grid.size, dtype=np.complex128)
+        distBuf = np.empty(grid.size)
+        cycleMsk = np.empty(grid.size, dtype=bool)
+    absBuf = np.empty(grid.size)
+    msk = np.empty(grid.size, dtype=bool)
+    for iterTime in range(1, iterLimit + 1):
+        m = len(z)
+        if m == 0:
+            break
+        if power == 2:
+            np.multiply(z, z, out=z)
+        else:
+            np.power(z, power, out=z)
+        np.add(z, c, out=z)
+        np.abs(z, out=absBuf[:m])
+        np.greater(absBuf[:m], escRadius, out=msk[:m])
+        hasEscaped = msk[:m].any()
+        hasCycled = False
+        if periodicityCheck and iterTime <= nmax:
+            np.subtract(z, savedZ, out=tmpBuf[:m])
+            np.abs(tmpBuf[:m], out=distBuf[:m])
+            np.less(distBuf[:m], periodTolerance, out=cycleMsk[:m])
+            hasCycled = cycleMsk[:m].any()
+            if iterTime == nextSaveTime:
+                savedZ[:] = z
+                nextSaveTime *= 2
+        if hasEscaped:
+            if smooth:
+                n[idx[msk[:m]]] = iterTime - np.log(np.log(absBuf[:m][msk[:m]])
+                                                    / logRadius) / _math.log(power)
+            else:
+                n[idx[msk[:m]]] = iterTime
+        if hasEscaped or hasCycled:
+            if hasCycled:
+                np.logical_or(msk[:m], cycleMsk[:m], out=msk[:m])
+            np.logical_not(msk[:m], out=msk[:m])
+            idx, z = idx[msk[:m]], z[msk[:m]]
+            if not isJulia:
+                c = c[msk[:m]]
+            if periodicityCheck:
+                savedZ = savedZ[msk[:m]]
+    if smooth:
+        # escaped after nmax
+        n[n > nmax] = nmax + 1
+    return n.reshape(len(ys), len(xs))
+
+
+# state of the worker processes of _renderTiled
+_tileWorkerState = None
+
+
+def _initTileWorker(shmName, shape, dtype, xs, ys, tileFunc, tileArgs):
+    global _tileWorkerState
+    shm = _sharedMemory.SharedMemory(name=shmName)
+    _tileWorkerState = (shm,
+                        np.ndarray(shape, dtype=dtype, buffer=shm.buf),
+                        xs, ys, tileFunc, tileArgs)
+
+
+def _renderTileInWorker(tile):
+    (_, out, xs, ys, tileFunc, tileArgs) = _tileWorkerState
+    (r0, r1, c0, c1) = tile
+    out[r0:r1, c0:c1] = tileFunc(xs[c0:c1], ys[r0:r1], *tileArgs)
+
+
+def _renderTiled(xmin: float, xmax: float, ymin: float, ymax: float,
+                 xres: int, yres: int,
+                 tileFunc: Callable,
+                 tileArgs: tuple,
+                 dtype=np.uint32,
+                 tileSize: int = 128,
+                 processes: Optional[int] = 1) -> np.ndarray:
+    # calls tileFunc(xs, ys, *tileArgs) on each tile of the plane
+    #     and gathers the results in a (yres, xres) array
+    # with more than one process, the tiles are rendered by a process pool
+    #     directly into a shared memory array
+    if tileSize <= 0:
+        raise ValueError("tileSize must be positive")
+    if processes is None:
+        processes = os.cpu_count() or 1
+    xs = np.linspace(xmin, xmax, xres)
+    ys = np.linspace(ymin, ymax, yres)
+    tiles = [(r0, min(r0 + tileSize, yres), c0, min(c0 + tileSize, xres))
+             for r0 in range(0, yres, tileSize)
+             for c0 in range(0, xres, tileSize)]
+    if processes <= 1 or len(tiles) <= 1:
+        out = np.empty((yres, xres), dtype=dtype)
+        for (r0, r1, c0, c1) in tiles:
+            out[r0:r1, c0:c1] = tileFunc(xs[c0:c1], ys[r0:r1], *tileArgs)
+        return out
+    shm = _sharedMemory.SharedMemory(
+            create=True,
+            size=max(xres * yres * np.dtype(dtype).itemsize, 1))
+    try:
+        out = np.ndarray((yres, xres), dtype=dtype, buffer=shm.buf)
+        with _mp.Pool(min(processes, len(tiles)),
+                      initializer=_initTileWorker,
+                      initargs=(shm.name, (yres, xres), dtype,
+                                xs, ys, tileFunc, tileArgs)) as pool:
+            # one tile per task, as tiles in the set take much longer than the others
+            for _ in pool.imap_unordered(_renderTileInWorker, tiles):
+                pass
+        res = out.copy()
+        del out
+    finally:
+        shm.close()
+        shm.unlink()
+    return res
+
+
 def julia(c: np.cdouble,
           xmin: float = -1.5,
           xmax: float = 1.5,
@@ -13,23 +172,28 @@ def julia(c: np.cdouble,
           xres: int = 1024,
           yres: int = 1024,
           power: float = 2.0,
-          nmax: int = 50):
+          nmax: int = 50,
+          periodicityCheck: bool = True,
+          smooth: bool = False,
+          tileSize: int = 128,
+          processes: Optional[int] = 1):
+    """
+    The escape time of z -> z ** power + c, for z on the grid
+    Points that do not escape in nmax iterations are given nmax + 1
+    If periodicityCheck is True, points whose orbit returns to where it was
+        (up to 1e-12) are taken as not escaping without running all nmax iterations
+    If smooth is True, a float64 array of continuous escape times is returned
+    The plane is rendered in tiles of tileSize x tileSize pixels
+        on processes processes (all cores if None)
+    Returns an array of shape (yres, xres)
+    """
     r = (1 + np.sqrt(1 + 4 * np.abs(c))) / 2
-    xidx, yidx = np.mgrid[0 : xres, 0 : yres]
-    z = np.linspace(xmin, xmax, xres)[xidx] + 1j * np.linspace(ymin, ymax, yres)[yidx]
-    n = np.zeros_like(z, dtype=np.uint32)
-    xidx, yidx, z = xidx.flatten(), yidx.flatten(), z.flatten()
-    for iterTime in range(1, nmax + 1):
-        if len(z) == 0:
-            break
-        np.power(z, power, out=z)
-        np.add(z, c, out=z)
-        msk = np.abs(z) > r
-        n[xidx[msk], yidx[msk]] = iterTime
-        np.logical_not(msk, out=msk)
-        xidx, yidx, z = xidx[msk], yidx[msk], z[msk]
-    n[n == 0] = nmax + 1
-    return n.transpose()
+    return _renderTiled(xmin, xmax, ymin, ymax, xres, yres,
+                        _escapeTimeTile,
+                        (True, complex(c), power, r, nmax,
+                         False, periodicityCheck, smooth),
+                        dtype=np.float64 if smooth else np.uint32,
+                        tileSize=tileSize, processes=processes)
 
 
 def mandelbrot(xmin: float = -2.,
@@ -38,23 +202,205 @@ def mandelbrot(xmin: float = -2.,
                ymax: float = 1.,
                xres: int = 1024,
                yres: int = 1024,
-               nmax: int = 50):
-    xidx, yidx = np.mgrid[0 : xres, 0 : yres]
-    c = np.linspace(xmin, xmax, xres)[xidx] + 1j * np.linspace(ymin, ymax, yres)[yidx]
-    n = np.zeros_like(c, dtype=np.uint32)
-    xidx, yidx, c = xidx.flatten(), yidx.flatten(), c.flatten()
-    z = np.zeros_like(c, dtype=np.cfloat)
-    for iterTime in range(1, nmax + 1):
-        if len(z) == 0:
+               nmax: int = 50,
+               interiorCheck: bool = True,
+               periodicityCheck: bool = True,
+               smooth: bool = False,
+               tileSize: int = 128,
+               processes: Optional[int] = 1):
+    """
+    The escape time of 0 under z -> z ** 2 + c, for c on the grid
+    Points that do not escape in nmax iterations are given nmax + 1
+    If interiorCheck is True, points in the main cardioid and the period-2 bulb
+        are given nmax + 1 without iterating
+    If periodicityCheck is True, points whose orbit returns to where it was
+        (up to 1e-12) are taken as not escaping without running all nmax iterations
+    If smooth is True, a float64 array of continuous escape times is returned
+    The plane is rendered in tiles of tileSize x tileSize pixels
+        on processes processes (all cores if None)
+    Returns an array of shape (yres, xres)
+    """
+    return _renderTiled(xmin, xmax, ymin, ymax, xres, yres,
+                        _escapeTimeTile,
+                        (False, 0j, 2., 2., nmax,
+                         interiorCheck, periodicityCheck, smooth),
+                        dtype=np.float64 if smooth else np.uint32,
+                        tileSize=tileSize, processes=processes)
+
+
+def _referenceOrbit(cRe: _decimal.Decimal,
+                    cIm: _decimal.Decimal,
+                    nmax: int,
+                    prec: int) -> np.ndarray:
+    # the orbit of 0 under z -> z ** 2 + c in prec digits, rounded to complex128
+    # ends at the first point that escapes
+    orbit = np.zeros(nmax + 1, dtype=np.complex128)
+    with _decimal.localcontext() as ctx:
+        ctx.prec = prec
+        zRe = zIm = _decimal.Decimal(0)
+        for iterTime in range(1, nmax + 1):
+            zRe, zIm = zRe * zRe - zIm * zIm + cRe, 2 * zRe * zIm + cIm
+            orbit[iterTime] = complex(float(zRe), float(zIm))
+            if abs(orbit[iterTime]) > 2:
+                return orbit[:iterTime + 1]
+    return orbit
+
+
+def _seriesCoefficients(orbit: np.ndarray) -> np.ndarray:
+    # coefficients of dz_n ~ A_n dc + B_n dc ** 2 + C_n dc ** 3 along the reference orbit,
+    #     stopped before they overflow
+    coefs = np.zeros((3, len(orbit)), dtype=np.complex128)
+    a = b = c = 0j
+    for iterTime in range(1, len(orbit)):
+        twoZ = 2 * orbit[iterTime - 1]
+        a, b, c = twoZ * a + 1, twoZ * b + a * a, twoZ * c + 2 * a * b
+        if not abs(c) < 1e200:
+            return coefs[:, :iterTime]
+        coefs[:, iterTime] = (a, b, c)
+    return coefs
+
+
+def _seriesSkip(orbit: np.ndarray,
+                coefs: np.ndarray,
+                maxDelta: float,
+                tolerance: float = 1e-12) -> int:
+    # the largest n such that the series is accurate for all |dc| <= maxDelta
+    #     and no point could have escaped in the first n iterations
+    (a, b, c) = np.abs(coefs)
+    firstTerm = a * maxDelta
+    lastTerm = c * maxDelta ** 3
+    isValid = (lastTerm <= tolerance * firstTerm) \
+        & (np.abs(orbit[:len(a)]) + firstTerm + b * maxDelta ** 2 + lastTerm < 2)
+    isValid[0] = True
+    invalidIdx = np.flatnonzero(~isValid)
+    return int(invalidIdx[0]) - 1 if len(invalidIdx) != 0 else len(a) - 1
+
+
+def _perturbationPass(dc: np.ndarray,
+                      orbit: np.ndarray,
+                      coefs: Optional[np.ndarray],
+                      nmax: int,
+                      glitchTolerance: float = 1e-3):
+    # escape time of c = reference + dc, iterating only dz = z - Z in float64
+    # returns (escape time, glitch depth), where the depth is inf for points
+    #     that are not glitched, and |z| / |Z| when the glitch is detected
+    # points still iterating when the reference orbit escapes are also glitched
+    size = dc.size
+    n = np.full(size, nmax + 1, dtype=np.uint32)
+    glitchDepth = np.full(size, np.inf)
+    skip = _seriesSkip(orbit, coefs, np.abs(dc).max()) \
+        if coefs is not None and size != 0 else 0
+    (a, b, c) = coefs[:, skip] if skip != 0 else (0j, 0j, 0j)
+    dz = dc * (a + dc * (b + dc * c))
+    idx = np.arange(size)
+    tmpBuf = np.empty(size, dtype=np.complex128)
+    absBuf = np.empty(size)
+    escMsk = np.empty(size, dtype=bool)
+    glitchMsk = np.empty(size, dtype=bool)
+    refLen = len(orbit) - 1
+    for iterTime in range(skip + 1, min(nmax, refLen) + 1):
+        m = len(dz)
+        if m == 0:
             break
-        np.multiply(z, z, out=z)
-        np.add(z, c, out=z)
-        msk = np.abs(z) > 2
-        n[xidx[msk], yidx[msk]] = iterTime
-        np.logical_not(msk, out=msk)
-        xidx, yidx, z, c = xidx[msk], yidx[msk], z[msk], c[msk]
-    n[n == 0] = nmax + 1
-    return n.transpose()
+        # dz -> (2 Z + dz) dz + dc
+        np.add(dz, 2 * orbit[iterTime - 1], out=tmpBuf[:m])
+        np.multiply(dz, tmpBuf[:m], out=dz)
+        np.add(dz, dc, out=dz)
+        np.add(dz, orbit[iterTime], out=tmpBuf[:m])
+        np.abs(tmpBuf[:m], out=absBuf[:m])
+        np.greater(absBuf[:m], 2., out=escMsk[:m])
+        # Pauldelbrot's criterion: z is much closer to 0 than Z,
+        #     so the precision of dz is lost
+        np.less(absBuf[:m], glitchTolerance * abs(orbit[iterTime]), out=glitchMsk[:m])
+        hasEscaped = escMsk[:m].any()
+        hasGlitched = glitchMsk[:m].any()
+        if hasEscaped:
+            n[idx[escMsk[:m]]] = iterTime
+        if hasGlitched:
+            glitchDepth[idx[glitchMsk[:m]]] = absBuf[:m][glitchMsk[:m]] \
+                / abs(orbit[iterTime])
+        if hasEscaped or hasGlitched:
+            np.logical_or(escMsk[:m], glitchMsk[:m], out=escMsk[:m])
+            np.logical_not(escMsk[:m], out=escMsk[:m])
+            idx, dz, dc = idx[escMsk[:m]], dz[escMsk[:m]], dc[escMsk[:m]]
+    if refLen < nmax:
+        glitchDepth[idx] = 1.
+    return (n, glitchDepth)
+
+
+def _perturbationTile(dxs: np.ndarray,
+                      dys: np.ndarray,
+                      cRe: _decimal.Decimal,
+                      cIm: _decimal.Decimal,
+                      prec: int,
+                      orbit: np.ndarray,
+                      coefs: Optional[np.ndarray],
+                      nmax: int,
+                      maxReferences: int) -> np.ndarray:
+    # escape time of a tile of offsets from the reference (cRe, cIm)
+    # glitched points are redone with a new reference at the deepest glitch
+    dc = (dxs[None, :] + 1j * dys[:, None]).ravel()
+    (n, glitchDepth) = _perturbationPass(dc, orbit, coefs, nmax)
+    glitchIdx = np.flatnonzero(glitchDepth != np.inf)
+    for _ in range(maxReferences - 1):
+        if len(glitchIdx) == 0:
+            break
+        refIdx = glitchIdx[np.argmin(glitchDepth[glitchIdx])]
+        refDc = dc[refIdx]
+        with _decimal.localcontext() as ctx:
+            ctx.prec = prec
+            newRe = cRe + _decimal.Decimal(refDc.real)
+            newIm = cIm + _decimal.Decimal(refDc.imag)
+        newOrbit = _referenceOrbit(newRe, newIm, nmax, prec)
+        (n[glitchIdx], glitchDepth[glitchIdx]) = _perturbationPass(
+                dc[glitchIdx] - refDc,
+                newOrbit,
+                _seriesCoefficients(newOrbit) if coefs is not None else None,
+                nmax)
+        glitchIdx = glitchIdx[glitchDepth[glitchIdx] != np.inf]
+    return n.reshape(len(dys), len(dxs))
+
+
+def mandelbrotDeep(xmin: Union[float, str, _decimal.Decimal] = -2.,
+                   xmax: Union[float, str, _decimal.Decimal] = 1.,
+                   ymin: Union[float, str, _decimal.Decimal] = -1.,
+                   ymax: Union[float, str, _decimal.Decimal] = 1.,
+                   xres: int = 1024,
+                   yres: int = 1024,
+                   nmax: int = 50,
+                   seriesApproximation: bool = True,
+                   maxReferences: int = 64,
+                   tileSize: int = 128,
+                   processes: Optional[int] = 1):
+    """
+    Same as mandelbrot, but for deep zooms
+    One reference orbit at the center is computed with decimal,
+        and all points iterate their difference to it in float64 (perturbation).
+    The limits can be given as str or decimal.Decimal for views
+        narrower than the precision of float
+    If seriesApproximation is True, the first iterations are skipped
+        with a cubic series in the offset
+    Glitched points (where the difference loses precision) are redone
+        with a new reference, up to maxReferences references per tile
+    Zooms down to about 1e-300 are supported
+    """
+    (xmin, xmax, ymin, ymax) = (_decimal.Decimal(v) for v in (xmin, xmax, ymin, ymax))
+    width = float(xmax - xmin)
+    height = float(ymax - ymin)
+    pixelSize = max(abs(width) / max(xres - 1, 1), abs(height) / max(yres - 1, 1))
+    if pixelSize == 0:
+        raise ValueError("The view is empty")
+    prec = max(30, int(-_math.log10(pixelSize)) + 15)
+    with _decimal.localcontext() as ctx:
+        ctx.prec = prec
+        cRe = (xmin + xmax) / 2
+        cIm = (ymin + ymax) / 2
+    orbit = _referenceOrbit(cRe, cIm, nmax, prec)
+    coefs = _seriesCoefficients(orbit) if seriesApproximation else None
+    return _renderTiled(-width / 2, width / 2, -height / 2, height / 2, xres, yres,
+                        _perturbationTile,
+                        (cRe, cIm, prec, orbit, coefs, nmax, maxReferences),
+                        tileSize=tileSize, processes=processes)
 
 
 # def logisBranch(rmin: float = 2.4,